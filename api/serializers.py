@@ -0,0 +1,57 @@
+from rest_framework import serializers
+
+from products.images import DERIVATIVE_SIZES, product_image_url
+from products.models import Category, Product
+
+
+class SparseFieldsMixin:
+    """Restreint les champs sérialisés à ceux demandés par ``?fields=a,b,c``."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'slug', 'description']
+
+
+class CategoryRefSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ['id', 'slug', 'name']
+
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    category = CategoryRefSerializer(read_only=True)
+    cement_type_display = serializers.CharField(source='get_cement_type_display', read_only=True)
+    images = serializers.SerializerMethodField()
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = [
+            'id', 'name', 'slug', 'category', 'description', 'cement_type', 'cement_type_display',
+            'price', 'weight', 'available', 'images', 'url', 'updated_at',
+        ]
+
+    def _absolute(self, url):
+        request = self.context.get('request')
+        if url and request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def get_images(self, product):
+        if not product.image:
+            return None
+        images = {'original': self._absolute(product.image.url)}
+        for size in DERIVATIVE_SIZES:
+            images[size] = self._absolute(product_image_url(product, size))
+        return images
+
+    def get_url(self, product):
+        return self._absolute(product.get_absolute_url())
@@ -0,0 +1,98 @@
+from decimal import Decimal
+
+from django.core.cache import cache, caches
+from django.test import TestCase
+from django.urls import reverse
+
+from products.cache import CATALOG_VERSION_KEY, get_catalog_version
+from products.models import Category, Product, StockMovementType
+from products.stock import record_movement
+
+
+class CatalogApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Ciment', slug='ciment')
+        cls.other = Category.objects.create(name='Sable', slug='sable')
+        cls.products = [
+            Product.objects.create(
+                name=f'Ciment n°{i:02d}', category=cls.category, cement_type='CPJ42.5',
+                price=Decimal('25000.00'), weight=Decimal('50.00'),
+            )
+            for i in range(5)
+        ]
+        Product.objects.create(
+            name='Sable fin', category=cls.other, cement_type='CPA', price=Decimal('1000.00'), weight=Decimal('25')
+        )
+
+    def setUp(self):
+        cache.clear()
+        caches['shared'].clear()
+
+    def test_categories_are_public(self):
+        response = self.client.get(reverse('api:category_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c['slug'] for c in response.json()], ['ciment', 'sable'])
+
+    def test_products_keyset_pagination_and_sparse_fields(self):
+        url = reverse('api:product_list')
+        response = self.client.get(url, {'category': 'ciment', 'page_size': 2, 'fields': 'id,name'})
+        data = response.json()
+        self.assertEqual(data['results'], [
+            {'id': self.products[0].id, 'name': 'Ciment n°00'},
+            {'id': self.products[1].id, 'name': 'Ciment n°01'},
+        ])
+        seen = [item['id'] for item in data['results']]
+        while data['next']:
+            data = self.client.get(data['next']).json()
+            seen += [item['id'] for item in data['results']]
+        self.assertEqual(seen, [product.id for product in self.products])
+
+    def test_non_finite_weight_filter_is_ignored(self):
+        url = reverse('api:product_list')
+        for weight in ('NaN', 'sNaN', 'Infinity', '-inf'):
+            response = self.client.get(url, {'category': 'sable', 'weight': weight})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([item['name'] for item in response.json()['results']], ['Sable fin'])
+
+    def test_responses_are_cached_until_the_catalog_changes(self):
+        url = reverse('api:product_detail', args=[self.products[0].id])
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['category'], {'id': self.category.id, 'slug': 'ciment', 'name': 'Ciment'})
+
+        product = self.products[0]
+        product.price = Decimal('27000.00')
+        product.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['price'], '27000.00')
+
+    def test_change_made_by_another_process_is_served(self):
+        url = reverse('api:product_detail', args=[self.products[0].id])
+        self.client.get(url)
+        Product.objects.filter(pk=self.products[0].pk).update(price=Decimal('28000.00'))
+        # Invalidation faite par le processus qui a modifié le produit
+        caches['shared'].set(CATALOG_VERSION_KEY, get_catalog_version() + 1, timeout=None)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['price'], '28000.00')
+
+    def test_availability_follows_stock(self):
+        url = reverse('api:availability')
+        ids = f'{self.products[0].id},{self.products[1].id}'
+        data = self.client.get(url, {'ids': ids}).json()
+        self.assertEqual([item['in_stock'] for item in data], [False, False])
+
+        record_movement(self.products[0], StockMovementType.IN, 12)
+        data = self.client.get(url, {'ids': ids}).json()
+        self.assertEqual(data[0]['stock'], 12)
+        self.assertTrue(data[0]['in_stock'])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(reverse('api:product_list'), {'cursor': 'xx'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api:product_list'), {'category': 'inconnue'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api:availability'), {'ids': 'a,b'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api:product_detail', args=[999])).status_code, 404)
@@ -0,0 +1,141 @@
+"""
+API JSON du catalogue (lecture seule, accès anonyme).
+
+Les réponses sont mises en cache côté serveur sous une clé qui contient la
+version du catalogue (et celle du stock pour la disponibilité) : toute
+modification du catalogue rend les anciennes entrées inaccessibles, sans
+invalidation explicite. Les versions sont partagées par tous les processus
+(``products.cache``) ; les réponses restent dans le cache de chaque
+processus. Un appel servi depuis le cache ne fait aucune requête SQL ni
+aucune sérialisation.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
+
+from core.pagination import InvalidCursor, KeysetPaginator
+from products import facets
+from products.cache import get_catalog_version, get_categories, get_category_or_404, get_stock_version
+from products.models import Product
+
+from .serializers import CategorySerializer, ProductSerializer
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_AVAILABILITY_IDS = 200
+
+
+class CachedCatalogView(APIView):
+    """Vue de base : lecture publique et réponse JSON mise en cache par version."""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    renderer_classes = [JSONRenderer]
+
+    def get_versions(self):
+        return (get_catalog_version(),)
+
+    def get_data(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        versions = ':'.join(str(version) for version in self.get_versions())
+        digest = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        key = f'api:v1:{versions}:{digest}'
+
+        content = cache.get(key)
+        status = 'HIT'
+        if content is None:
+            status = 'MISS'
+            content = JSONRenderer().render(self.get_data(request, *args, **kwargs))
+            cache.set(key, content, getattr(settings, 'CATALOG_API_CACHE_TIMEOUT', 3600))
+        response = HttpResponse(content, content_type='application/json')
+        response['X-Cache'] = status
+        return response
+
+    def requested_fields(self):
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+        return [name.strip() for name in fields.split(',') if name.strip()]
+
+
+class CategoryListView(CachedCatalogView):
+    def get_data(self, request):
+        return CategorySerializer(get_categories(), many=True, fields=self.requested_fields()).data
+
+
+class ProductListView(CachedCatalogView):
+    def get_data(self, request):
+        products = Product.objects.filter(available=True).select_related('category')
+        category_slug = request.query_params.get('category')
+        if category_slug:
+            products = products.filter(category=get_category_or_404(category_slug))
+        products, selected = facets.filter_products(products, request.query_params)
+
+        try:
+            page_size = min(int(request.query_params.get('page_size', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        except ValueError:
+            raise ValidationError({'page_size': "Nombre entier attendu."})
+        if page_size < 1:
+            raise ValidationError({'page_size': "Doit être positif."})
+
+        paginator = KeysetPaginator(products, ('name', 'id'), per_page=page_size)
+        try:
+            page = paginator.get_page(request.query_params.get('cursor'))
+        except InvalidCursor:
+            raise NotFound("Curseur de pagination invalide.")
+
+        next_url = None
+        if page.next_cursor:
+            params = request.query_params.copy()
+            params['cursor'] = page.next_cursor
+            next_url = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+        return {
+            'results': ProductSerializer(
+                page.object_list, many=True, fields=self.requested_fields(), context={'request': request}
+            ).data,
+            'next_cursor': page.next_cursor,
+            'next': next_url,
+        }
+
+
+class ProductDetailView(CachedCatalogView):
+    def get_data(self, request, pk):
+        product = Product.objects.select_related('category').filter(pk=pk, available=True).first()
+        if product is None:
+            raise NotFound("Produit introuvable.")
+        return ProductSerializer(product, fields=self.requested_fields(), context={'request': request}).data
+
+
+class AvailabilityView(CachedCatalogView):
+    """Disponibilité et stock de produits donnés : ``?ids=1,2,3``."""
+
+    def get_versions(self):
+        return (get_catalog_version(), get_stock_version())
+
+    def get_data(self, request):
+        try:
+            ids = [int(value) for value in request.query_params.get('ids', '').split(',') if value.strip()]
+        except ValueError:
+            raise ValidationError({'ids': "Liste d'identifiants séparés par des virgules attendue."})
+        if not ids:
+            raise ValidationError({'ids': "Au moins un identifiant est requis."})
+        if len(ids) > MAX_AVAILABILITY_IDS:
+            raise ValidationError({'ids': f"{MAX_AVAILABILITY_IDS} identifiants au maximum."})
+
+        products = Product.objects.with_stock().filter(pk__in=ids).only('id', 'available')
+        return [
+            {
+                'id': product.id,
+                'available': product.available,
+                'stock': product.stock_quantity,
+                'in_stock': product.in_stock,
+            }
+            for product in products.order_by('id')
+        ]
@@ -0,0 +1,128 @@
+"""
+Compare les écritures sur django_session par requête selon le moteur de sessions.
+
+Scénario : un visiteur anonyme avec un panier non vide parcourt le catalogue
+(pages qui ne modifient pas la session), puis ajoute quelques produits. Le
+visiteur est anonyme car le panier d'un utilisateur connecté est enregistré
+dans ``CartItem`` et non dans la session : seul un panier anonyme fait
+changer la session à chaque ajout. Le script utilise une base de test et des
+caches sur disque temporaires (``core.test_runner``).
+
+Mesure aussi le coût d'une écriture dans le cache des sessions lorsqu'il
+contient déjà beaucoup d'entrées (cache fichier de Django, qui parcourt le
+répertoire à chaque écriture, contre core.caches.FileBasedCache).
+
+Usage : python benchmark_sessions.py [nombre de pages vues] [entrées en cache]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import django
+
+# Configuration de l'environnement Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cement.settings')
+django.setup()
+
+from decimal import Decimal
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from django.urls import reverse
+
+from core.test_runner import TestRunner
+from products.models import Category, Product
+
+CACHE_BACKENDS = [
+    ('fichiers (Django)', 'django.core.cache.backends.filebased.FileBasedCache'),
+    ('fichiers (projet)', 'core.caches.FileBasedCache'),
+]
+
+ENGINES = [
+    ('base de données', 'django.contrib.sessions.backends.db'),
+    ('write-behind', 'core.sessions'),
+]
+
+
+def run(engine, views, products):
+    writes = []
+
+    def count(execute, sql, params, many, context):
+        if 'django_session' in sql and not sql.lstrip().upper().startswith('SELECT'):
+            writes.append(sql)
+        return execute(sql, params, many, context)
+
+    with override_settings(SESSION_ENGINE=engine):
+        # Visiteur anonyme : le panier reste dans la session
+        client = Client()
+        client.post(reverse('cart:cart_add', args=[products[0].id]), {'quantity': 1})
+        if engine == 'core.sessions':
+            from core.sessions import buffer
+            buffer.flush()
+
+        url = reverse('core:product_list')
+        started = time.perf_counter()
+        with connection.execute_wrapper(count):
+            for i in range(views):
+                client.get(url)
+                # Un ajout au panier toutes les dix pages vues
+                if i % 10 == 9:
+                    client.post(reverse('cart:cart_add', args=[products[i % len(products)].id]), {'quantity': 1})
+            if engine == 'core.sessions':
+                buffer.flush()
+        elapsed = time.perf_counter() - started
+    requests = views + views // 10
+    return len(writes), requests, elapsed
+
+
+def cache_writes(backend, entries, writes=200):
+    """Temps moyen (ms) d'une écriture dans un cache qui contient ``entries`` entrées."""
+    from django.utils.module_loading import import_string
+
+    with tempfile.TemporaryDirectory() as location:
+        # Remplissage sans ménage, pour ne mesurer que les écritures
+        filler = import_string('core.caches.FileBasedCache')(location, {'OPTIONS': {'CULL_INTERVAL': 3600}})
+        filler._cull()
+        for i in range(entries):
+            filler.set(f'session.{i}', {'cart': {}}, 3600)
+        cache = import_string(backend)(location, {'OPTIONS': {'MAX_ENTRIES': entries * 2}})
+        started = time.perf_counter()
+        for i in range(writes):
+            cache.set(f'session.{i}', {'cart': {'1': {'quantity': i}}}, 3600)
+        return (time.perf_counter() - started) * 1000 / writes
+
+
+def main():
+    views = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    entries = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    # Base de test et caches sur disque temporaires, comme pour les tests
+    runner = TestRunner()
+    runner.setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        category = Category.objects.create(name='Ciment', slug='ciment')
+        products = [
+            Product.objects.create(
+                name=f'Ciment n°{i}', category=category, cement_type='CPJ42.5',
+                price=Decimal('25000.00'), weight=Decimal('50.00'),
+            )
+            for i in range(20)
+        ]
+        print(f"{'Moteur':<18} {'requêtes':>9} {'écritures':>10} {'écr./req.':>10} {'req./s':>8}")
+        for label, engine in ENGINES:
+            writes, requests, elapsed = run(engine, views, products)
+            print(f"{label:<18} {requests:>9} {writes:>10} {writes / requests:>10.3f} {requests / elapsed:>8.0f}")
+
+        print()
+        print(f"{'Cache':<18} {'entrées':>9} {'ms/écriture':>12}")
+        for label, backend in CACHE_BACKENDS:
+            print(f"{label:<18} {entries:>9} {cache_writes(backend, entries):>12.3f}")
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        runner.teardown_test_environment()
+
+
+if __name__ == "__main__":
+    main()
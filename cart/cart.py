@@ -1,84 +1,133 @@
-from decimal import Decimal
-from django.conf import settings
+"""
+Panier d'achat.
+
+Le contenu est conservé par un stockage (``cart.storage``) : la session pour
+les visiteurs anonymes, la table ``CartItem`` pour les utilisateurs connectés.
+Les produits sont chargés en une seule requête, au premier parcours du
+panier, et les lignes hydratées (``CartLine``) ainsi que les quantités et
+totaux sont mémorisés sur la requête : tous les ``Cart`` créés pendant la
+requête (processeur de contexte, vue) les partagent, et toute modification
+faite via un ``Cart`` les invalide. Le nombre d'articles et le total
+viennent du résumé tenu par le stockage (``Cart.summary``), lu sans charger
+les produits ; les totaux sont calculés en unités mineures entières.
+"""
+from dataclasses import dataclass
+
+from core.money import from_minor, to_minor
+
+from .storage import get_storage
+
+
+@dataclass(frozen=True)
+class CartLine:
+    """Ligne du panier : produit, quantité et prix unitaire mémorisé à l'ajout."""
+    product: object
+    quantity: int
+    unit_price_minor: int
+
+    @property
+    def price(self):
+        return from_minor(self.unit_price_minor)
+
+    @property
+    def total_price_minor(self):
+        return self.unit_price_minor * self.quantity
+
+    @property
+    def total_price(self):
+        return from_minor(self.total_price_minor)
+
 
 class Cart:
     def __init__(self, request):
         """Initialise le panier."""
+        self.request = request
         self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            # Sauvegarder un panier vide dans la session
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+        self.storage = get_storage(request)
 
     def add(self, product, quantity=1, update_quantity=False):
         """Ajoute un produit au panier ou met à jour sa quantité."""
-        product_id = str(product.id)
-        if product_id not in self.cart:
-            self.cart[product_id] = {
-                'quantity': 0,
-                'price': str(product.price)
-            }
-        
-        if update_quantity:
-            self.cart[product_id]['quantity'] = quantity
-        else:
-            self.cart[product_id]['quantity'] += quantity
-        
-        self.save()
-
-    def save(self):
-        """Marque la session comme modifiée pour s'assurer qu'elle est sauvegardée."""
-        self.session.modified = True
+        self.storage.add(product, quantity, update_quantity=update_quantity)
+        self._invalidate()
+
+    def apply(self, operations):
+        """Applique en une fois ``[(produit, quantité, mode), ...]``
+        (modes ``add``, ``set`` et ``remove`` de ``cart.storage``)."""
+        if operations:
+            self.storage.apply(operations)
+            self._invalidate()
 
     def remove(self, product):
-        """Supprime un produit du panier."""
-        product_id = str(product.id)
-        if product_id in self.cart:
-            del self.cart[product_id]
-            self.save()
+        """Supprime un produit (ou un identifiant de produit) du panier."""
+        self.storage.remove(getattr(product, 'id', product))
+        self._invalidate()
+
+    def clear(self):
+        """Vide le panier."""
+        self.storage.clear()
+        self._invalidate()
+
+    def _invalidate(self):
+        self.request._cart_memo = {}
+
+    def _memo(self, name, compute):
+        """Valeur dérivée du panier, calculée une fois par requête (jusqu'à la prochaine modification)."""
+        memo = getattr(self.request, '_cart_memo', None)
+        if memo is None:
+            memo = self.request._cart_memo = {}
+        if name not in memo:
+            memo[name] = compute()
+        return memo[name]
+
+    def summary(self):
+        """Nombre d'articles et total, sans charger les produits (``CartSummary``)."""
+        return self._memo('summary', self.storage.summary)
+
+    def revision(self):
+        return self.summary().revision
+
+    @property
+    def items(self):
+        """``{product_id: (quantité, prix unitaire)}``"""
+        return self._memo('items', self.storage.items)
+
+    @property
+    def lines(self):
+        """Lignes hydratées du panier (une requête, au premier accès)."""
+        return self._memo('lines', self._load_lines)
+
+    def _load_lines(self):
+        items = self.items
+        if not items:
+            return ()
+        products = self.storage.load_products(list(items))
+        if len(products) != len(items):
+            # Produits disparus du catalogue : quantités et totaux à recalculer
+            self.request._cart_memo.pop('items', None)
+            self.request._cart_memo.pop('summary', None)
+        return tuple(
+            CartLine(products[product_id], quantity, to_minor(price))
+            for product_id, (quantity, price) in items.items()
+            if product_id in products
+        )
 
     def __iter__(self):
-        """Parcourt les articles du panier et récupère les produits depuis la base de données."""
-        product_ids = self.cart.keys()
-        # Récupérer les objets produit et les ajouter au panier
-        from products.models import Product
-        products = Product.objects.filter(id__in=product_ids).select_related('category')
-        
-        cart = self.cart.copy()
-        for product in products:
-            product_id = str(product.id)
-            if product_id in cart:
-                cart[product_id]['product'] = {
-                    'id': product.id,
-                    'name': str(product.name),
-                    'price': str(product.price),
-                    'image': product.image.url if hasattr(product, 'image') and product.image else None,
-                    'category': {
-                        'id': product.category.id if hasattr(product, 'category') and product.category else None,
-                        'name': str(product.category.name) if hasattr(product, 'category') and product.category else None
-                    } if hasattr(product, 'category') else None
-                }
-        
-        for item in cart.values():
-            # Ensure all values are JSON serializable
-            item['price'] = float(Decimal(str(item.get('price', 0))))
-            item['total_price'] = float(item['price'] * item.get('quantity', 0))
-            yield item
+        """Parcourt les lignes du panier (produits chargés une seule fois)."""
+        return iter(self.lines)
 
     def __len__(self):
         """Compte tous les articles dans le panier."""
-        return sum(item['quantity'] for item in self.cart.values())
+        return self.summary().item_count
+
+    @property
+    def total_minor(self):
+        """Total du panier en unités mineures."""
+        return self.summary().total_minor
+
+    @property
+    def total_price(self):
+        return from_minor(self.total_minor)
 
     def get_total_price(self):
         """Calcule le coût total des articles dans le panier."""
-        total = sum(
-            Decimal(item['price']) * item['quantity']
-            for item in self.cart.values()
-        )
-        return float(total)  # Convert to float for JSON serialization
-
-    def clear(self):
-        """Vide le panier."""
-        del self.session[settings.CART_SESSION_ID]
-        self.save()
+        return self.total_price
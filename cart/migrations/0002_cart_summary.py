@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:36
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+
+def populate_summaries(apps, schema_editor):
+    Cart = apps.get_model('cart', 'Cart')
+    CartItem = apps.get_model('cart', 'CartItem')
+    summaries = {}
+    for cart_id, quantity, price in CartItem.objects.values_list('cart_id', 'quantity', 'price').iterator():
+        count, total = summaries.get(cart_id, (0, 0))
+        minor = int((Decimal(price) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+        summaries[cart_id] = (count + quantity, total + quantity * minor)
+    Cart.objects.bulk_update(
+        [Cart(pk=cart_id, item_count=count, total_minor=total) for cart_id, (count, total) in summaries.items()],
+        ['item_count', 'total_minor'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, verbose_name="Nombre d'articles"),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total_minor',
+            field=models.BigIntegerField(default=0, verbose_name='Total (centimes)'),
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,9 @@ from decimal import Decimal
 from django.conf import settings
 from products.models import Product
 
+# Quantité maximale d'un produit dans le panier
+MAX_QUANTITY = 100
+
 
 class Cart(models.Model):
     """Modèle pour le panier d'achat"""
@@ -13,6 +16,9 @@ class Cart(models.Model):
         related_name='cart',
         verbose_name="Utilisateur"
     )
+    # Résumé tenu à jour par cart.storage à chaque modification des lignes
+    item_count = models.PositiveIntegerField(default=0, verbose_name="Nombre d'articles")
+    total_minor = models.BigIntegerField(default=0, verbose_name="Total (centimes)")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -51,7 +57,7 @@ class CartItem(models.Model):
     )
     quantity = models.PositiveIntegerField(
         default=1,
-        validators=[MinValueValidator(1), MaxValueValidator(100)],
+        validators=[MinValueValidator(1), MaxValueValidator(MAX_QUANTITY)],
         verbose_name="Quantité"
     )
     price = models.DecimalField(
@@ -78,7 +84,7 @@ class CartItem(models.Model):
         return self.price * self.quantity
 
     def save(self, *args, **kwargs):
-        """Sauvegarde le prix actuel du produit lors de l'ajout au panier"""
-        if not self.pk:  # Nouvel article
+        """Mémorise le prix actuel du produit s'il n'a pas été fourni"""
+        if self.price is None:
             self.price = self.product.price
         super().save(*args, **kwargs)
@@ -0,0 +1,29 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from products.models import Product
+
+from .models import CartItem
+from .storage import merge_session_cart, refresh_summaries
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    """Reprend le panier constitué avant la connexion dans le panier persistant."""
+    if request is None or not hasattr(request, 'session'):
+        return
+    merge_session_cart(request.session, user)
+    request._cart_memo = {}
+
+
+@receiver(pre_delete, sender=Product)
+def remember_carts_of_deleted_product(sender, instance, **kwargs):
+    """Les lignes supprimées en cascade ne passent pas par le stockage : on
+    note les paniers concernés pour recalculer leur résumé."""
+    instance._cart_ids = list(CartItem.objects.filter(product=instance).values_list('cart_id', flat=True))
+
+
+@receiver(post_delete, sender=Product)
+def refresh_carts_of_deleted_product(sender, instance, **kwargs):
+    refresh_summaries(getattr(instance, '_cart_ids', ()))
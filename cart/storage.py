@@ -0,0 +1,387 @@
+"""
+Stockage du panier : session pour les visiteurs anonymes, ``CartItem`` pour
+les utilisateurs connectés.
+
+Les deux stockages exposent la même interface ; chaque ajout ou suppression
+coûte un nombre constant de requêtes, quelle que soit la taille du panier.
+À la connexion, le panier de session est fusionné dans le panier en base
+(``merge_session_cart``) en une transaction.
+
+Chaque stockage tient aussi un résumé (nombre d'articles et total en unités
+mineures, ``CartSummary``) mis à jour à chaque modification : le badge de
+l'en-tête et les réponses d'ajout/suppression le lisent sans charger les
+produits.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.money import from_minor, to_minor
+
+from .models import MAX_QUANTITY, Cart as CartModel, CartItem
+
+SUMMARY_SESSION_KEY = 'cart_summary'
+
+# Modes d'une opération groupée (``apply``)
+MODE_ADD = 'add'
+MODE_SET = 'set'
+MODE_REMOVE = 'remove'
+MODES = (MODE_ADD, MODE_SET, MODE_REMOVE)
+
+
+@dataclass(frozen=True)
+class CartSummary:
+    """Nombre d'articles et total du panier, plus une valeur qui change à
+    chaque modification (``revision``, pour les ETag)."""
+    item_count: int = 0
+    total_minor: int = 0
+    revision: object = None
+
+    @property
+    def total_price(self):
+        return from_minor(self.total_minor)
+
+
+def clamp_quantity(quantity):
+    """Ramène une quantité entre 0 et ``MAX_QUANTITY`` (validateur de ``CartItem``)."""
+    return min(max(quantity, 0), MAX_QUANTITY)
+
+
+def fold_operations(quantities, operations):
+    """Applique dans l'ordre ``[(produit, quantité, mode), ...]`` à
+    ``{product_id: quantité}`` ; une quantité nulle signifie « à retirer »."""
+    quantities = dict(quantities)
+    for product, quantity, mode in operations:
+        if mode == MODE_REMOVE:
+            quantities[product.id] = 0
+        elif mode == MODE_SET:
+            quantities[product.id] = clamp_quantity(quantity)
+        else:
+            quantities[product.id] = clamp_quantity(quantities.get(product.id, 0) + quantity)
+    return quantities
+
+
+class SessionCartStorage:
+    """Panier en session : ``{product_id: {'quantity': int, 'price': str}}``.
+
+    Le dictionnaire n'est jamais modifié en place : chaque modification le
+    remplace, ce qui garde le contenu de la session minimal.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    @property
+    def payload(self):
+        return self.session.get(settings.CART_SESSION_ID) or {}
+
+    def _replace(self, payload):
+        self.session[settings.CART_SESSION_ID] = payload
+        self.session[SUMMARY_SESSION_KEY] = self._summarize(payload)
+        self.session.modified = True
+
+    @staticmethod
+    def _summarize(payload):
+        """``[nombre d'articles, total en unités mineures]`` du contenu, sans requête."""
+        return [
+            sum(item['quantity'] for item in payload.values()),
+            sum(to_minor(item['price']) * item['quantity'] for item in payload.values()),
+        ]
+
+    def summary(self):
+        payload = self.payload
+        if not payload:
+            return CartSummary()
+        # Sessions antérieures au résumé : il est recalculé depuis le contenu
+        count, total = self.session.get(SUMMARY_SESSION_KEY) or self._summarize(payload)
+        return CartSummary(count, total, payload)
+
+    def revision(self):
+        """Valeur qui change à chaque modification du panier (pour les ETag)."""
+        return self.summary().revision
+
+    def items(self):
+        """``{product_id: (quantité, prix unitaire)}`` sans requête."""
+        return {
+            int(product_id): (item['quantity'], Decimal(item['price']))
+            for product_id, item in self.payload.items()
+        }
+
+    def load_products(self, product_ids):
+        from products.models import Product
+
+        products = Product.objects.select_related('category').in_bulk(product_ids)
+        missing = set(product_ids) - set(products)
+        if missing:
+            # Produits supprimés du catalogue depuis leur ajout : on les retire
+            self._replace({key: value for key, value in self.payload.items() if int(key) not in missing})
+        return products
+
+    def add(self, product, quantity, update_quantity=False):
+        payload = self.payload
+        current = payload.get(str(product.id))
+        if update_quantity or current is None:
+            new_quantity = clamp_quantity(quantity)
+        else:
+            new_quantity = clamp_quantity(current['quantity'] + quantity)
+        if new_quantity <= 0:
+            return self.remove(product.id)
+        price = current['price'] if current else str(product.price)
+        self._replace({**payload, str(product.id): {'quantity': new_quantity, 'price': price}})
+
+    def remove(self, product_id):
+        payload = self.payload
+        if str(product_id) in payload:
+            self._replace({key: value for key, value in payload.items() if key != str(product_id)})
+
+    def apply(self, operations):
+        """Applique un lot d'opérations en une seule écriture de session."""
+        payload = dict(self.payload)
+        quantities = fold_operations(
+            {int(key): item['quantity'] for key, item in payload.items()}, operations
+        )
+        products = {product.id: product for product, _quantity, _mode in operations}
+        for product_id, product in products.items():
+            key = str(product_id)
+            if quantities[product_id] <= 0:
+                payload.pop(key, None)
+            else:
+                price = payload[key]['price'] if key in payload else str(product.price)
+                payload[key] = {'quantity': quantities[product_id], 'price': price}
+        self._replace(payload)
+
+    def clear(self):
+        self.session.pop(settings.CART_SESSION_ID, None)
+        self.session.pop(SUMMARY_SESSION_KEY, None)
+        self.session.modified = True
+
+
+class DatabaseCartStorage:
+    """Panier persistant d'un utilisateur connecté (``cart.models.Cart``).
+
+    Chaque modification verrouille d'abord la ligne du panier, ce qui
+    sérialise les requêtes concurrentes du même utilisateur, puis ajuste
+    ``item_count`` et ``total_minor`` par différence dans la même transaction.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._cart_id = None
+
+    @property
+    def cart_id(self):
+        """Identifiant du panier de l'utilisateur, créé au premier ajout."""
+        if self._cart_id is None:
+            self._cart_id = CartModel.objects.get_or_create(user=self.user)[0].pk
+        return self._cart_id
+
+    def _lock(self):
+        """Verrouille (et crée au besoin) le panier ; à appeler dans une transaction."""
+        self._cart_id = CartModel.objects.select_for_update().get_or_create(user=self.user)[0].pk
+
+    def _items(self):
+        return CartItem.objects.filter(cart__user=self.user)
+
+    def _update_summary(self, count_delta, total_delta, now):
+        CartModel.objects.filter(pk=self.cart_id).update(
+            item_count=F('item_count') + count_delta,
+            total_minor=F('total_minor') + total_delta,
+            updated_at=now,
+        )
+
+    def summary(self):
+        """Résumé lu sur la ligne du panier, en une requête."""
+        row = CartModel.objects.filter(user=self.user).values_list(
+            'item_count', 'total_minor', 'updated_at'
+        ).first()
+        return CartSummary(*row) if row else CartSummary()
+
+    def revision(self):
+        """Date de dernière modification du panier, qu'elle vienne de cet appareil ou d'un autre."""
+        return self.summary().revision
+
+    def items(self):
+        """``{product_id: (quantité, prix unitaire)}`` en une requête."""
+        return {
+            product_id: (quantity, price)
+            for product_id, quantity, price in self._items().order_by('created_at', 'id').values_list(
+                'product_id', 'quantity', 'price'
+            )
+        }
+
+    def load_products(self, product_ids):
+        from products.models import Product
+
+        return Product.objects.select_related('category').in_bulk(product_ids)
+
+    @transaction.atomic
+    def add(self, product, quantity, update_quantity=False):
+        self._lock()
+        rows = CartItem.objects.filter(cart_id=self.cart_id, product_id=product.id)
+        item = rows.only('quantity', 'price').first()
+        old_quantity = item.quantity if item is not None else 0
+        new_quantity = clamp_quantity(quantity if update_quantity else old_quantity + quantity)
+        if new_quantity == old_quantity:
+            return
+
+        now = timezone.now()
+        if item is None:
+            item = CartItem.objects.create(
+                cart_id=self.cart_id, product_id=product.id, quantity=new_quantity, price=product.price
+            )
+        elif new_quantity == 0:
+            rows.delete()
+        else:
+            rows.update(quantity=new_quantity, updated_at=now)
+        delta = new_quantity - old_quantity
+        self._update_summary(delta, delta * to_minor(item.price), now)
+
+    @transaction.atomic
+    def apply(self, operations):
+        """Applique un lot d'opérations en un nombre constant de requêtes :
+        lecture des lignes concernées, puis suppression, ``bulk_update`` et
+        ``bulk_create``."""
+        self._lock()
+        products = {product.id: product for product, _quantity, _mode in operations}
+        existing = {
+            item.product_id: item
+            for item in CartItem.objects.filter(cart_id=self.cart_id, product_id__in=products)
+        }
+        quantities = fold_operations(
+            {product_id: item.quantity for product_id, item in existing.items()}, operations
+        )
+
+        now = timezone.now()
+        count_delta = total_delta = 0
+        to_delete, to_update, to_create = [], [], []
+        for product_id, product in products.items():
+            quantity = quantities[product_id]
+            item = existing.get(product_id)
+            old_quantity = item.quantity if item is not None else 0
+            if quantity == old_quantity:
+                continue
+            if item is None:
+                item = CartItem(cart_id=self.cart_id, product_id=product_id, quantity=quantity, price=product.price)
+                to_create.append(item)
+            elif quantity == 0:
+                to_delete.append(item.pk)
+            else:
+                item.quantity = quantity
+                item.updated_at = now
+                to_update.append(item)
+            count_delta += quantity - old_quantity
+            total_delta += (quantity - old_quantity) * to_minor(item.price)
+
+        if to_delete:
+            CartItem.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            CartItem.objects.bulk_update(to_update, ['quantity', 'updated_at'])
+        if to_create:
+            CartItem.objects.bulk_create(to_create)
+        if to_delete or to_update or to_create:
+            self._update_summary(count_delta, total_delta, now)
+
+    @transaction.atomic
+    def remove(self, product_id):
+        self._lock()
+        rows = CartItem.objects.filter(cart_id=self.cart_id, product_id=product_id)
+        item = rows.only('quantity', 'price').first()
+        if item is not None:
+            rows.delete()
+            self._update_summary(-item.quantity, -item.quantity * to_minor(item.price), timezone.now())
+
+    @transaction.atomic
+    def clear(self):
+        self._lock()
+        if CartItem.objects.filter(cart_id=self.cart_id).delete()[0]:
+            CartModel.objects.filter(pk=self.cart_id).update(item_count=0, total_minor=0, updated_at=timezone.now())
+
+
+def get_storage(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return DatabaseCartStorage(user)
+    return SessionCartStorage(request.session)
+
+
+def refresh_summaries(cart_ids):
+    """Recalcule le résumé des paniers ``cart_ids`` depuis leurs lignes
+    (après une suppression en cascade, par exemple)."""
+    cart_ids = set(cart_ids)
+    if not cart_ids:
+        return
+    summaries = dict.fromkeys(cart_ids, (0, 0))
+    for cart_id, quantity, price in CartItem.objects.filter(cart_id__in=cart_ids).values_list(
+        'cart_id', 'quantity', 'price'
+    ):
+        count, total = summaries[cart_id]
+        summaries[cart_id] = (count + quantity, total + quantity * to_minor(price))
+    CartModel.objects.bulk_update(
+        [
+            CartModel(pk=cart_id, item_count=count, total_minor=total)
+            for cart_id, (count, total) in summaries.items()
+        ],
+        ['item_count', 'total_minor'],
+    )
+
+
+@transaction.atomic
+def merge_session_cart(session, user):
+    """Fusionne le panier de session dans le panier en base de ``user``.
+
+    Une requête pour les lignes existantes, une pour les prix des nouveaux
+    produits, puis ``bulk_update`` / ``bulk_create`` ; retourne le nombre de
+    lignes fusionnées.
+    """
+    from products.models import Product
+
+    session_items = SessionCartStorage(session).items()
+    if not session_items:
+        return 0
+
+    cart, _created = CartModel.objects.select_for_update().get_or_create(user=user)
+    existing = {
+        item.product_id: item
+        for item in CartItem.objects.filter(cart=cart, product_id__in=session_items)
+    }
+    prices = dict(
+        Product.objects.filter(pk__in=set(session_items) - set(existing)).values_list('pk', 'price')
+    )
+
+    now = timezone.now()
+    count_delta = total_delta = 0
+    to_update, to_create = [], []
+    for product_id, (quantity, _price) in session_items.items():
+        if product_id in existing:
+            item = existing[product_id]
+            # Les quantités additionnées restent dans la limite du panier
+            added = clamp_quantity(item.quantity + quantity) - item.quantity
+            if not added:
+                continue
+            item.quantity += added
+            item.updated_at = now
+            to_update.append(item)
+        elif product_id in prices:
+            added = clamp_quantity(quantity)
+            if not added:
+                continue
+            item = CartItem(cart=cart, product_id=product_id, quantity=added, price=prices[product_id])
+            to_create.append(item)
+        else:
+            continue
+        count_delta += added
+        total_delta += added * to_minor(item.price)
+
+    CartItem.objects.bulk_update(to_update, ['quantity', 'updated_at'])
+    CartItem.objects.bulk_create(to_create)
+    CartModel.objects.filter(pk=cart.pk).update(
+        item_count=F('item_count') + count_delta,
+        total_minor=F('total_minor') + total_delta,
+        updated_at=now,
+    )
+    SessionCartStorage(session).clear()
+    return len(to_update) + len(to_create)
@@ -1,3 +1,333 @@
-from django.test import TestCase
+import json
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from products.models import Category, Product
+
+from .cart import Cart
+from .models import MAX_QUANTITY, Cart as CartModel, CartItem
+
+
+class SessionCartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Ciment', slug='ciment')
+        cls.products = [
+            Product.objects.create(
+                name=f'Ciment n°{i}', category=category, cement_type='CPJ42.5',
+                price=Decimal('25000.10') + i, weight=Decimal('50.00'),
+            )
+            for i in range(3)
+        ]
+        cls.user = User.objects.create_user('client', password='secret')
+
+    def make_cart(self):
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        return Cart(request)
+
+    def test_lines_are_loaded_once_and_session_stays_minimal(self):
+        cart = self.make_cart()
+        for product in self.products:
+            cart.add(product, quantity=3)
+        payload = cart.session[settings.CART_SESSION_ID]
+
+        with self.assertNumQueries(1):
+            for _ in range(3):
+                lines = list(cart)
+            # Un second Cart sur la même requête réutilise les lignes chargées
+            list(Cart(cart.request))
+        self.assertEqual([line.product for line in lines], self.products)
+        self.assertIs(cart.session[settings.CART_SESSION_ID], payload)
+        self.assertEqual(payload[str(self.products[0].id)], {'quantity': 3, 'price': '25000.10'})
+
+    def test_totals_are_exact(self):
+        cart = self.make_cart()
+        cart.add(self.products[0], quantity=3)
+        cart.add(self.products[1], quantity=7)
+        self.assertEqual(cart.total_minor, 2500010 * 3 + 2500110 * 7)
+        self.assertEqual(cart.get_total_price(), Decimal('250008.00'))
+        self.assertEqual(len(cart), 10)
+
+        cart.add(self.products[1], quantity=1, update_quantity=True)
+        self.assertEqual(cart.get_total_price(), Decimal('100001.40'))
+        cart.remove(self.products[0])
+        self.assertEqual(len(cart), 1)
+        self.assertEqual([line.total_price for line in cart], [Decimal('25001.10')])
+
+    def test_deleted_products_are_dropped(self):
+        cart = self.make_cart()
+        cart.add(self.products[0])
+        cart.add(self.products[2])
+        Product.objects.filter(pk=self.products[2].pk).delete()
+        self.assertEqual(len(list(cart)), 1)
+        self.assertEqual(len(cart), 1)
+        self.assertEqual(cart.get_total_price(), Decimal('25000.10'))
+
+    def test_cart_detail_page(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('cart:cart_add', args=[self.products[0].id]), {'quantity': 2})
+        response = self.client.get(reverse('cart:cart_detail'))
+        self.assertContains(response, 'Ciment n°0')
+        data = self.client.get(reverse('cart:cart_detail'), HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+        self.assertEqual(data['total_price'], '50000.20')
+        self.assertEqual(data['items'][0]['product_id'], self.products[0].id)
+
+
+class PersistentCartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Ciment', slug='ciment')
+        cls.products = [
+            Product.objects.create(
+                name=f'Ciment n°{i:02d}', category=category, cement_type='CPJ42.5',
+                price=Decimal('25000.00') + i, weight=Decimal('50.00'),
+            )
+            for i in range(30)
+        ]
+        cls.user = User.objects.create_user('client', password='secret')
+
+    def make_cart(self, user):
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        request.user = user
+        return Cart(request)
+
+    def count_queries(self, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            func(*args, **kwargs)
+        return len(queries)
+
+    def test_add_and_remove_cost_constant_queries(self):
+        cart = self.make_cart(self.user)
+        cart.add(self.products[0])
+        small = [
+            self.count_queries(cart.add, self.products[1], quantity=2),
+            self.count_queries(cart.add, self.products[1], quantity=1),
+            self.count_queries(cart.remove, self.products[0]),
+        ]
+        for product in self.products[2:]:
+            cart.add(product)
+        # Même coût avec un panier de 29 lignes
+        large = [
+            self.count_queries(cart.add, self.products[0], quantity=2),
+            self.count_queries(cart.add, self.products[0], quantity=1),
+            self.count_queries(cart.remove, self.products[5]),
+        ]
+        self.assertEqual(small, large)
+
+        self.assertEqual(CartItem.objects.filter(cart__user=self.user).count(), 29)
+        self.assertEqual(CartItem.objects.get(cart__user=self.user, product=self.products[1]).quantity, 3)
+
+    def test_database_cart_lines_and_totals(self):
+        cart = self.make_cart(self.user)
+        cart.add(self.products[0], quantity=2)
+        cart.add(self.products[3], quantity=1)
+
+        other = self.make_cart(self.user)
+        # Lignes, produits, puis le résumé du panier
+        with self.assertNumQueries(3):
+            lines = list(other)
+            self.assertEqual(len(other), 3)
+            self.assertEqual(other.get_total_price(), Decimal('75003.00'))
+        self.assertEqual([line.product for line in lines], [self.products[0], self.products[3]])
+
+    def test_session_cart_is_merged_on_login(self):
+        existing_cart = CartModel.objects.create(user=self.user, item_count=1, total_minor=2500000)
+        CartItem.objects.create(cart=existing_cart, product=self.products[0], quantity=1)
+
+        self.client.post(reverse('cart:cart_add', args=[self.products[0].id]), {'quantity': 2})
+        self.client.post(reverse('cart:cart_add', args=[self.products[1].id]), {'quantity': 5})
+        self.assertEqual(CartItem.objects.count(), 1)
+
+        self.client.post(reverse('login'), {'username': 'client', 'password': 'secret'})
+        quantities = dict(CartItem.objects.filter(cart__user=self.user).values_list('product_id', 'quantity'))
+        self.assertEqual(quantities, {self.products[0].id: 3, self.products[1].id: 5})
+        self.assertNotIn(settings.CART_SESSION_ID, self.client.session)
+
+        # Le panier suit l'utilisateur sur un autre appareil
+        other_device = Client()
+        other_device.force_login(self.user)
+        data = other_device.get(reverse('cart:cart_detail'), HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+        self.assertEqual(data['item_count'], 8)
+
+    def test_merged_quantities_stay_within_the_cart_limit(self):
+        existing_cart = CartModel.objects.create(user=self.user, item_count=90, total_minor=90 * 2500000)
+        CartItem.objects.create(cart=existing_cart, product=self.products[0], quantity=90)
+
+        self.client.post(reverse('cart:cart_add', args=[self.products[0].id]), {'quantity': 30})
+        self.client.post(reverse('cart:cart_add', args=[self.products[1].id]), {'quantity': 150})
+        self.client.post(reverse('login'), {'username': 'client', 'password': 'secret'})
+
+        quantities = dict(CartItem.objects.filter(cart__user=self.user).values_list('product_id', 'quantity'))
+        self.assertEqual(quantities, {self.products[0].id: MAX_QUANTITY, self.products[1].id: MAX_QUANTITY})
+        self.assertEqual(CartModel.objects.get(user=self.user).item_count, 2 * MAX_QUANTITY)
+        for item in CartItem.objects.all():
+            item.full_clean()
+
+    def test_anonymous_visitors_can_fill_a_cart(self):
+        response = self.client.post(reverse('cart:cart_add', args=[self.products[0].id]), {'quantity': 2})
+        self.assertEqual(response.json()['cart_item_count'], 2)
+        response = self.client.get(reverse('cart:cart_detail'))
+        self.assertContains(response, 'Ciment n°00')
+
+
+class CartBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Ciment', slug='ciment')
+        cls.products = [
+            Product.objects.create(
+                name=f'Ciment n°{i:02d}', category=category, cement_type='CPJ42.5',
+                price=Decimal('1000.00'), weight=Decimal('50.00'),
+            )
+            for i in range(40)
+        ]
+        cls.unavailable = Product.objects.create(
+            name='Ciment retiré', category=category, cement_type='CPJ42.5',
+            price=Decimal('1000.00'), weight=Decimal('50.00'), available=False,
+        )
+        cls.user = User.objects.create_user('client', password='secret')
+
+    def post(self, operations):
+        return self.client.post(
+            reverse('cart:cart_batch'), json.dumps({'operations': operations}), content_type='application/json'
+        )
+
+    def test_operations_are_applied_and_errors_reported_per_operation(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('cart:cart_add', args=[self.products[2].id]), {'quantity': 4})
+
+        data = self.post([
+            {'product_id': self.products[0].id, 'quantity': 3},
+            {'product_id': self.products[0].id, 'quantity': 2, 'mode': 'add'},
+            {'product_id': self.products[1].id, 'quantity': 10, 'mode': 'set'},
+            {'product_id': self.products[2].id, 'mode': 'remove'},
+            {'product_id': self.unavailable.id, 'quantity': 1},
+            {'product_id': 999999, 'quantity': 1},
+            {'product_id': self.products[3].id, 'quantity': -2},
+            {'product_id': self.products[3].id, 'quantity': 1, 'mode': 'swap'},
+        ]).json()
+
+        self.assertFalse(data['success'])
+        self.assertEqual(data['applied'], 4)
+        self.assertEqual([result['ok'] for result in data['results']], [True] * 4 + [False] * 4)
+        self.assertIn('error', data['results'][4])
+        self.assertEqual(data['cart_item_count'], 15)
+        self.assertEqual(data['cart_total'], '15000.00')
+        quantities = dict(CartItem.objects.filter(cart__user=self.user).values_list('product_id', 'quantity'))
+        self.assertEqual(quantities, {self.products[0].id: 5, self.products[1].id: 10})
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        self.client.force_login(self.user)
+        CartModel.objects.create(user=self.user)
+        counts = []
+        for products in (self.products[:2], self.products[2:]):
+            operations = [{'product_id': product.id, 'quantity': 2} for product in products]
+            with CaptureQueriesContext(connection) as queries:
+                self.assertTrue(self.post(operations).json()['success'])
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(CartItem.objects.filter(cart__user=self.user).count(), 40)
+
+    def test_anonymous_session_cart(self):
+        data = self.post([
+            {'product_id': self.products[0].id, 'quantity': '2'},
+            {'product_id': self.products[1].id, 'quantity': 1},
+            {'product_id': self.products[1].id, 'quantity': 0, 'mode': 'set'},
+        ]).json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['cart_item_count'], 2)
+        self.assertEqual(list(self.client.session[settings.CART_SESSION_ID]), [str(self.products[0].id)])
+
+    def test_invalid_body(self):
+        response = self.client.post(reverse('cart:cart_batch'), 'pas du json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        with self.settings(CART_BATCH_MAX_OPERATIONS=2):
+            response = self.post([{'product_id': product.id} for product in self.products[:3]])
+        self.assertEqual(response.status_code, 400)
+
+
+class CartSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Ciment', slug='ciment')
+        cls.products = [
+            Product.objects.create(
+                name=f'Ciment n°{i}', category=category, cement_type='CPJ42.5',
+                price=Decimal('1000.25') * (i + 1), weight=Decimal('50.00'),
+            )
+            for i in range(3)
+        ]
+        cls.user = User.objects.create_user('client', password='secret')
+
+    def assertSummaryMatchesLines(self):
+        cart = CartModel.objects.get(user=self.user)
+        lines = CartItem.objects.filter(cart=cart)
+        self.assertEqual(cart.item_count, sum(item.quantity for item in lines))
+        self.assertEqual(cart.total_minor, sum(int(item.total_price * 100) for item in lines))
+
+    def test_summary_is_maintained_incrementally(self):
+        self.client.force_login(self.user)
+        add = lambda product, quantity: self.client.post(
+            reverse('cart:cart_add', args=[product.id]), {'quantity': quantity}
+        ).json()
+        self.assertEqual(add(self.products[0], 2)['cart_total'], '2000.50')
+        data = add(self.products[1], 3)
+        self.assertEqual((data['cart_item_count'], data['cart_total']), (5, '8002.00'))
+        self.assertSummaryMatchesLines()
+
+        self.client.post(
+            reverse('cart:cart_batch'),
+            json.dumps({'operations': [
+                {'product_id': self.products[0].id, 'quantity': 1, 'mode': 'set'},
+                {'product_id': self.products[2].id, 'quantity': 2},
+            ]}),
+            content_type='application/json',
+        )
+        self.assertSummaryMatchesLines()
+
+        data = self.client.post(
+            reverse('cart:cart_remove', args=[self.products[1].id]), HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        ).json()
+        self.assertEqual((data['cart_item_count'], data['cart_total']), (3, '7001.75'))
+        self.assertSummaryMatchesLines()
+
+        # Suppression en cascade d'un produit du catalogue
+        self.products[2].delete()
+        self.assertSummaryMatchesLines()
+        self.assertEqual(CartModel.objects.get(user=self.user).item_count, 1)
+
+    def test_header_badge_does_not_load_products(self):
+        self.client.force_login(self.user)
+        for product in self.products:
+            self.client.post(reverse('cart:cart_add', args=[product.id]), {'quantity': 2})
+
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        request.user = self.user
+        with self.assertNumQueries(1):
+            cart = Cart(request)
+            self.assertEqual(len(cart), 6)
+            self.assertEqual(cart.get_total_price(), Decimal('12003.00'))
+            self.assertIsNotNone(Cart(request).revision())
+
+    def test_session_summary(self):
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        cart = Cart(request)
+        cart.add(self.products[0], quantity=4)
+        cart.add(self.products[1])
+        self.assertEqual(request.session['cart_summary'], [5, 600150])
+        with self.assertNumQueries(0):
+            self.assertEqual(len(Cart(request)), 5)
+        cart.clear()
+        self.assertEqual(len(cart), 0)
+        self.assertNotIn('cart_summary', request.session)
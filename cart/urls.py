@@ -5,6 +5,7 @@ app_name = 'cart'
 
 urlpatterns = [
     path('add/<int:product_id>/', views.cart_add, name='cart_add'),
+    path('batch/', views.cart_batch, name='cart_batch'),
     path('remove/<int:product_id>/', views.cart_remove, name='cart_remove'),
     path('', views.cart_detail, name='cart_detail'),
 ]
@@ -1,19 +1,18 @@
+import json
+
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.decorators.http import require_POST
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from products.models import Product
+from products.images import product_image_url
 from .cart import Cart
+from .storage import MODE_ADD, MODE_REMOVE, MODES
 
 @require_POST
 def cart_add(request, product_id):
     """Ajoute un produit au panier ou met à jour sa quantité."""
-    if not request.user.is_authenticated:
-        return JsonResponse(
-            {'error': 'Authentication required'}, 
-            status=403
-        )
-    
     cart = Cart(request)
     product = get_object_or_404(Product, id=product_id)
     
@@ -27,29 +26,105 @@ def cart_add(request, product_id):
         update_quantity=False
     )
     
+    summary = cart.summary()
     return JsonResponse({
         'success': True,
-        'cart_item_count': cart.__len__()
+        'cart_item_count': summary.item_count,
+        'cart_total': str(summary.total_price),
+    })
+
+def _parse_operation(raw):
+    """Retourne ``(product_id, quantité, mode)`` ou lève ``ValueError`` avec le message d'erreur."""
+    if not isinstance(raw, dict):
+        raise ValueError("Opération invalide.")
+    mode = raw.get('mode', MODE_ADD)
+    if mode not in MODES:
+        raise ValueError(f"Mode inconnu : {mode!r}.")
+    product_id = raw.get('product_id')
+    if isinstance(product_id, bool) or not isinstance(product_id, (int, str)) or not str(product_id).isdigit():
+        raise ValueError("Identifiant de produit invalide.")
+    quantity = raw.get('quantity', 1 if mode == MODE_ADD else 0)
+    if mode != MODE_REMOVE:
+        if isinstance(quantity, bool) or not isinstance(quantity, (int, str)):
+            raise ValueError("Quantité invalide.")
+        try:
+            quantity = int(quantity)
+        except ValueError:
+            raise ValueError("Quantité invalide.") from None
+        if quantity < (1 if mode == MODE_ADD else 0):
+            raise ValueError("Quantité invalide.")
+    return int(product_id), quantity, mode
+
+
+@require_POST
+def cart_batch(request):
+    """Applique en une fois une liste d'opérations sur le panier.
+
+    Corps JSON : ``{"operations": [{"product_id": 1, "quantity": 5, "mode": "add"}, ...]}``
+    avec ``mode`` parmi ``add`` (défaut), ``set`` (0 retire la ligne) et
+    ``remove``. Les produits sont validés en une requête et les opérations
+    valides appliquées ensemble ; chaque opération rapporte sa propre erreur.
+    """
+    try:
+        payload = json.loads(request.body)
+        operations = payload['operations'] if isinstance(payload, dict) else payload
+    except (ValueError, KeyError):
+        return JsonResponse({'success': False, 'error': "Corps JSON invalide."}, status=400)
+    if not isinstance(operations, list):
+        return JsonResponse({'success': False, 'error': "« operations » doit être une liste."}, status=400)
+    if len(operations) > settings.CART_BATCH_MAX_OPERATIONS:
+        return JsonResponse({
+            'success': False,
+            'error': f"Au plus {settings.CART_BATCH_MAX_OPERATIONS} opérations par requête.",
+        }, status=400)
+
+    results, parsed = [], []
+    for index, raw in enumerate(operations):
+        result = {'index': index, 'product_id': raw.get('product_id') if isinstance(raw, dict) else None, 'ok': True}
+        try:
+            parsed.append((result, *_parse_operation(raw)))
+        except ValueError as exc:
+            result.update(ok=False, error=str(exc))
+        results.append(result)
+
+    # Une seule requête pour valider tous les produits du lot
+    products = Product.objects.filter(available=True).only('id', 'price').in_bulk(
+        {product_id for _result, product_id, _quantity, _mode in parsed}
+    )
+
+    valid = []
+    for result, product_id, quantity, mode in parsed:
+        product = products.get(product_id)
+        if product is None:
+            result.update(ok=False, error="Produit introuvable ou indisponible.")
+        else:
+            valid.append((product, quantity, mode))
+
+    cart = Cart(request)
+    cart.apply(valid)
+
+    summary = cart.summary()
+    return JsonResponse({
+        'success': all(result['ok'] for result in results),
+        'results': results,
+        'applied': len(valid),
+        'cart_item_count': summary.item_count,
+        'cart_total': str(summary.total_price),
     })
 
 @require_POST
 def cart_remove(request, product_id):
     """Supprime un produit du panier."""
-    if not request.user.is_authenticated:
-        return JsonResponse(
-            {'error': 'Authentication required'}, 
-            status=403
-        )
-    
     cart = Cart(request)
-    product = get_object_or_404(Product, id=product_id)
-    cart.remove(product)
+    # Pas besoin du produit : la ligne est retirée par son identifiant
+    cart.remove(product_id)
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        summary = cart.summary()
         return JsonResponse({
             'success': True,
-            'cart_item_count': cart.__len__(),
-            'cart_total': str(cart.get_total_price())  # Convert Decimal to string
+            'cart_item_count': summary.item_count,
+            'cart_total': str(summary.total_price),
         })
     return redirect('cart:cart_detail')
 
@@ -69,22 +144,15 @@ def cart_detail(request):
             
             # Convert cart items to a serializable format
             for item in cart:
-                item_data = {
-                    'quantity': item.get('quantity', 0),
-                    'price': str(item.get('price', 0)),
-                    'total_price': str(item.get('total_price', 0)),
-                }
-                
-                # Add product data if available
-                if 'product' in item and hasattr(item['product'], 'id'):
-                    item_data.update({
-                        'product_id': item['product'].id,
-                        'product_name': str(item['product'].name),
-                        'image_url': str(item['product'].image.url) if hasattr(item['product'].image, 'url') else None,
-                        'category_name': str(item['product'].category.name) if hasattr(item['product'], 'category') and item['product'].category else None
-                    })
-                
-                cart_data['items'].append(item_data)
+                cart_data['items'].append({
+                    'quantity': item.quantity,
+                    'price': str(item.price),
+                    'total_price': str(item.total_price),
+                    'product_id': item.product.id,
+                    'product_name': item.product.name,
+                    'image_url': product_image_url(item.product, 'thumbnail'),
+                    'category_name': item.product.category.name,
+                })
                     
             return JsonResponse(cart_data, safe=False)
             
@@ -19,13 +19,40 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 PROJECT_ROOT = BASE_DIR.parent
 
 # Configuration des sessions
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'  # Utilise la base de données pour stocker les sessions
+# Sessions en cache local, recopiées en base par lots (voir core/sessions.py)
+SESSION_ENGINE = 'core.sessions'
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_WRITE_BEHIND_DELAY = 2.0  # Délai maximal (secondes) avant écriture en base
+SESSION_WRITE_BEHIND_BATCH = 200  # Écriture immédiate du lot au-delà de ce nombre de sessions
 SESSION_COOKIE_AGE = 1209600  # Durée de vie du cookie de session en secondes (2 semaines)
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True  # La session expire à la fermeture du navigateur
 SESSION_SAVE_EVERY_REQUEST = True  # Rafraîchit la session à chaque requête
 
 # Configuration du panier
 CART_SESSION_ID = 'cart'
+CART_BATCH_MAX_OPERATIONS = 100  # Opérations acceptées par requête sur /panier/batch/
+
+# Boîte d'envoi des emails (core.outbox, commande send_outbox)
+OUTBOX_BATCH_SIZE = 50  # Emails envoyés par connexion SMTP
+OUTBOX_MAX_ATTEMPTS = 5  # Tentatives avant abandon
+OUTBOX_RETRY_DELAY = 60  # Délai avant le 2e essai (secondes), doublé à chaque échec
+OUTBOX_LEASE = 300  # Durée de réservation d'un lot par un worker (secondes)
+
+IDEMPOTENCY_KEY_TTL = 24 * 3600  # Durée de validité d'une clé d'idempotence (secondes)
+
+# Factures (orders.invoices)
+ORDER_TAX_RATE = '0.20'  # Taux de TVA appliqué aux nouvelles commandes
+INVOICE_ISSUER = {
+    'name': 'Votre Entreprise',
+    'address': ['123 Rue du Commerce', '75001 Paris, France', 'Tél: +33 1 23 45 67 89'],
+    'email': 'contact@votreboutique.com',
+}
+
+# Compteurs du tableau de bord (core.counters, commande reconcile_counters)
+COUNTERS_DAY_RETENTION = 7  # Jours de compteurs journaliers conservés
+
+# Agrégats des ventes (reports.rollups, commande rollup_sales)
+REPORTS_ROLLUP_OVERLAP = 300  # Recouvrement entre deux passages (secondes)
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/6.0/howto/deployment/checklist/
@@ -59,6 +86,8 @@ INSTALLED_APPS = [
     'cart.apps.CartConfig',
     'orders.apps.OrdersConfig',
     'chatbot.apps.ChatbotConfig',
+    'api.apps.ApiConfig',
+    'reports.apps.ReportsConfig',
 ]
 
 MIDDLEWARE = [
@@ -98,6 +127,10 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10
 }
 
+# Durée de conservation des réponses de l'API du catalogue (les clés changent
+# à chaque modification du catalogue, l'expiration ne sert qu'au ménage)
+CATALOG_API_CACHE_TIMEOUT = 60 * 60
+
 ROOT_URLCONF = 'cement.urls'
 
 # Configuration des templates
@@ -134,6 +167,31 @@ DATABASES = {
     }
 }
 
+# Caches : mémoire du processus par défaut ; fichiers locaux (partagés par
+# tous les processus de la machine) pour les sessions et pour les versions du
+# catalogue. Le ménage du cache des sessions (parcours du répertoire) n'a lieu
+# qu'une fois par minute et par processus, pas à chaque écriture (voir
+# core/caches.py). Sur plusieurs machines, 'shared' et 'sessions' doivent
+# pointer vers un cache commun (Redis, Memcached).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'core.caches.FileBasedCache',
+        'LOCATION': str(PROJECT_ROOT / 'cache' / 'shared'),
+    },
+    'sessions': {
+        'BACKEND': 'core.caches.FileBasedCache',
+        'LOCATION': str(PROJECT_ROOT / 'cache' / 'sessions'),
+        'OPTIONS': {'MAX_ENTRIES': 100000, 'CULL_INTERVAL': 60},
+    },
+}
+CATALOG_VERSION_CACHE_ALIAS = 'shared'  # Versions du catalogue (products/cache.py)
+
+# Redirige les caches sur disque vers un répertoire temporaire pendant les tests
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -173,6 +231,29 @@ STATIC_ROOT = PROJECT_ROOT / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = PROJECT_ROOT / 'media'
 
+# Stockages : les factures (coordonnées des clients) sont rangées hors de
+# MEDIA_ROOT, dans un répertoire qui n'est jamais servi ; elles ne sont
+# envoyées que par les vues de facture, après le contrôle d'accès
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    'invoices': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {
+            'location': PROJECT_ROOT / 'private' / 'invoices',
+            'directory_permissions_mode': 0o700,
+            'file_permissions_mode': 0o600,
+        },
+    },
+}
+
+# Génération des déclinaisons d'images produit en arrière-plan (False : dans la requête)
+PRODUCT_IMAGE_DERIVATIVES_ASYNC = True
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/6.0/ref/settings/#default-auto-field
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -25,6 +25,9 @@ urlpatterns = [
     path('', include('core.urls')),
     path('panier/', include('cart.urls', namespace='cart')),
     path('commandes/', include('orders.urls', namespace='orders')),
+    path('gestion/', include('products.urls', namespace='products')),
+    path('api/v1/', include('api.urls', namespace='api')),
+    path('rapports/', include('reports.urls', namespace='reports')),
     
     # URLs d'authentification personnalisées
     path('compte/connexion/', auth_views.LoginView.as_view(template_name='registration/login.html', next_page='core:home'), name='login'),
@@ -0,0 +1,30 @@
+"""
+Backends de cache du projet.
+
+``FileBasedCache`` de Django parcourt tout le répertoire du cache à chaque
+``set()`` pour savoir s'il faut faire de la place : une écriture coûte
+O(nombre d'entrées), ce qui annule le gain des sessions en cache dès qu'elles
+sont nombreuses. Le backend ci-dessous ne fait ce ménage qu'une fois toutes
+les ``CULL_INTERVAL`` secondes par processus ; entre deux passages, le cache
+peut dépasser ``MAX_ENTRIES`` du nombre d'écritures de l'intervalle.
+"""
+import threading
+import time
+
+from django.core.cache.backends import filebased
+
+
+class FileBasedCache(filebased.FileBasedCache):
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._cull_interval = params.get('OPTIONS', {}).get('CULL_INTERVAL', 60)
+        self._cull_lock = threading.Lock()
+        self._next_cull = 0
+
+    def _cull(self):
+        now = time.monotonic()
+        with self._cull_lock:
+            if now < self._next_cull:
+                return
+            self._next_cull = now + self._cull_interval
+        super()._cull()
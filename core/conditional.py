@@ -0,0 +1,64 @@
+"""
+Requêtes conditionnelles (ETag / Last-Modified) pour les pages du catalogue.
+
+Chaque vue fournit l'état du catalogue dont dépend la page : horodatages
+``updated_at`` pour une fiche produit, versions du catalogue et du stock pour
+une liste. Ces versions sont lues dans le cache partagé par tous les
+processus (``products.cache``) : une modification faite dans un processus
+change l'ETag dans tous les autres.
+
+L'ETag y ajoute ce qui varie d'un visiteur à l'autre dans le gabarit de base
+(utilisateur, panier, cookie CSRF) ; une réponse 304 est donc renvoyée sans
+exécuter la vue ni rendre le gabarit.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib import messages
+from django.views.decorators.http import condition
+
+from cart.cart import Cart
+
+
+def visitor_state(request):
+    """Éléments propres au visiteur qui apparaissent dans le gabarit de base."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        identity = [user.pk, user.is_staff, user.is_superuser]
+    else:
+        identity = None
+    cart = Cart(request).revision() if hasattr(request, 'session') else None
+    return [identity, cart, request.COOKIES.get(settings.CSRF_COOKIE_NAME)]
+
+
+def _validators(state_func, request, *args, **kwargs):
+    """Calcule une seule fois par requête ``(etag, last_modified)``."""
+    if not hasattr(request, '_catalog_validators'):
+        validators = (None, None)
+        # Des messages en attente doivent être affichés (et consommés) par le rendu
+        if not len(messages.get_messages(request)):
+            state = state_func(request, *args, **kwargs)
+            if state is not None:
+                parts, last_modified = state
+                visitor = visitor_state(request)
+                payload = json.dumps([parts, visitor], default=str, sort_keys=True)
+                etag = hashlib.sha1(payload.encode()).hexdigest()
+                # Sans ETag (If-Modified-Since seul), une date ne peut pas
+                # refléter le panier : elle n'est envoyée que pour une page
+                # identique pour tous les visiteurs anonymes.
+                if visitor[0] is not None or visitor[1] is not None:
+                    last_modified = None
+                validators = (etag, last_modified)
+        request._catalog_validators = validators
+    return request._catalog_validators
+
+
+def catalog_condition(state_func):
+    """Décorateur de vue : ``state_func(request, *args, **kwargs)`` retourne
+    ``(éléments de l'ETag, date de dernière modification ou None)``, ou ``None``
+    pour désactiver la requête conditionnelle."""
+    return condition(
+        etag_func=lambda request, *args, **kwargs: _validators(state_func, request, *args, **kwargs)[0],
+        last_modified_func=lambda request, *args, **kwargs: _validators(state_func, request, *args, **kwargs)[1],
+    )
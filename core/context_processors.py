@@ -1,14 +1,14 @@
-from products.models import Category
+from products.cache import get_categories
 from cart.cart import Cart
 
 def ecommerce_processor(request):
     """Ajoute des variables communes au contexte de toutes les vues."""
     context = {
-        'categories': Category.objects.all()
+        'categories': get_categories()
     }
     
-    # Ajouter le panier si l'utilisateur est authentifié
-    if hasattr(request, 'user') and request.user.is_authenticated:
+    # Panier en base pour les utilisateurs connectés, en session sinon
+    if hasattr(request, 'session'):
         context['cart'] = Cart(request)
     
     return context
@@ -0,0 +1,205 @@
+"""
+Compteurs du tableau de bord.
+
+Au lieu de compter les tables à chaque affichage, le tableau de bord lit une
+petite table de compteurs (``Counter``) en une requête (``snapshot``). Les
+compteurs sont tenus à jour par les signaux des produits, utilisateurs et
+commandes (``core.signals``), dans la transaction de l'écriture : chaque
+enregistrement applique la différence entre l'état précédent et le nouvel
+état, en un seul ``UPDATE`` (``increment``).
+
+Les écritures qui ne passent pas par les signaux (``queryset.update()``,
+SQL direct) doivent appeler ``increment`` elles-mêmes ; sinon, la commande
+``reconcile_counters`` (à planifier) recalcule les valeurs exactes et corrige
+la dérive. Les valeurs initiales sont calculées par la migration qui crée la
+table (``core/migrations/0003_counter.py``).
+
+Les compteurs journaliers (``revenue.AAAA-MM-JJ``, ...) sont datés en heure
+locale et conservés ``COUNTERS_DAY_RETENTION`` jours.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from orders.models import Order
+from products.models import Product
+
+from .models import Counter
+from .money import to_minor
+
+PRODUCTS = 'products'
+USERS = 'users'
+ORDERS = 'orders'
+UNPAID_ORDERS = 'orders.unpaid'
+UNPAID_AMOUNT = 'orders.unpaid.amount'
+
+# Préfixes des compteurs journaliers
+DAILY_REVENUE = 'revenue'
+DAILY_ORDERS = 'orders.new'
+DAILY_USERS = 'users.new'
+DAILY_PREFIXES = (DAILY_REVENUE, DAILY_ORDERS, DAILY_USERS)
+
+
+def status_counter(status):
+    return f'orders.status.{status}'
+
+
+def daily_counter(prefix, day):
+    return f'{prefix}.{day.isoformat()}'
+
+
+def _local_day(value):
+    return timezone.localtime(value).date()
+
+
+def _is_daily(name):
+    return name.rsplit('.', 1)[0] in DAILY_PREFIXES
+
+
+def _retention():
+    return getattr(settings, 'COUNTERS_DAY_RETENTION', 7)
+
+
+def increment(deltas):
+    """Ajoute ``deltas`` (``{nom: différence}``) aux compteurs, en un ``UPDATE``
+    tant que les compteurs existent ; à appeler dans la transaction de l'écriture."""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    change = Case(
+        *[When(name=name, then=Value(delta)) for name, delta in deltas.items()],
+        output_field=BigIntegerField(),
+    )
+    updated = Counter.objects.filter(name__in=deltas).update(value=F('value') + change, updated_at=timezone.now())
+    if updated == len(deltas):
+        return
+    existing = set(Counter.objects.filter(name__in=deltas).values_list('name', flat=True))
+    missing = {name: delta for name, delta in deltas.items() if name not in existing}
+    try:
+        with transaction.atomic():
+            Counter.objects.bulk_create([Counter(name=name, value=delta) for name, delta in missing.items()])
+    except IntegrityError:
+        # Créé entre-temps par une écriture concurrente
+        increment(missing)
+
+
+def combine(*deltas):
+    total = {}
+    for delta in deltas:
+        for name, value in delta.items():
+            total[name] = total.get(name, 0) + value
+    return total
+
+
+def order_deltas(order, sign=1):
+    """Contribution d'une commande aux compteurs (``sign=-1`` pour la retirer)."""
+    day = _local_day(order.created_at)
+    counted = order.status not in Order.REVERSED_STATUSES
+    unpaid = counted and not order.paid
+    amount = to_minor(order.total_amount)
+    return {
+        ORDERS: sign,
+        status_counter(order.status): sign,
+        UNPAID_ORDERS: sign * unpaid,
+        UNPAID_AMOUNT: sign * amount * unpaid,
+        daily_counter(DAILY_ORDERS, day): sign,
+        daily_counter(DAILY_REVENUE, day): sign * amount * counted,
+    }
+
+
+def user_deltas(user, sign=1):
+    return {
+        USERS: sign,
+        daily_counter(DAILY_USERS, _local_day(user.date_joined)): sign,
+    }
+
+
+def snapshot(today=None):
+    """Valeurs affichées par le tableau de bord, lues en une requête."""
+    today = today or timezone.localdate()
+    names = {
+        'product_count': PRODUCTS,
+        'user_count': USERS,
+        'order_count': ORDERS,
+        'unpaid_count': UNPAID_ORDERS,
+        'unpaid_amount': UNPAID_AMOUNT,
+        'today_revenue': daily_counter(DAILY_REVENUE, today),
+        'today_orders': daily_counter(DAILY_ORDERS, today),
+        'today_users': daily_counter(DAILY_USERS, today),
+    }
+    statuses = {code: status_counter(code) for code, _label in Order.STATUS_CHOICES}
+    values = dict(Counter.objects.filter(name__in=[*names.values(), *statuses.values()]).values_list('name', 'value'))
+    data = {key: values.get(name, 0) for key, name in names.items()}
+    data['status_counts'] = [
+        {'status': code, 'label': label, 'count': values.get(statuses[code], 0)}
+        for code, label in Order.STATUS_CHOICES
+    ]
+    return data
+
+
+def expected_values(today=None):
+    """Valeurs exactes des compteurs, recalculées depuis les tables."""
+    today = today or timezone.localdate()
+    days = [today - timedelta(days=offset) for offset in range(_retention())]
+    since = timezone.make_aware(datetime.combine(days[-1], time.min))
+
+    values = {
+        PRODUCTS: Product.objects.count(),
+        USERS: get_user_model().objects.count(),
+        ORDERS: 0,
+    }
+    for code, _label in Order.STATUS_CHOICES:
+        values[status_counter(code)] = 0
+    for day in days:
+        for prefix in DAILY_PREFIXES:
+            values[daily_counter(prefix, day)] = 0
+
+    for row in Order.objects.order_by().values('status').annotate(count=Count('pk')):
+        values[status_counter(row['status'])] = row['count']
+        values[ORDERS] += row['count']
+    unpaid = Order.objects.filter(paid=False).exclude(status__in=Order.REVERSED_STATUSES).aggregate(
+        count=Count('pk'), amount=Sum('total_amount')
+    )
+    values[UNPAID_ORDERS] = unpaid['count']
+    values[UNPAID_AMOUNT] = to_minor(unpaid['amount'] or 0)
+
+    counted = ~Q(status__in=Order.REVERSED_STATUSES)
+    for row in Order.objects.filter(created_at__gte=since).annotate(day=TruncDate('created_at')).values(
+        'day'
+    ).annotate(count=Count('pk'), revenue=Sum('total_amount', filter=counted)).order_by():
+        values[daily_counter(DAILY_ORDERS, row['day'])] = row['count']
+        values[daily_counter(DAILY_REVENUE, row['day'])] = to_minor(row['revenue'] or 0)
+    for row in get_user_model().objects.filter(date_joined__gte=since).annotate(
+        day=TruncDate('date_joined')
+    ).values('day').annotate(count=Count('pk')).order_by():
+        values[daily_counter(DAILY_USERS, row['day'])] = row['count']
+    return values
+
+
+@transaction.atomic
+def reconcile(today=None):
+    """Corrige les compteurs qui ont dérivé et supprime les compteurs
+    journaliers expirés ; retourne les noms corrigés."""
+    # Verrou d'abord : les écritures concurrentes attendent la fin du recalcul
+    # et s'appliquent ensuite sur les valeurs exactes
+    current = dict(Counter.objects.select_for_update().values_list('name', 'value'))
+    expected = expected_values(today)
+
+    # Un compteur absent vaut zéro ; les compteurs permanents manquants sont
+    # tout de même créés, pour qu'une écriture ne coûte ensuite qu'une mise à jour
+    corrected = sorted(name for name, value in expected.items() if current.get(name, 0) != value)
+    missing = [name for name in expected if name not in current and not _is_daily(name)]
+    Counter.objects.bulk_create(
+        [Counter(name=name, value=expected[name]) for name in sorted({*corrected, *missing})],
+        update_conflicts=True,
+        unique_fields=['name'],
+        update_fields=['value', 'updated_at'],
+    )
+    expired = [name for name in current if name not in expected and _is_daily(name)]
+    Counter.objects.filter(name__in=expired).delete()
+    return corrected
@@ -0,0 +1,88 @@
+"""
+Clés d'idempotence pour les requêtes POST rejouables (double clic, nouvel
+essai d'un client mobile).
+
+Le client envoie une clé (champ ``idempotency_key`` ou en-tête
+``Idempotency-Key``). ``reserve`` insère la clé dans la transaction de
+l'opération : la contrainte d'unicité ne laisse passer qu'une requête ; une
+requête concurrente avec la même clé attend la validation de la première
+puis échoue à l'insertion et lève ``DuplicateRequest`` avec le résultat
+d'origine. Les clés expirent après ``IDEMPOTENCY_KEY_TTL`` secondes
+(commande ``purge_idempotency_keys``).
+"""
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+KEY_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+class InvalidKey(ValueError):
+    pass
+
+
+class DuplicateRequest(Exception):
+    """La clé a déjà été utilisée ; ``result_id`` est l'objet créé par la première requête."""
+
+    def __init__(self, result_id):
+        self.result_id = result_id
+        super().__init__(f"Requête déjà traitée (résultat : {result_id})")
+
+
+def get_key(request):
+    """Clé fournie par le client, ``None`` s'il n'en fournit pas ; lève ``InvalidKey`` si elle est mal formée."""
+    key = request.POST.get('idempotency_key') or request.headers.get('Idempotency-Key')
+    if not key:
+        return None
+    if not KEY_PATTERN.match(key):
+        raise InvalidKey(key)
+    return key
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 3600))
+
+
+def lookup(user, scope, key):
+    """Résultat déjà enregistré pour cette clé, ou ``None``."""
+    return (
+        IdempotencyKey.objects.filter(user=user, scope=scope, key=key, expires_at__gt=timezone.now())
+        .exclude(result_id=None)
+        .values_list('result_id', flat=True)
+        .first()
+    )
+
+
+def reserve(user, scope, key):
+    """Réserve la clé dans la transaction en cours et retourne l'enregistrement.
+
+    Lève ``DuplicateRequest`` si une autre requête l'a déjà utilisée.
+    """
+    now = timezone.now()
+    # Une clé expirée peut être réutilisée
+    IdempotencyKey.objects.filter(user=user, scope=scope, key=key, expires_at__lte=now).delete()
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(user=user, scope=scope, key=key, expires_at=now + _ttl())
+    except IntegrityError:
+        result_id = (
+            IdempotencyKey.objects.filter(user=user, scope=scope, key=key)
+            .values_list('result_id', flat=True)
+            .first()
+        )
+        raise DuplicateRequest(result_id) from None
+
+
+def complete(record, result_id):
+    """Associe à la clé l'objet créé par la requête."""
+    IdempotencyKey.objects.filter(pk=record.pk).update(result_id=result_id)
+
+
+def purge_expired():
+    """Supprime les clés expirées ; retourne leur nombre."""
+    return IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()[0]
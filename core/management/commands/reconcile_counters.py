@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recalcule les compteurs du tableau de bord et corrige ceux qui ont dérivé"
+
+    def handle(self, *args, **options):
+        corrected = reconcile()
+        for name in corrected:
+            self.stdout.write(f"  {name}")
+        self.stdout.write(self.style.SUCCESS(f"{len(corrected)} compteurs corrigés."))
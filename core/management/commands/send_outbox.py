@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.outbox import drain
+
+
+class Command(BaseCommand):
+    help = "Envoie les emails en attente de la boîte d'envoi (pool de threads, une connexion SMTP par lot)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help="Nombre de threads d'envoi"
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=getattr(settings, 'OUTBOX_BATCH_SIZE', 50),
+            help="Nombre d'emails envoyés par connexion SMTP"
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Continue de surveiller la boîte d'envoi au lieu de s'arrêter quand elle est vide"
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help="Pause entre deux passages avec --loop (secondes)"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = drain(workers=options['workers'], batch_size=options['batch_size'])
+            if sent or failed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{sent} emails envoyés, {failed} en échec."
+                ))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:58
+
+from datetime import datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# Copie figée du calcul des compteurs (core.counters.expected_values) au moment de cette migration
+STATUSES = ('en_attente', 'payee', 'en_preparation', 'expediee', 'livree', 'annulee', 'remboursee')
+REVERSED_STATUSES = ('annulee', 'remboursee')
+DAILY_PREFIXES = ('revenue', 'orders.new', 'users.new')
+
+
+def to_minor(amount):
+    return int((Decimal(amount) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def populate_counters(apps, schema_editor):
+    Counter = apps.get_model('core', 'Counter')
+    Order = apps.get_model('orders', 'Order')
+    Product = apps.get_model('products', 'Product')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    today = timezone.localdate()
+    days = [today - timedelta(days=offset) for offset in range(getattr(settings, 'COUNTERS_DAY_RETENTION', 7))]
+    since = timezone.make_aware(datetime.combine(days[-1], time.min))
+
+    values = {'products': Product.objects.count(), 'users': User.objects.count(), 'orders': 0}
+    for status in STATUSES:
+        values[f'orders.status.{status}'] = 0
+    for row in Order.objects.order_by().values('status').annotate(count=Count('pk')):
+        values[f"orders.status.{row['status']}"] = row['count']
+        values['orders'] += row['count']
+    unpaid = Order.objects.filter(paid=False).exclude(status__in=REVERSED_STATUSES).aggregate(
+        count=Count('pk'), amount=Sum('total_amount')
+    )
+    values['orders.unpaid'] = unpaid['count']
+    values['orders.unpaid.amount'] = to_minor(unpaid['amount'] or 0)
+
+    # Compteurs journaliers : seuls les jours non nuls sont créés
+    counted = ~Q(status__in=REVERSED_STATUSES)
+    for row in Order.objects.filter(created_at__gte=since).annotate(day=TruncDate('created_at')).values(
+        'day'
+    ).annotate(count=Count('pk'), revenue=Sum('total_amount', filter=counted)).order_by():
+        values[f"orders.new.{row['day'].isoformat()}"] = row['count']
+        values[f"revenue.{row['day'].isoformat()}"] = to_minor(row['revenue'] or 0)
+    for row in User.objects.filter(date_joined__gte=since).annotate(day=TruncDate('date_joined')).values(
+        'day'
+    ).annotate(count=Count('pk')).order_by():
+        values[f"users.new.{row['day'].isoformat()}"] = row['count']
+
+    Counter.objects.bulk_create([
+        Counter(name=name, value=value)
+        for name, value in sorted(values.items())
+        if value or name.rsplit('.', 1)[0] not in DAILY_PREFIXES
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_idempotencykey'),
+        ('orders', '0008_orderstatuslog'),
+        ('products', '0011_backfill_stock_balances'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('name', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='Compteur')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Valeur')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Compteur',
+                'verbose_name_plural': 'Compteurs',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,87 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class OutboundEmail(models.Model):
+    """Email en attente d'envoi (boîte d'envoi transactionnelle).
+
+    Écrit dans la même transaction que l'opération qui le déclenche, puis
+    envoyé par la commande ``send_outbox`` (voir ``core.outbox``).
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'En attente'),
+        (SENT, 'Envoyé'),
+        (FAILED, 'Abandonné'),
+    ]
+
+    subject = models.CharField(max_length=255, verbose_name="Objet")
+    body = models.TextField(verbose_name="Texte")
+    html_body = models.TextField(blank=True, verbose_name="HTML")
+    from_email = models.CharField(max_length=254, verbose_name="Expéditeur")
+    to = models.JSONField(default=list, verbose_name="Destinataires")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name="Statut")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Tentatives")
+    next_attempt_at = models.DateTimeField(verbose_name="Prochaine tentative")
+    claim = models.CharField(max_length=32, blank=True, verbose_name="Lot d'envoi")
+    last_error = models.TextField(blank=True, verbose_name="Dernière erreur")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Envoyé le")
+
+    class Meta:
+        verbose_name = "Email sortant"
+        verbose_name_plural = "Emails sortants"
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {', '.join(self.to)}"
+
+
+class IdempotencyKey(models.Model):
+    """Clé d'idempotence fournie par le client pour une opération (``core.idempotency``).
+
+    La contrainte d'unicité garantit qu'une seule requête par clé aboutit,
+    même quand les doublons arrivent en même temps.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Utilisateur"
+    )
+    scope = models.CharField(max_length=50, verbose_name="Opération")
+    key = models.CharField(max_length=64, verbose_name="Clé")
+    result_id = models.BigIntegerField(null=True, blank=True, verbose_name="Objet créé")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True, verbose_name="Expire le")
+
+    class Meta:
+        verbose_name = "Clé d'idempotence"
+        verbose_name_plural = "Clés d'idempotence"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key}"
+
+
+class Counter(models.Model):
+    """Compteur tenu à jour incrémentalement (``core.counters``) pour le
+    tableau de bord ; les montants sont en unités mineures (``core.money``)."""
+    name = models.CharField(max_length=64, primary_key=True, verbose_name="Compteur")
+    value = models.BigIntegerField(default=0, verbose_name="Valeur")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Compteur"
+        verbose_name_plural = "Compteurs"
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
@@ -0,0 +1,21 @@
+"""
+Montants en unités mineures (centièmes) pour des calculs exacts.
+
+Les prix sont des ``Decimal`` à deux décimales ; les totaux sont calculés sur
+des entiers (centièmes) puis reconvertis, ce qui évite les erreurs d'arrondi
+des flottants et les conversions répétées.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+MINOR_UNITS = 100
+CENT = Decimal('0.01')
+
+
+def to_minor(amount):
+    """``Decimal('25000.50')`` -> ``2500050``."""
+    return int((Decimal(amount) * MINOR_UNITS).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def from_minor(minor):
+    """``2500050`` -> ``Decimal('25000.50')``."""
+    return (Decimal(minor) / MINOR_UNITS).quantize(CENT)
@@ -0,0 +1,158 @@
+"""
+Boîte d'envoi transactionnelle.
+
+Les emails ne sont plus envoyés pendant la requête : ``queue_email`` les
+enregistre (``OutboundEmail``) dans la transaction de l'opération qui les
+déclenche, donc un email n'existe que si la commande a bien été validée, et
+la latence SMTP ne pèse plus sur la réponse.
+
+La commande ``send_outbox`` vide la boîte avec un pool de threads. Chaque
+thread réserve un lot d'emails dus (``claim_batch``, sans risque de doublon
+entre workers), les envoie sur une seule connexion SMTP (``send_batch``) puis
+enregistre le résultat : envoyé, ou nouvel essai après un délai croissant
+(``OUTBOX_RETRY_DELAY`` × 2^(tentatives - 1)), jusqu'à ``OUTBOX_MAX_ATTEMPTS``.
+"""
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection as db_connection
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# Délai maximal entre deux tentatives
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+
+def queue_email(subject, to, template_name=None, context=None, body='', html_body='', from_email=None):
+    """Met un email en attente d'envoi ; à appeler dans la transaction de l'opération."""
+    if template_name:
+        html_body = render_to_string(template_name, context or {})
+        body = body or strip_tags(html_body)
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+        next_attempt_at=timezone.now(),
+    )
+
+
+def retry_delay(attempts):
+    """Délai avant la tentative suivant la ``attempts``-ième."""
+    base = getattr(settings, 'OUTBOX_RETRY_DELAY', 60)
+    return min(timedelta(seconds=base * 2 ** (attempts - 1)), MAX_RETRY_DELAY)
+
+
+def claim_batch(limit):
+    """Réserve jusqu'à ``limit`` emails dus et les retourne.
+
+    La réservation repousse ``next_attempt_at`` de ``OUTBOX_LEASE`` secondes
+    par une mise à jour conditionnelle : un autre worker ne peut pas prendre
+    les mêmes emails, et ceux d'un worker interrompu redeviennent dus à la fin
+    du bail.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = OutboundEmail.objects.filter(status=OutboundEmail.PENDING, next_attempt_at__lte=now)
+    ids = list(due.order_by('next_attempt_at', 'pk').values_list('pk', flat=True)[:limit])
+    if not ids:
+        return []
+    lease = timedelta(seconds=getattr(settings, 'OUTBOX_LEASE', 300))
+    due.filter(pk__in=ids).update(claim=token, next_attempt_at=now + lease)
+    return list(OutboundEmail.objects.filter(claim=token))
+
+
+def send_batch(emails, connection=None):
+    """Envoie ``emails`` sur une seule connexion et enregistre le résultat ;
+    retourne ``(envoyés, en échec)``."""
+    connection = connection or get_connection()
+    sent, failed = [], []
+    try:
+        connection.open()
+    except Exception as exc:
+        failed = [(email, exc) for email in emails]
+    else:
+        try:
+            for email in emails:
+                message = EmailMultiAlternatives(
+                    email.subject, email.body, email.from_email, email.to, connection=connection
+                )
+                if email.html_body:
+                    message.attach_alternative(email.html_body, 'text/html')
+                try:
+                    message.send()
+                except Exception as exc:
+                    failed.append((email, exc))
+                else:
+                    sent.append(email)
+        finally:
+            connection.close()
+    record_results(sent, failed)
+    return len(sent), len(failed)
+
+
+def record_results(sent, failed):
+    now = timezone.now()
+    if sent:
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in sent]).update(
+            status=OutboundEmail.SENT, sent_at=now, attempts=F('attempts') + 1, claim='', last_error='',
+        )
+    if not failed:
+        return
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+    for email, exc in failed:
+        email.attempts += 1
+        email.claim = ''
+        email.last_error = f"{type(exc).__name__}: {exc}"
+        if email.attempts >= max_attempts:
+            email.status = OutboundEmail.FAILED
+            logger.error("Email %s abandonné après %s tentatives : %s", email.pk, email.attempts, exc)
+        else:
+            email.next_attempt_at = now + retry_delay(email.attempts)
+    OutboundEmail.objects.bulk_update(
+        [email for email, _exc in failed], ['attempts', 'claim', 'last_error', 'status', 'next_attempt_at']
+    )
+
+
+def _drain_worker(batch_size):
+    try:
+        sent = failed = 0
+        while True:
+            batch = claim_batch(batch_size)
+            if not batch:
+                return sent, failed
+            batch_sent, batch_failed = send_batch(batch)
+            sent += batch_sent
+            failed += batch_failed
+    finally:
+        # Chaque thread a sa propre connexion à la base
+        db_connection.close()
+
+
+def drain(workers=4, batch_size=50):
+    """Envoie tous les emails dus ; retourne ``(envoyés, en échec)``.
+
+    Avec ``workers <= 1``, l'envoi se fait dans le thread appelant.
+    """
+    if workers <= 1:
+        sent = failed = 0
+        while batch := claim_batch(batch_size):
+            batch_sent, batch_failed = send_batch(batch)
+            sent += batch_sent
+            failed += batch_failed
+        return sent, failed
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_drain_worker, [batch_size] * workers))
+    return sum(sent for sent, _failed in results), sum(failed for _sent, failed in results)
@@ -0,0 +1,106 @@
+"""
+Pagination par curseur (keyset) sans OFFSET.
+
+Le curseur encode les valeurs des champs de tri de la dernière ligne de la
+page ; la page suivante est obtenue par une comparaison lexicographique sur
+ces champs, ce qui permet d'utiliser l'index et garde un coût constant quelle
+que soit la profondeur. Les champs de tri doivent être non nuls et le dernier
+doit être unique (en général ``id``).
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """Curseur illisible ou incompatible avec le tri demandé."""
+
+
+class KeysetPage:
+    """Une page de résultats et le curseur permettant d'obtenir la suivante."""
+
+    def __init__(self, object_list, next_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+class KeysetPaginator:
+    """Découpe un queryset en pages selon un tri composé, par ex. ``('name', 'id')``.
+
+    Un préfixe ``-`` indique un tri décroissant, comme pour ``order_by``.
+    """
+
+    def __init__(self, queryset, ordering, per_page=20):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = [name.startswith('-') for name in self.ordering]
+
+    def get_page(self, cursor=None):
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(cursor)))
+
+        # Une ligne de plus que nécessaire pour savoir s'il existe une page suivante
+        rows = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = self.encode_cursor(rows[-1])
+        return KeysetPage(rows, next_cursor)
+
+    def encode_cursor(self, obj):
+        values = [self._value(obj, name) for name in self.fields]
+        payload = json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (ValueError, TypeError) as e:
+            raise InvalidCursor(str(e))
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor("Le curseur ne correspond pas au tri demandé.")
+
+        model = self.queryset.model
+        try:
+            return [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except ValidationError as e:
+            raise InvalidCursor(str(e))
+
+    def _after(self, values):
+        """Construit ``(a > x) OR (a = x AND b > y) OR ...`` selon le sens du tri."""
+        condition = Q()
+        for i, (name, descending) in enumerate(zip(self.fields, self.descending)):
+            lookup = f"{name}__{'lt' if descending else 'gt'}"
+            clause = Q(**{lookup: values[i]})
+            for previous, value in zip(self.fields[:i], values[:i]):
+                clause &= Q(**{previous: value})
+            condition |= clause
+        return condition
+
+    def _value(self, obj, name):
+        if isinstance(obj, dict):
+            return obj[name]
+        return getattr(obj, self.queryset.model._meta.get_field(name).attname)
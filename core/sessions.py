@@ -0,0 +1,236 @@
+"""
+Moteur de sessions « write-behind » : cache local d'abord, base de données ensuite.
+
+Les sessions sont lues et écrites dans le cache ``SESSION_CACHE_ALIAS`` (un
+cache fichier partagé par les processus de la machine). Les sessions modifiées
+sont mises en attente puis recopiées dans ``django_session`` par lots, en une
+transaction, au plus tard ``SESSION_WRITE_BEHIND_DELAY`` secondes après leur
+modification (à la fin d'une requête) ou dès que ``SESSION_WRITE_BEHIND_BATCH``
+sessions sont en attente. La base reste la source de secours si le cache perd
+une entrée.
+
+Chaque processus a son propre lot en attente : une déconnexion ou un
+changement de clé traité par un autre processus ne le vide pas. La
+suppression d'une session laisse donc une marque (« tombstone ») dans le cache
+partagé, et l'écriture d'un lot ignore les sessions marquées ou absentes du
+cache. Le contenu écrit est celui du cache (le plus récent, quel que soit le
+processus qui l'a enregistré), et une ligne dont l'expiration est plus
+récente n'est jamais remplacée.
+
+Avec ``SESSION_SAVE_EVERY_REQUEST``, Django enregistre la session à chaque
+requête uniquement pour repousser son expiration : si le contenu n'a pas
+changé et que l'expiration enregistrée laisse encore plus de la moitié de la
+durée de vie de la session, l'écriture est ignorée.
+
+Usage : ``SESSION_ENGINE = 'core.sessions'``.
+"""
+import atexit
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError, UpdateError
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.core.signals import request_finished
+from django.db import DatabaseError, router, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Clés des sessions modifiées en attente d'écriture en base (par processus)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._oldest = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __contains__(self, session_key):
+        return session_key in self._pending
+
+    def put(self, session_key):
+        with self._lock:
+            self._pending.add(session_key)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def discard(self, session_key):
+        with self._lock:
+            self._pending.discard(session_key)
+
+    def is_due(self):
+        delay = getattr(settings, 'SESSION_WRITE_BEHIND_DELAY', 2.0)
+        batch = getattr(settings, 'SESSION_WRITE_BEHIND_BATCH', 200)
+        oldest = self._oldest
+        return oldest is not None and (len(self._pending) >= batch or time.monotonic() - oldest >= delay)
+
+    def flush(self):
+        """Écrit toutes les sessions en attente en une transaction ; retourne leur nombre."""
+        with self._lock:
+            pending, self._pending, self._oldest = self._pending, set(), None
+        if not pending:
+            return 0
+
+        model = SessionStore.get_model_class()
+        using = router.db_for_write(model)
+        try:
+            sessions = SessionStore.current_sessions(pending)
+            with transaction.atomic(using=using):
+                # Une ligne qui expire plus tard a été écrite après ce contenu : on la garde
+                stored = dict(
+                    model.objects.using(using).select_for_update().filter(
+                        session_key__in=[session.session_key for session in sessions]
+                    ).values_list('session_key', 'expire_date')
+                )
+                sessions = [
+                    session for session in sessions
+                    if stored.get(session.session_key, session.expire_date) <= session.expire_date
+                ]
+                model.objects.using(using).bulk_create(
+                    sessions,
+                    batch_size=500,
+                    update_conflicts=True,
+                    unique_fields=['session_key'],
+                    update_fields=['session_data', 'expire_date'],
+                )
+        except DatabaseError:
+            # Remise en attente pour le passage suivant
+            with self._lock:
+                self._pending |= pending
+                if self._oldest is None:
+                    self._oldest = time.monotonic()
+            raise
+        return len(sessions)
+
+
+buffer = WriteBehindBuffer()
+
+
+def flush_due_sessions(**kwargs):
+    """Fin de requête : écrit le lot en attente s'il est assez ancien ou assez gros."""
+    if buffer.is_due():
+        try:
+            buffer.flush()
+        except DatabaseError:
+            logger.exception("Échec de l'écriture différée des sessions")
+
+
+def _flush_at_exit():
+    try:
+        buffer.flush()
+    except Exception:
+        logger.exception("Échec de l'écriture différée des sessions à l'arrêt")
+
+
+request_finished.connect(flush_due_sessions, dispatch_uid='core.sessions.flush_due_sessions')
+atexit.register(_flush_at_exit)
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = 'core.sessions.'
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        # (contenu sérialisé, date d'expiration) tels que connus du stockage
+        self._stored = None
+
+    @classmethod
+    def tombstone_key(cls, session_key):
+        return f'{cls.cache_key_prefix}deleted.{session_key}'
+
+    @classmethod
+    def current_sessions(cls, pending):
+        """Sessions à écrire pour le lot ``pending`` : contenu lu dans le cache
+        partagé, sans les sessions supprimées ou sorties du cache."""
+        store = cls()
+        cache_keys = {key: cls.cache_key_prefix + key for key in pending}
+        found = store._cache.get_many([*cache_keys.values(), *map(cls.tombstone_key, pending)])
+        model = cls.get_model_class()
+        sessions = []
+        for key, cache_key in cache_keys.items():
+            if cls.tombstone_key(key) in found or cache_key not in found:
+                continue
+            data, expire_date = found[cache_key]
+            sessions.append(model(session_key=key, session_data=store.encode(data), expire_date=expire_date))
+        return sessions
+
+    def _snapshot(self, data):
+        return self.serializer().dumps(data)
+
+    def load(self):
+        try:
+            cached = self._cache.get(self.cache_key)
+        except Exception:
+            # Cache indisponible : on retombe sur la base
+            cached = None
+        if cached is not None:
+            data, expire_date = cached
+        else:
+            session = self._get_session_from_db()
+            if session is None:
+                self._stored = None
+                return {}
+            data = self.decode(session.session_data)
+            expire_date = session.expire_date
+            self._cache_set(data, expire_date)
+        self._stored = (self._snapshot(data), expire_date)
+        return data
+
+    def exists(self, session_key):
+        return session_key in buffer or super().exists(session_key)
+
+    def _cache_set(self, data, expire_date, add=False):
+        timeout = max(int((expire_date - timezone.now()).total_seconds()), 1)
+        if add:
+            return self._cache.add(self.cache_key, (data, expire_date), timeout)
+        self._cache.set(self.cache_key, (data, expire_date), timeout)
+        return True
+
+    def _only_expiry_changed(self, snapshot):
+        if self._stored is None or self._stored[0] != snapshot:
+            return False
+        remaining = self._stored[1] - timezone.now()
+        return remaining > timedelta(seconds=self.get_expiry_age() / 2)
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        snapshot = self._snapshot(data)
+        if not must_create and self._only_expiry_changed(snapshot):
+            return
+
+        expire_date = self.get_expiry_date()
+        if must_create:
+            if not self._cache_set(data, expire_date, add=True):
+                raise CreateError
+        elif self._cache.get(self.tombstone_key(self.session_key)) is not None:
+            # Session supprimée entre-temps (déconnexion dans une autre requête)
+            raise UpdateError
+        else:
+            self._cache_set(data, expire_date)
+        buffer.put(self.session_key)
+        self._stored = (snapshot, expire_date)
+
+    def delete(self, session_key=None):
+        session_key = session_key or self.session_key
+        if session_key is None:
+            return
+        buffer.discard(session_key)
+        # Marque partagée : les autres processus ne réécriront pas la session
+        self._cache.set(self.tombstone_key(session_key), True, settings.SESSION_COOKIE_AGE)
+        # Suppression immédiate du cache et de la base (déconnexion)
+        super().delete(session_key)
+        if session_key == self.session_key:
+            self._stored = None
+
+    @classmethod
+    def clear_expired(cls):
+        buffer.flush()
+        super().clear_expired()
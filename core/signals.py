@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from orders.models import Order
+from products.models import Product
+
+from .counters import PRODUCTS, combine, increment, order_deltas, user_deltas
+
+
+@receiver(pre_save, sender=Order)
+def remember_counted_order(sender, instance, raw=False, **kwargs):
+    """État enregistré de la commande, pour n'appliquer aux compteurs que la différence."""
+    instance._counted_state = None
+    if not raw and not instance._state.adding and instance.pk:
+        instance._counted_state = (
+            Order.objects.filter(pk=instance.pk).only('status', 'paid', 'total_amount', 'created_at').first()
+        )
+
+
+@receiver(post_save, sender=Order)
+def count_saved_order(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_counted_state', None)
+    if created or previous is not None:
+        increment(combine(order_deltas(instance), order_deltas(previous, -1) if previous else {}))
+
+
+@receiver(post_delete, sender=Order)
+def count_deleted_order(sender, instance, **kwargs):
+    increment(order_deltas(instance, -1))
+
+
+@receiver(post_save, sender=Product)
+def count_created_product(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        increment({PRODUCTS: 1})
+
+
+@receiver(post_delete, sender=Product)
+def count_deleted_product(sender, instance, **kwargs):
+    increment({PRODUCTS: -1})
+
+
+@receiver(post_save, sender=get_user_model())
+def count_created_user(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        increment(user_deltas(instance))
+
+
+@receiver(post_delete, sender=get_user_model())
+def count_deleted_user(sender, instance, **kwargs):
+    increment(user_deltas(instance, -1))
@@ -0,0 +1,52 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from products.images import DERIVATIVE_SIZES, FORMATS, derivative_url
+
+register = template.Library()
+
+# Largeur d'affichage de chaque déclinaison, pour l'attribut ``sizes``
+DISPLAY_SIZES = {
+    'thumbnail': '80px',
+    'card': '(max-width: 768px) 100vw, 33vw',
+    'detail': '(max-width: 768px) 100vw, 50vw',
+}
+
+
+@register.simple_tag
+def product_picture(product, size='card', **attrs):
+    """
+    Affiche l'image d'un produit dans un élément <picture> avec srcset.
+    Exemple : {% product_picture product 'card' class='card-img-top' %}
+
+    Tant que les déclinaisons ne sont pas générées, l'image originale est utilisée.
+    """
+    if not product.image:
+        return ''
+    attributes = format_html_join('', ' {}="{}"', [
+        (name.replace('_', '-'), value) for name, value in attrs.items()
+    ])
+    if not product.image_digest:
+        return format_html('<img src="{}" alt="{}" loading="lazy"{}>', product.image.url, product.name, attributes)
+
+    name, digest = product.image.name, product.image_digest
+    sources = format_html_join('', '<source type="{}" srcset="{}" sizes="{}">', [
+        (mime, _srcset(name, digest, ext), DISPLAY_SIZES[size])
+        for ext, (_format, mime, _options) in FORMATS.items() if ext != 'jpg'
+    ])
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" loading="lazy"{}></picture>',
+        sources,
+        derivative_url(name, digest, size, 'jpg'),
+        _srcset(name, digest, 'jpg'),
+        DISPLAY_SIZES[size],
+        product.name,
+        attributes,
+    )
+
+
+def _srcset(name, digest, ext):
+    return ', '.join(
+        f"{derivative_url(name, digest, size, ext)} {width}w"
+        for size, width in DERIVATIVE_SIZES.items()
+    )
@@ -0,0 +1,36 @@
+"""
+Lanceur de tests du projet.
+
+Le cache partagé (``CACHES['shared']``) et celui des sessions sont des
+répertoires communs à tous les processus de la machine, serveur compris : les
+tests les vident et y écrivent les versions du catalogue et les sessions du
+client de test. Pendant les tests, ils sont redirigés vers un répertoire
+temporaire, supprimé à la fin, comme ``MEDIA_ROOT`` et ``STORAGES`` le sont
+dans les tests qui écrivent des fichiers.
+"""
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# Alias de cache stockés sur disque et partagés avec le serveur
+ISOLATED_CACHES = ('shared', 'sessions')
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_root = Path(tempfile.mkdtemp(prefix='cement-test-caches-'))
+        caches = {alias: dict(config) for alias, config in settings.CACHES.items()}
+        for alias in ISOLATED_CACHES:
+            caches[alias]['LOCATION'] = str(self.cache_root / alias)
+        self.cache_override = override_settings(CACHES=caches)
+        self.cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_override.disable()
+        shutil.rmtree(self.cache_root, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
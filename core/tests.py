@@ -1,3 +1,469 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.base import UpdateError
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.models import Order
+from products.cache import CATALOG_VERSION_KEY, bump_catalog_version, get_catalog_version
+from products.models import Category, Product, StockMovementType
+from products.stock import record_movement
+
+from . import counters, outbox, sessions
+from .models import Counter, OutboundEmail
+from .money import from_minor
+
+
+class CatalogCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Ciment', slug='ciment')
+        Category.objects.create(name='Sable', slug='sable')
+        for i in range(5):
+            Product.objects.create(
+                name=f'Ciment CPJ 42.5 n°{i}',
+                category=cls.category,
+                cement_type='CPJ42.5',
+                price=Decimal('25000.00'),
+                weight=Decimal('50.00'),
+            )
+
+    def setUp(self):
+        cache.clear()
+        caches['shared'].clear()
+
+    def test_home_query_count_is_fixed(self):
+        url = reverse('core:home')
+        self.client.get(url)
+        # Seuls les produits en vedette sont lus, les catégories viennent du cache
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertContains(response, 'Sable')
+
+    def test_product_list_query_count_is_fixed(self):
+        url = reverse('core:product_list', args=[self.category.slug])
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['products']), 5)
+
+    def test_category_change_invalidates_cache(self):
+        url = reverse('core:home')
+        self.client.get(url)
+        Category.objects.create(name='Gravier', slug='gravier')
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertContains(response, 'Gravier')
+
+    def test_versions_are_shared_between_processes(self):
+        url = reverse('core:home')
+        self.client.get(url)
+        version = get_catalog_version()
+        # Le cache propre au processus ne porte pas la version
+        cache.clear()
+        self.assertEqual(get_catalog_version(), version)
+
+        # Modification faite par un autre processus : seule la version partagée change
+        Category.objects.filter(slug='sable').update(name='Sable fin')
+        caches['shared'].set(CATALOG_VERSION_KEY, version + 1, timeout=None)
+        self.assertContains(self.client.get(url), 'Sable fin')
+        self.assertNotEqual(bump_catalog_version(), version + 1)
+
+
+class ProductListPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Ciment', slug='ciment')
+        for i in range(30):
+            Product.objects.create(
+                name=f'Ciment {i:02d}',
+                category=cls.category,
+                cement_type='CPJ45',
+                price=Decimal('20000.00'),
+                weight=Decimal('50.00'),
+            )
+
+    def setUp(self):
+        cache.clear()
+        caches['shared'].clear()
+
+    def test_pages_follow_name_id_order_without_overlap(self):
+        response = self.client.get(reverse('core:product_list'))
+        first_page = list(response.context['products'])
+        cursor = response.context['next_cursor']
+        self.assertEqual(len(first_page), 24)
+        self.assertIsNotNone(cursor)
+
+        response = self.client.get(reverse('core:product_list_fragment'), {'cursor': cursor})
+        data = response.json()
+        self.assertEqual(data['count'], 6)
+        self.assertIsNone(data['next_cursor'])
+        self.assertIn('Ciment 29', data['html'])
+        self.assertNotIn('Ciment 23', data['html'])
+
+    def test_deep_page_costs_the_same_as_first_page(self):
+        url = reverse('core:product_list_fragment', args=[self.category.slug])
+        cursor = self.client.get(url).json()['next_cursor']
+        with self.assertNumQueries(1):
+            self.client.get(url, {'cursor': cursor})
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse('core:product_list'), {'cursor': 'pas-un-curseur'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Ciment', slug='ciment')
+        cls.product = Product.objects.create(
+            name='Ciment CPJ 42.5',
+            category=cls.category,
+            cement_type='CPJ42.5',
+            price=Decimal('25000.00'),
+            weight=Decimal('50.00'),
+        )
+
+    def setUp(self):
+        cache.clear()
+        caches['shared'].clear()
+
+    def etag(self, url):
+        # Le premier rendu dépose le cookie CSRF, qui fait partie de l'ETag
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertTrue(response.has_header('ETag'))
+        return response['ETag']
+
+    def test_unchanged_product_returns_304_without_rendering(self):
+        url = self.product.get_absolute_url()
+        etag = self.etag(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_price_and_category_changes_change_the_etag(self):
+        url = self.product.get_absolute_url()
+        etag = self.etag(url)
+
+        self.product.price = Decimal('26000.00')
+        self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        self.category.name = 'Ciments'
+        self.category.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Ciments')
+
+    def test_product_list_follows_catalog_and_stock(self):
+        url = reverse('core:product_list')
+        etag = self.etag(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        record_movement(self.product, StockMovementType.IN, 10)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'En stock')
+
+    def test_change_made_by_another_process_changes_the_etag(self):
+        url = reverse('core:product_list')
+        etag = self.etag(url)
+        Product.objects.filter(pk=self.product.pk).update(name='Ciment CPJ 45')
+        # Invalidation faite par le processus qui a modifié le produit
+        caches['shared'].set(CATALOG_VERSION_KEY, get_catalog_version() + 1, timeout=None)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Ciment CPJ 45')
+
+    def test_logged_in_user_gets_a_different_etag(self):
+        url = reverse('core:product_list')
+        etag = self.etag(url)
+        self.client.force_login(User.objects.create_user('client', password='x'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+
+class WriteBehindSessionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('client', password='secret')
+
+    def setUp(self):
+        # Cache de sessions temporaire : le répertoire réel est celui du serveur
+        self.cache_dir = tempfile.mkdtemp()
+        location = dict(settings.CACHES[settings.SESSION_CACHE_ALIAS], LOCATION=self.cache_dir)
+        self.override = override_settings(CACHES={**settings.CACHES, settings.SESSION_CACHE_ALIAS: location})
+        self.override.enable()
+        sessions.buffer.flush()
+
+    def tearDown(self):
+        sessions.buffer.flush()
+        self.override.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def session_writes(self, func):
+        """Nombre d'écritures SQL sur django_session pendant ``func()``."""
+        writes = []
+
+        def count(execute, sql, params, many, context):
+            if 'django_session' in sql and not sql.lstrip().upper().startswith('SELECT'):
+                writes.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            func()
+        return len(writes)
+
+    def test_sessions_are_written_to_the_database_in_batches(self):
+        self.client.force_login(self.user)
+        key = self.client.session.session_key
+        self.assertIn(key, sessions.buffer)
+        self.assertFalse(Session.objects.filter(session_key=key).exists())
+
+        # Lecture depuis le cache, même avant l'écriture en base
+        self.assertEqual(self.client.get(reverse('cart:cart_detail')).status_code, 200)
+        self.assertEqual(sessions.buffer.flush(), 1)
+        session = Session.objects.get(session_key=key)
+        self.assertEqual(session.get_decoded()['_auth_user_id'], str(self.user.pk))
+
+    def test_unchanged_session_is_not_rewritten(self):
+        self.client.force_login(self.user)
+        sessions.buffer.flush()
+        url = reverse('core:product_list')
+        self.assertEqual(self.session_writes(lambda: [self.client.get(url) for _ in range(5)]), 0)
+        self.assertEqual(len(sessions.buffer), 0)
+
+    def test_old_expiry_is_refreshed(self):
+        self.client.force_login(self.user)
+        store = sessions.SessionStore(self.client.session.session_key)
+        store.load()
+        data, expire_date = store._cache.get(store.cache_key)
+        store._cache.set(store.cache_key, (data, timezone.now() + timedelta(minutes=5)))
+        sessions.buffer.flush()
+
+        self.client.get(reverse('core:product_list'))
+        self.assertEqual(len(sessions.buffer), 1)
+
+    def test_logout_deletes_immediately(self):
+        self.client.force_login(self.user)
+        key = self.client.session.session_key
+        sessions.buffer.flush()
+        self.client.post(reverse('logout'))
+        self.assertNotIn(key, sessions.buffer)
+        self.assertFalse(Session.objects.filter(session_key=key).exists())
+        self.assertFalse(sessions.SessionStore().exists(key))
+
+    def test_session_deleted_elsewhere_is_not_written_back(self):
+        self.client.force_login(self.user)
+        key = self.client.session.session_key
+        sessions.buffer.flush()
+        # Requête concurrente qui a lu la session avant la déconnexion
+        store = sessions.SessionStore(key)
+        self.assertIn('_auth_user_id', store)
+        self.client.post(reverse('logout'))
+        # Un autre processus avait encore la session en attente
+        sessions.buffer.put(key)
+        self.assertEqual(sessions.buffer.flush(), 0)
+        self.assertFalse(Session.objects.filter(session_key=key).exists())
+
+        store['visited'] = True
+        with self.assertRaises(UpdateError):
+            store.save()
+
+    def test_flush_writes_the_newest_content_only(self):
+        self.client.force_login(self.user)
+        store = sessions.SessionStore(self.client.session.session_key)
+        data = store.load()
+        cached, expire_date = store._cache.get(store.cache_key)
+        store._cache.set(store.cache_key, ({**data, 'latest': True}, expire_date))
+        self.assertEqual(sessions.buffer.flush(), 1)
+        self.assertTrue(Session.objects.get(session_key=store.session_key).get_decoded()['latest'])
+
+        # Une ligne plus récente en base n'est pas remplacée par un contenu plus ancien
+        Session.objects.filter(session_key=store.session_key).update(expire_date=expire_date + timedelta(days=1))
+        store._cache.set(store.cache_key, (data, expire_date))
+        sessions.buffer.put(store.session_key)
+        self.assertEqual(sessions.buffer.flush(), 0)
+        self.assertTrue(Session.objects.get(session_key=store.session_key).get_decoded()['latest'])
+
+
+class RecordingBackend(locmem.EmailBackend):
+    """Backend de test : compte les connexions et refuse certains destinataires."""
+    connections_opened = 0
+    refused = set()
+
+    def open(self):
+        RecordingBackend.connections_opened += 1
+
+    def send_messages(self, messages):
+        for message in messages:
+            if self.refused & set(message.to):
+                raise ConnectionError("Destinataire refusé")
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='core.tests.RecordingBackend', OUTBOX_MAX_ATTEMPTS=3, OUTBOX_RETRY_DELAY=60)
+class OutboxTests(TestCase):
+    def setUp(self):
+        RecordingBackend.connections_opened = 0
+        RecordingBackend.refused = set()
+
+    def queue(self, count, to='client@example.com'):
+        for i in range(count):
+            outbox.queue_email(f'Message {i}', [to], body='Bonjour', html_body='<p>Bonjour</p>')
+
+    def test_email_only_exists_if_the_transaction_commits(self):
+        try:
+            with transaction.atomic():
+                self.queue(1)
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertFalse(OutboundEmail.objects.exists())
+        self.queue(1)
+        self.assertEqual(mail.outbox, [])
+
+    def test_batches_share_one_connection(self):
+        self.queue(7)
+        self.assertEqual(outbox.drain(workers=1, batch_size=3), (7, 0))
+        self.assertEqual(len(mail.outbox), 7)
+        self.assertEqual(RecordingBackend.connections_opened, 3)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.SENT).exists())
+        # Rien n'est renvoyé au passage suivant
+        self.assertEqual(outbox.drain(workers=1), (0, 0))
+
+    def test_failures_are_retried_with_backoff_then_abandoned(self):
+        self.queue(2)
+        self.queue(1, to='refuse@example.com')
+        RecordingBackend.refused = {'refuse@example.com'}
+
+        self.assertEqual(outbox.drain(workers=1), (2, 1))
+        email = OutboundEmail.objects.get(to=['refuse@example.com'])
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.PENDING, 1))
+        self.assertIn('Destinataire refusé', email.last_error)
+        first_delay = email.next_attempt_at - timezone.now()
+        self.assertGreater(first_delay, timedelta(seconds=50))
+        # Pas encore dû
+        self.assertEqual(outbox.drain(workers=1), (0, 0))
+
+        OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(outbox.drain(workers=1), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 2)
+        self.assertGreater(email.next_attempt_at - timezone.now(), timedelta(seconds=110))
+
+        # Dernière tentative : l'abandon est journalisé
+        OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        with self.assertLogs('core.outbox', 'ERROR') as logs:
+            self.assertEqual(outbox.drain(workers=1), (0, 1))
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn(f"Email {email.pk} abandonné après 3 tentatives", logs.output[0])
+        self.assertIn('Destinataire refusé', logs.output[0])
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.FAILED, 3))
+
+    def test_claimed_emails_are_not_taken_twice(self):
+        self.queue(4)
+        first = outbox.claim_batch(3)
+        second = outbox.claim_batch(3)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({email.pk for email in first} & {email.pk for email in second})
+
+    def test_command(self):
+        self.queue(2)
+        out = StringIO()
+        call_command('send_outbox', workers=1, stdout=out)
+        self.assertIn('2 emails envoyés', out.getvalue())
+
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Ciment', slug='ciment')
+        cls.product = Product.objects.create(
+            name='Ciment CPJ42.5', category=cls.category, cement_type='CPJ42.5',
+            price=Decimal('25000.00'), weight=Decimal('50.00'),
+        )
+        cls.user = User.objects.create_user('client', password='secret')
+        cls.staff = User.objects.create_user('gerant', password='secret', is_staff=True)
+
+    def order(self, total='50000.00', **fields):
+        return Order.objects.create(
+            user=self.user, first_name='Jean', last_name='Ndayishimiye', email='jean@example.com',
+            phone='0999999999', payment_method='lumicash', total_amount=Decimal(total), **fields
+        )
+
+    def test_counters_follow_writes(self):
+        paid = self.order()
+        cancelled = self.order(total='20000.00')
+        self.order(total='10000.00')
+        paid.paid = True
+        paid.status = 'payee'
+        paid.save()
+        cancelled.status = 'annulee'
+        cancelled.save()
+
+        data = counters.snapshot()
+        self.assertEqual((data['product_count'], data['user_count'], data['order_count']), (1, 2, 3))
+        self.assertEqual(data['unpaid_count'], 1)
+        self.assertEqual(from_minor(data['unpaid_amount']), Decimal('10000.00'))
+        self.assertEqual(from_minor(data['today_revenue']), Decimal('60000.00'))
+        self.assertEqual((data['today_orders'], data['today_users']), (3, 2))
+        statuses = {row['status']: row['count'] for row in data['status_counts']}
+        self.assertEqual((statuses['en_attente'], statuses['payee'], statuses['annulee']), (1, 1, 1))
+        # Les valeurs incrémentales sont les valeurs exactes
+        self.assertEqual(counters.reconcile(), [])
+
+        cancelled.delete()
+        self.product.delete()
+        data = counters.snapshot()
+        self.assertEqual((data['order_count'], data['product_count']), (2, 0))
+        self.assertEqual(counters.reconcile(), [])
+
+    def test_reconcile_fixes_drift(self):
+        order = self.order()
+        # Écriture en masse : pas de signal
+        Order.objects.filter(pk=order.pk).update(status='annulee')
+        Counter.objects.create(name=counters.daily_counter(counters.DAILY_REVENUE, date(2020, 1, 1)), value=5)
+
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('orders.status.annulee', out.getvalue())
+        self.assertIn('orders.unpaid', out.getvalue())
+        data = counters.snapshot()
+        self.assertEqual((data['unpaid_count'], data['today_revenue']), (0, 0))
+        self.assertFalse(Counter.objects.filter(name__endswith='2020-01-01').exists())
+        self.assertEqual(counters.reconcile(), [])
+
+    def test_dashboard_renders_from_one_counter_read(self):
+        self.order()
+        self.client.force_login(self.staff)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('core:admin_dashboard'))
+        sql = [query['sql'] for query in captured]
+        self.assertEqual(len([query for query in sql if 'core_counter' in query]), 1)
+        self.assertFalse([query for query in sql if 'COUNT(' in query])
+        self.assertContains(response, '50,000.00 BIF')
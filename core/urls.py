@@ -25,8 +25,14 @@ urlpatterns = [
     # Détail d'un produit
     path('produit/<int:id>/<slug:slug>/', views.product_detail, name='product_detail'),
     
-    # Liste des produits par catégorie
+    # Recherche plein texte
+    path('recherche/', views.product_search, name='product_search'),
+    
+    # Liste des produits (tous ou par catégorie) et fragments JSON pour le défilement infini
+    path('produits/', views.product_list, name='product_list'),
+    path('produits/fragment/', views.product_list_fragment, name='product_list_fragment'),
     path('categorie/<slug:category_slug>/', views.product_list, name='product_list'),
+    path('categorie/<slug:category_slug>/fragment/', views.product_list_fragment, name='product_list_fragment'),
     
     # Gestion des produits
     path('gestion/produits/', views.ProductListView.as_view(), name='product_list_admin'),
@@ -1,5 +1,7 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse, HttpResponseForbidden, HttpResponseRedirect
+from django.http import Http404, HttpResponse, HttpResponseForbidden, HttpResponseRedirect, JsonResponse
+from django.template.loader import render_to_string
+from django.utils.http import urlencode
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.urls import reverse_lazy, reverse
@@ -8,14 +10,20 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
 from products.models import Product, Category
+from products.cache import get_catalog_version, get_categories, get_category_or_404, get_stock_version
+from products import facets, search
+from . import counters
+from .conditional import catalog_condition
+from .money import from_minor
 from .forms import CategoryForm, ProductForm
+from .pagination import InvalidCursor, KeysetPaginator
 
 
 def home(request):
     # Récupérer les produits en vedette (par exemple, les 8 premiers produits disponibles)
-    featured_products = Product.objects.filter(available=True)[:8]
-    # Récupérer toutes les catégories pour le menu
-    categories = Category.objects.all()
+    featured_products = Product.objects.with_stock().filter(available=True)[:8]
+    # Récupérer toutes les catégories pour le menu (depuis le cache du catalogue)
+    categories = get_categories()
     
     context = {
         'featured_products': featured_products,
@@ -24,24 +32,119 @@ def home(request):
     return render(request, 'core/home.html', context)
 
 
-def product_list(request, category_slug=None):
-    """Affiche la liste des produits, éventuellement filtrés par catégorie"""
+PRODUCTS_PER_PAGE = 24
+
+
+def _product_page(request, category_slug=None):
+    """Retourne la catégorie, la page de produits demandée par curseur et les filtres actifs"""
     category = None
-    categories = Category.objects.all()
-    products = Product.objects.filter(available=True)
+    products = Product.objects.with_stock().filter(available=True)
     
     if category_slug:
-        category = get_object_or_404(Category, slug=category_slug)
+        category = get_category_or_404(category_slug)
         products = products.filter(category=category)
     
+    # Filtres de la navigation à facettes (type de ciment, poids, tranche de prix)
+    products, selected = facets.filter_products(products, request.GET)
+    
+    # Pagination par curseur sur (name, id), cohérente avec Product.Meta.ordering
+    paginator = KeysetPaginator(products, ('name', 'id'), per_page=PRODUCTS_PER_PAGE)
+    try:
+        page = paginator.get_page(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404("Curseur de pagination invalide")
+    return category, page, selected
+
+
+def _facet_links(facet_counts, selected):
+    """Prépare les liens de la navigation à facettes en conservant les autres filtres"""
+    links = {}
+    for facet, values in facet_counts.items():
+        links[facet] = []
+        for value, label, count in values:
+            params = dict(selected)
+            is_selected = selected.get(facet) == value
+            if is_selected:
+                params.pop(facet)
+            else:
+                params[facet] = value
+            links[facet].append({
+                'label': label,
+                'count': count,
+                'selected': is_selected,
+                'query': urlencode(params),
+            })
+    return links
+
+
+def _menu_state():
+    """Signature du menu des catégories (lu depuis le cache du catalogue)"""
+    categories = get_categories()
+    return [len(categories), max((category.updated_at for category in categories), default=None)]
+
+
+def _product_list_state(request, category_slug=None):
+    """Validateurs d'une page de liste : la page dépend des produits, des
+    facettes et des stocks, tous couverts par les versions du catalogue."""
+    return [get_catalog_version(), get_stock_version()], None
+
+
+def _product_detail_state(request, id, slug):
+    """Validateurs d'une fiche produit : produit, sa catégorie et le menu"""
+    row = Product.objects.filter(id=id, slug=slug, available=True).values_list(
+        'updated_at', 'category__updated_at'
+    ).first()
+    if row is None:
+        return None
+    menu = _menu_state()
+    return [list(row), menu], max(filter(None, [*row, menu[1]]))
+
+
+@catalog_condition(_product_list_state)
+def product_list(request, category_slug=None):
+    """Affiche la liste des produits, éventuellement filtrés par catégorie et par facettes"""
+    category, page, selected = _product_page(request, category_slug)
+    
     context = {
         'category': category,
-        'categories': categories,
-        'products': products,
+        'categories': get_categories(),
+        'products': page,
+        'next_cursor': page.next_cursor,
+        'facets': _facet_links(facets.get_facet_counts(category), selected),
+        'filter_query': urlencode(selected),
     }
     return render(request, 'core/product/list.html', context)
 
 
+@catalog_condition(_product_list_state)
+def product_list_fragment(request, category_slug=None):
+    """Renvoie la page suivante de produits en JSON pour le défilement infini"""
+    category, page, selected = _product_page(request, category_slug)
+    html = render_to_string('core/product/_product_cards.html', {'products': page}, request=request)
+    return JsonResponse({
+        'html': html,
+        'count': len(page),
+        'next_cursor': page.next_cursor,
+    })
+
+
+SEARCH_RESULTS_LIMIT = 48
+
+
+def product_search(request):
+    """Recherche plein texte dans le catalogue, résultats classés par pertinence"""
+    query = request.GET.get('q', '').strip()
+    products = search.search_products(query, limit=SEARCH_RESULTS_LIMIT) if query else []
+    
+    context = {
+        'query': query,
+        'products': products,
+        'page_title': f'Recherche : {query}' if query else 'Recherche',
+    }
+    return render(request, 'core/product/search.html', context)
+
+
+@catalog_condition(_product_detail_state)
 def product_detail(request, id, slug):
     """Affiche les détails d'un produit spécifique"""
     product = get_object_or_404(Product, id=id, slug=slug, available=True)
@@ -56,7 +159,6 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 from django.urls import reverse_lazy
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
-from orders.models import Order
 
 @login_required
 def admin_dashboard(request):
@@ -65,14 +167,13 @@ def admin_dashboard(request):
     if not request.user.is_staff and not request.user.is_superuser:
         return HttpResponseForbidden("Accès refusé")
     
-    User = get_user_model()
-    
+    # Compteurs tenus à jour par signaux, lus en une requête
     context = {
         'page_title': 'Tableau de bord administrateur',
-        'product_count': Product.objects.count(),
-        'order_count': Order.objects.count(),  # Nombre total de commandes
-        'user_count': User.objects.count(),    # Nombre total d'utilisateurs
+        **counters.snapshot(),
     }
+    context['unpaid_amount'] = from_minor(context['unpaid_amount'])
+    context['today_revenue'] = from_minor(context['today_revenue'])
     return render(request, 'core/admin/dashboard.html', context)
 
 
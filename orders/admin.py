@@ -1,6 +1,7 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html
-from .models import Order, OrderItem
+from .models import Order, OrderItem, OrderStatusLog, OrderSummary
+from .transitions import STATUS_LABELS, transition
 
 
 class OrderItemInline(admin.TabularInline):
@@ -14,6 +15,47 @@ class OrderItemInline(admin.TabularInline):
     get_cost.short_description = 'Total'
 
 
+class OrderStatusLogInline(admin.TabularInline):
+    model = OrderStatusLog
+    extra = 0
+    fields = ['created_at', 'from_status', 'to_status', 'changed_by', 'note']
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+def transition_action(target, description):
+    """Action d'administration appliquant la transition vers ``target`` à la sélection"""
+    def action(modeladmin, request, queryset):
+        result = transition(queryset.values_list('pk', flat=True), target, user=request.user)
+        if result.applied:
+            modeladmin.message_user(
+                request, f"{len(result.applied)} commande(s) passée(s) à « {STATUS_LABELS[target]} ».", messages.SUCCESS
+            )
+        if result.skipped:
+            modeladmin.message_user(
+                request,
+                f"{len(result.skipped)} commande(s) ignorée(s), leur statut ne le permet pas : "
+                + ', '.join(f'#{pk}' for pk in result.skipped[:20]),
+                messages.WARNING,
+            )
+    action.__name__ = f'mark_{target}'
+    action.short_description = description
+    return action
+
+
+TRANSITION_ACTIONS = [
+    transition_action('payee', "Marquer comme payées"),
+    transition_action('en_preparation', "Passer en préparation"),
+    transition_action('expediee', "Marquer comme expédiées"),
+    transition_action('livree', "Marquer comme livrées"),
+    transition_action('annulee', "Annuler"),
+    transition_action('remboursee', "Marquer comme remboursées"),
+]
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = [
@@ -23,9 +65,13 @@ class OrderAdmin(admin.ModelAdmin):
     ]
     list_filter = ['status', 'delivery_type', 'payment_method', 'created_at', 'updated_at']
     search_fields = ['first_name', 'last_name', 'email', 'id', 'phone']
-    inlines = [OrderItemInline]
-    readonly_fields = ['created_at', 'updated_at', 'user', 'total_amount']
+    inlines = [OrderItemInline, OrderStatusLogInline]
+    # Le statut ne change que par les actions (transitions validées et journalisées)
+    readonly_fields = ['created_at', 'updated_at', 'user', 'total_amount', 'status']
+    actions = TRANSITION_ACTIONS
     list_per_page = 20
+    list_select_related = ['user']
+    show_full_result_count = False
     date_hierarchy = 'created_at'
     
     fieldsets = [
@@ -59,6 +105,43 @@ class OrderAdmin(admin.ModelAdmin):
     order_actions.allow_tags = True
 
 
+@admin.register(OrderSummary)
+class OrderSummaryAdmin(admin.ModelAdmin):
+    """Suivi des commandes en lecture seule, sur la vue dénormalisée : les
+    filtres et le tri utilisent les index composites de ``OrderSummary``."""
+    list_display = [
+        'order_link', 'customer_name', 'created_at', 'item_count', 'tonnage',
+        'total_amount_display', 'delivery_type', 'payment_method', 'status', 'paid',
+    ]
+    list_filter = ['status', 'delivery_type', 'payment_method', 'paid']
+    search_fields = ['=order__id', 'customer_name', 'email']
+    list_per_page = 20
+    show_full_result_count = False
+    actions = TRANSITION_ACTIONS
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def order_link(self, obj):
+        return format_html(
+            '<a href="{}">Commande #{}</a>',
+            f'/admin/orders/order/{obj.order_id}/change/',
+            obj.order_id
+        )
+    order_link.short_description = 'Commande'
+    order_link.admin_order_field = 'order_id'
+
+    def total_amount_display(self, obj):
+        return f"{obj.total_amount:.2f} €"
+    total_amount_display.short_description = 'Montant total'
+
+
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ['id', 'order_link', 'product', 'price_display', 'quantity', 'get_cost']
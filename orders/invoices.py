@@ -0,0 +1,219 @@
+"""
+Factures.
+
+La ventilation HT / TVA est calculée une seule fois, à la création de la
+commande (``tax_breakdown``), et enregistrée sur la commande.
+
+Le document est rendu une fois par version de la commande (``updated_at`` :
+un changement de statut ou de paiement crée une nouvelle version), en HTML
+pour la page de facture et en PDF pour le téléchargement, puis conservé sous
+``<id>/<version>.<html|pdf>`` dans le stockage ``invoices`` ; les versions
+précédentes sont supprimées à l'écriture. Les factures contiennent les
+coordonnées du client : ce stockage est privé (hors de ``MEDIA_ROOT``, jamais
+servi tel quel) et les documents ne sont envoyés que par les vues de
+facture, après le contrôle d'accès.
+
+Le rendu part d'un instantané (``invoice_data``) composé uniquement de
+valeurs simples : ``render_pdf`` peut donc s'exécuter dans un autre
+processus, sans accès à la base (commande ``export_invoices``).
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.template.loader import render_to_string
+from django.utils import timezone
+from fpdf import FPDF
+
+from core.money import CENT
+
+from .models import OrderItem
+
+
+def tax_rate():
+    return Decimal(str(getattr(settings, 'ORDER_TAX_RATE', '0.20')))
+
+
+def tax_breakdown(total_ttc, rate=None):
+    """``(total HT, montant de TVA)`` d'un total TTC, au centime près ;
+    la somme des deux est exactement le total TTC."""
+    rate = tax_rate() if rate is None else rate
+    total_ht = (total_ttc / (1 + rate)).quantize(CENT, rounding=ROUND_HALF_UP)
+    return total_ht, total_ttc - total_ht
+
+
+def invoice_version(order):
+    return timezone.localtime(order.updated_at).strftime('%Y%m%d%H%M%S%f')
+
+
+def invoice_storage():
+    return storages['invoices']
+
+
+def invoice_path(order_id, version, fmt):
+    return f'{order_id}/{version}.{fmt}'
+
+
+def invoice_data(order, items=None):
+    """Instantané de la facture : ``items`` est une liste de ``(nom, prix, quantité)``
+    (lue en une requête si elle n'est pas fournie)."""
+    if items is None:
+        items = OrderItem.objects.filter(order=order).order_by('pk').values_list(
+            'product__name', 'price', 'quantity'
+        )
+    return {
+        'number': order.pk,
+        'version': invoice_version(order),
+        'date': timezone.localtime(order.created_at).strftime('%d/%m/%Y'),
+        'datetime': timezone.localtime(order.created_at).strftime('%d/%m/%Y %H:%M'),
+        'customer_ref': f'{order.user_id:06d}',
+        'customer_name': f'{order.first_name} {order.last_name}',
+        'address': order.address or '',
+        'city': ' '.join(part for part in (order.postal_code, order.city) if part),
+        'email': order.email,
+        'phone': order.phone,
+        'delivery': order.get_delivery_type_display(),
+        'payment': order.get_payment_method_display(),
+        'status': order.get_status_display(),
+        'paid': order.paid,
+        'notes': order.notes,
+        'lines': [
+            {
+                'name': name or 'Produit retiré du catalogue',
+                'price': price,
+                'quantity': quantity,
+                'total': price * quantity,
+            }
+            for name, price, quantity in items
+        ],
+        'subtotal_ht': order.subtotal_ht,
+        'tax_rate': order.tax_rate * 100,
+        'tax_amount': order.tax_amount,
+        'total_ttc': order.total_amount,
+        'issuer': getattr(settings, 'INVOICE_ISSUER', {}),
+    }
+
+
+def render_html(data):
+    return render_to_string('orders/order/invoice_document.html', {'invoice': data}).encode()
+
+
+def _amount(value):
+    return f'{value:,.2f} BIF'.replace(',', ' ')
+
+
+def render_pdf(data):
+    """PDF de la facture (sans accès à la base ni aux gabarits)."""
+    pdf = FPDF(unit='pt', format='A4')
+    pdf.set_title(f"Facture {data['number']}")
+    pdf.set_auto_page_break(False)
+    pdf.add_page()
+    # Positions en points depuis le coin inférieur gauche de la page
+    width, height = pdf.w, pdf.h
+
+    def text(x, y, value, size=10, bold=False, align='left'):
+        # Polices standard du PDF : latin-1 uniquement
+        value = str(value).encode('latin-1', errors='replace').decode('latin-1')
+        pdf.set_font('Helvetica', 'B' if bold else '', size)
+        if align == 'right':
+            x -= pdf.get_string_width(value)
+        pdf.text(x, height - y, value)
+
+    left, right = 50, width - 50
+    y = height - 60
+
+    issuer = data['issuer']
+    text(left, y, issuer.get('name', ''), size=14, bold=True)
+    text(right, y, 'FACTURE', size=18, bold=True, align='right')
+    for i, line in enumerate(issuer.get('address', [])):
+        text(left, y - 16 - 12 * i, line, size=9)
+    text(right, y - 20, f"N° {data['number']} du {data['date']}", size=10, align='right')
+    text(right, y - 34, f"Référence client : {data['customer_ref']}", size=9, align='right')
+    text(right, y - 46, f"Statut : {data['status']}{' (payée)' if data['paid'] else ''}", size=9, align='right')
+
+    y -= 100
+    text(left, y, 'Facturé à', size=10, bold=True)
+    text(320, y, 'Commande', size=10, bold=True)
+    customer = [data['customer_name'], data['address'] or 'Retrait en magasin', data['city'],
+                data['email'], f"Tél : {data['phone']}"]
+    details = [f"Date : {data['datetime']}", f"Paiement : {data['payment']}", f"Livraison : {data['delivery']}"]
+    for i, line in enumerate(line for line in customer if line):
+        text(left, y - 14 - 12 * i, line, size=9)
+    for i, line in enumerate(details):
+        text(320, y - 14 - 12 * i, line, size=9)
+
+    columns = (left + 5, 360, 420, right - 5)
+
+    def table_header(y):
+        pdf.set_fill_color(242)
+        pdf.rect(left, height - y - 14, right - left, 20, style='F')
+        text(columns[0], y, 'Produit', size=9, bold=True)
+        text(columns[1], y, 'Prix unitaire', size=9, bold=True, align='right')
+        text(columns[2], y, 'Qté', size=9, bold=True, align='right')
+        text(columns[3], y, 'Total', size=9, bold=True, align='right')
+        return y - 20
+
+    y = table_header(y - 100)
+    pdf.set_draw_color(217)
+    pdf.set_line_width(0.5)
+    for line in data['lines']:
+        if y < 120:
+            pdf.add_page()
+            y = table_header(height - 60)
+        text(columns[0], y, line['name'][:55], size=9)
+        text(columns[1], y, _amount(line['price']), size=9, align='right')
+        text(columns[2], y, str(line['quantity']), size=9, align='right')
+        text(columns[3], y, _amount(line['total']), size=9, align='right')
+        pdf.line(left, height - y + 6, right, height - y + 6)
+        y -= 18
+
+    y -= 10
+    for label, value, bold in (
+        ('Sous-total HT', data['subtotal_ht'], False),
+        (f"TVA ({data['tax_rate']:.0f} %)", data['tax_amount'], False),
+        ('Total TTC', data['total_ttc'], True),
+    ):
+        text(380, y, label, size=10, bold=bold)
+        text(columns[3], y, _amount(value), size=10, bold=bold, align='right')
+        y -= 16
+
+    text(left, 50, f"En cas de question, contactez {issuer.get('email', '')} "
+                   f"en indiquant le numéro de facture.", size=8)
+    return bytes(pdf.output())
+
+
+RENDERERS = {'html': render_html, 'pdf': render_pdf}
+
+
+def read_invoice(order_id, version, fmt):
+    """Document déjà rendu pour cette version, ou ``None``."""
+    storage = invoice_storage()
+    name = invoice_path(order_id, version, fmt)
+    if not storage.exists(name):
+        return None
+    with storage.open(name, 'rb') as stored:
+        return stored.read()
+
+
+def store_invoice(order_id, version, fmt, content):
+    """Enregistre le document et supprime les versions précédentes du même format."""
+    storage = invoice_storage()
+    name = invoice_path(order_id, version, fmt)
+    directory = str(order_id)
+    if storage.exists(directory):
+        for filename in storage.listdir(directory)[1]:
+            if filename.endswith(f'.{fmt}') and filename != f'{version}.{fmt}':
+                storage.delete(f'{directory}/{filename}')
+    if not storage.exists(name):
+        storage.save(name, ContentFile(content))
+
+
+def get_invoice(order, fmt='html'):
+    """Document de la facture, rendu au premier accès à cette version de la commande."""
+    version = invoice_version(order)
+    content = read_invoice(order.pk, version, fmt)
+    if content is None:
+        content = RENDERERS[fmt](invoice_data(order))
+        store_invoice(order.pk, version, fmt, content)
+    return content
@@ -0,0 +1,80 @@
+import os
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from orders.invoices import invoice_data, invoice_version, read_invoice, render_pdf, store_invoice
+from orders.models import Order, OrderItem
+
+
+def _month_bounds(month):
+    try:
+        start = datetime.strptime(month, '%Y-%m')
+    except ValueError:
+        raise CommandError("Le mois doit être au format AAAA-MM.") from None
+    end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return timezone.make_aware(start), timezone.make_aware(end)
+
+
+class Command(BaseCommand):
+    help = "Rend en parallèle les factures PDF d'un mois et les regroupe dans une archive zip"
+
+    def add_arguments(self, parser):
+        parser.add_argument('month', help="Mois des commandes, au format AAAA-MM")
+        parser.add_argument(
+            '--output', '-o',
+            help="Chemin de l'archive (par défaut : factures-AAAA-MM.zip)"
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 2,
+            help="Nombre de processus de rendu"
+        )
+
+    def handle(self, *args, **options):
+        start, end = _month_bounds(options['month'])
+        output = options['output'] or f"factures-{options['month']}.zip"
+
+        orders = list(Order.objects.filter(created_at__gte=start, created_at__lt=end).order_by('pk'))
+        if not orders:
+            self.stdout.write("Aucune commande sur cette période.")
+            return
+
+        # Les lignes de toutes les commandes en une requête
+        items = defaultdict(list)
+        for order_id, name, price, quantity in (
+            OrderItem.objects.filter(order__in=orders).order_by('pk')
+            .values_list('order_id', 'product__name', 'price', 'quantity')
+            .iterator(chunk_size=2000)
+        ):
+            items[order_id].append((name, price, quantity))
+
+        documents, jobs = {}, []
+        for order in orders:
+            version = invoice_version(order)
+            content = read_invoice(order.pk, version, 'pdf')
+            if content is None:
+                jobs.append((order.pk, version, invoice_data(order, items[order.pk])))
+            else:
+                documents[order.pk] = content
+
+        if jobs:
+            # Les connexions ne doivent pas être partagées avec les processus fils
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+                rendered = executor.map(render_pdf, [data for _pk, _version, data in jobs], chunksize=16)
+                for (pk, version, _data), content in zip(jobs, rendered):
+                    store_invoice(pk, version, 'pdf', content)
+                    documents[pk] = content
+
+        with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for order in orders:
+                archive.writestr(f'facture-{order.pk}.pdf', documents[order.pk])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(orders)} factures dans {output} ({len(jobs)} rendues, {len(orders) - len(jobs)} déjà prêtes)."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from orders.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = "Recalcule la vue de lecture des commandes (OrderSummary) pour tout l'historique"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Commandes recalculées par requête")
+
+    def handle(self, *args, **options):
+        count = rebuild_summaries(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{count} résumés de commande recalculés."))
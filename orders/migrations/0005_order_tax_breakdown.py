@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:47
+
+from decimal import ROUND_HALF_UP, Decimal
+from django.db import migrations, models
+
+
+def backfill_tax_breakdown(apps, schema_editor):
+    # Commandes existantes : TVA de 20 % incluse dans le total, comme l'affichait la facture
+    Order = apps.get_model('orders', 'Order')
+    rate = Decimal('0.20')
+    orders = []
+    for order in Order.objects.only('pk', 'total_amount').iterator(chunk_size=1000):
+        order.tax_rate = rate
+        order.subtotal_ht = (order.total_amount / (1 + rate)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        order.tax_amount = order.total_amount - order.subtotal_ht
+        orders.append(order)
+    Order.objects.bulk_update(orders, ['tax_rate', 'subtotal_ht', 'tax_amount'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_alter_order_payment_method'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='subtotal_ht',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10, verbose_name='Total HT'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='tax_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10, verbose_name='Montant de TVA'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='tax_rate',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0.2000'), max_digits=5, verbose_name='Taux de TVA'),
+        ),
+        migrations.RunPython(backfill_tax_breakdown, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:52
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_summaries(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderSummary = apps.get_model('orders', 'OrderSummary')
+    weight = ExpressionWrapper(
+        F('items__quantity') * F('items__product__weight'),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+    rows = Order.objects.order_by('pk').annotate(
+        bag_count=Coalesce(Sum('items__quantity'), 0),
+        weight_kg=Sum(weight),
+    ).values(
+        'pk', 'first_name', 'last_name', 'email', 'status', 'delivery_type', 'payment_method',
+        'paid', 'total_amount', 'created_at', 'updated_at', 'bag_count', 'weight_kg',
+    )
+    OrderSummary.objects.bulk_create([
+        OrderSummary(
+            order_id=row['pk'],
+            customer_name=f"{row['first_name']} {row['last_name']}",
+            email=row['email'],
+            status=row['status'],
+            delivery_type=row['delivery_type'],
+            payment_method=row['payment_method'],
+            paid=row['paid'],
+            item_count=row['bag_count'],
+            tonnage=(Decimal(row['weight_kg'] or 0) / 1000).quantize(Decimal('0.001')),
+            total_amount=row['total_amount'],
+            created_at=row['created_at'],
+            updated_at=row['updated_at'],
+        )
+        for row in rows.iterator(chunk_size=1000)
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSummary',
+            fields=[
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='orders.order', verbose_name='Commande')),
+                ('customer_name', models.CharField(max_length=101, verbose_name='Client')),
+                ('email', models.EmailField(max_length=254, verbose_name='Email')),
+                ('status', models.CharField(choices=[('en_attente', 'En attente de paiement'), ('payee', 'Payée'), ('en_preparation', 'En préparation'), ('expediee', 'Expédiée'), ('livree', 'Livrée'), ('annulee', 'Annulée'), ('remboursee', 'Remboursée')], max_length=20, verbose_name='Statut')),
+                ('delivery_type', models.CharField(choices=[('retrait', 'Retrait en magasin'), ('livraison', 'Livraison à domicile')], max_length=20, verbose_name='Type de livraison')),
+                ('payment_method', models.CharField(choices=[('lumicash', 'Lumicash'), ('ecocash', 'EcoCash'), ('ihela', 'Ihela')], max_length=20, verbose_name='Méthode de paiement')),
+                ('paid', models.BooleanField(default=False, verbose_name='Payé')),
+                ('item_count', models.PositiveIntegerField(default=0, verbose_name='Sacs')),
+                ('tonnage', models.DecimalField(decimal_places=3, default=Decimal('0'), max_digits=12, verbose_name='Tonnage (t)')),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Montant total')),
+                ('created_at', models.DateTimeField(verbose_name='Créée le')),
+                ('updated_at', models.DateTimeField(verbose_name='Mise à jour le')),
+            ],
+            options={
+                'verbose_name': 'Suivi de commande',
+                'verbose_name_plural': 'Suivi des commandes',
+                'ordering': ['-created_at', '-order_id'],
+                'indexes': [models.Index(fields=['-created_at', '-order'], name='summary_created_idx'), models.Index(fields=['status', '-created_at', '-order'], name='summary_status_idx'), models.Index(fields=['delivery_type', '-created_at', '-order'], name='summary_delivery_idx'), models.Index(fields=['payment_method', '-created_at', '-order'], name='summary_payment_idx'), models.Index(fields=['paid', '-created_at', '-order'], name='summary_paid_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import ExpressionWrapper, F, Prefetch
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from django.conf import settings
@@ -6,6 +7,20 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from products.models import Product
 
 
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        """Précharge les lignes (une requête pour toute la page) avec leur coût
+        (``line_cost``) et le nom du produit calculés par la base."""
+        items = OrderItem.objects.annotate(
+            line_cost=ExpressionWrapper(
+                F('price') * F('quantity'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+            product_name=F('product__name'),
+        ).order_by('pk')
+        return self.prefetch_related(Prefetch('items', queryset=items))
+
+
 class Order(models.Model):
     """Modèle pour les commandes passées par les clients"""
     STATUS_CHOICES = [
@@ -18,6 +33,9 @@ class Order(models.Model):
         ('remboursee', 'Remboursée'),
     ]
 
+    # Statuts qui annulent le chiffre d'affaires de la commande
+    REVERSED_STATUSES = ('annulee', 'remboursee')
+
     DELIVERY_CHOICES = [
         ('retrait', 'Retrait en magasin'),
         ('livraison', 'Livraison à domicile'),
@@ -83,22 +101,46 @@ class Order(models.Model):
         validators=[MinValueValidator(Decimal('0.01'))],
         verbose_name="Montant total"
     )
+    # Ventilation fiscale figée à la création de la commande (orders.invoices)
+    subtotal_ht = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="Total HT"
+    )
+    tax_rate = models.DecimalField(
+        max_digits=5,
+        decimal_places=4,
+        default=Decimal('0.2000'),
+        verbose_name="Taux de TVA"
+    )
+    tax_amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="Montant de TVA"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Commande"
         verbose_name_plural = "Commandes"
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['-created_at']),
+            # Historique d'un client, paginé par curseur sur (created_at, id)
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
         ]
 
     def __str__(self):
         return f'Commande {self.id}'
         
     def get_total_cost(self):
-        """Calcule le coût total de la commande"""
+        """Calcule le coût total de la commande (sans requête si les lignes
+        sont préchargées par ``with_items``)"""
         return sum(item.get_cost() for item in self.items.all())
         
     def get_status_color(self):
@@ -151,4 +193,83 @@ class OrderItem(models.Model):
 
     def get_cost(self):
         """Calcule le coût total pour cet article"""
+        line_cost = getattr(self, 'line_cost', None)
+        if line_cost is not None:
+            return line_cost
         return self.price * self.quantity
+
+
+class OrderStatusLog(models.Model):
+    """Journal des changements de statut d'une commande (``orders.transitions``)"""
+    order = models.ForeignKey(
+        Order,
+        related_name='status_logs',
+        on_delete=models.CASCADE,
+        verbose_name="Commande"
+    )
+    from_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, verbose_name="Ancien statut")
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, verbose_name="Nouveau statut")
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Par"
+    )
+    note = models.CharField(max_length=255, blank=True, verbose_name="Note")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Changement de statut"
+        verbose_name_plural = "Historique des statuts"
+        ordering = ['created_at', 'pk']
+        indexes = [
+            models.Index(fields=['order', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f'Commande {self.order_id} : {self.from_status} → {self.to_status}'
+
+
+class OrderSummary(models.Model):
+    """Vue de lecture dénormalisée d'une commande pour les listes du personnel
+    (``orders.summaries``) : une ligne par commande, tenue à jour dans la
+    transaction de chaque écriture sur la commande ou ses lignes."""
+    order = models.OneToOneField(
+        Order,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='summary',
+        verbose_name="Commande"
+    )
+    customer_name = models.CharField(max_length=101, verbose_name="Client")
+    email = models.EmailField(verbose_name="Email")
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, verbose_name="Statut")
+    delivery_type = models.CharField(max_length=20, choices=Order.DELIVERY_CHOICES, verbose_name="Type de livraison")
+    payment_method = models.CharField(max_length=20, choices=Order.PAYMENT_METHODS, verbose_name="Méthode de paiement")
+    paid = models.BooleanField(default=False, verbose_name="Payé")
+    item_count = models.PositiveIntegerField(default=0, verbose_name="Sacs")
+    tonnage = models.DecimalField(max_digits=12, decimal_places=3, default=Decimal('0'), verbose_name="Tonnage (t)")
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Montant total")
+    created_at = models.DateTimeField(verbose_name="Créée le")
+    updated_at = models.DateTimeField(verbose_name="Mise à jour le")
+
+    class Meta:
+        verbose_name = "Suivi de commande"
+        verbose_name_plural = "Suivi des commandes"
+        ordering = ['-created_at', '-order_id']
+        # Un index par filtre du personnel, suivi du tri de la liste
+        indexes = [
+            models.Index(fields=['-created_at', '-order'], name='summary_created_idx'),
+            models.Index(fields=['status', '-created_at', '-order'], name='summary_status_idx'),
+            models.Index(fields=['delivery_type', '-created_at', '-order'], name='summary_delivery_idx'),
+            models.Index(fields=['payment_method', '-created_at', '-order'], name='summary_payment_idx'),
+            models.Index(fields=['paid', '-created_at', '-order'], name='summary_paid_idx'),
+        ]
+
+    def __str__(self):
+        return f'Commande {self.order_id}'
+
+    def get_status_color(self):
+        return Order(status=self.status).get_status_color()
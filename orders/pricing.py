@@ -0,0 +1,131 @@
+"""
+Tarification du panier au moment de la commande.
+
+Le panier mémorise le prix de chaque produit au moment de l'ajout. Avant de
+créer une commande, ``price_cart`` re-tarifie tout le panier d'après le
+catalogue, en une requête (identifiant, nom, prix et disponibilité des
+produits), et signale les écarts :
+
+* ``price_changed`` : le prix du catalogue a changé depuis l'ajout ; la
+  commande est passée au prix du catalogue, une fois que le client a vu ce
+  prix (empreinte ``fingerprint`` renvoyée par le formulaire) ;
+* ``unavailable`` / ``missing`` : le produit n'est plus vendu ; la commande
+  est refusée tant qu'il reste dans le panier.
+
+Le résultat (``PriceQuote``) est immuable : c'est l'instantané des prix
+enregistré avec la commande. Les montants sont des ``Decimal`` exacts.
+"""
+import hashlib
+from dataclasses import dataclass
+from decimal import Decimal
+
+from core.money import from_minor, to_minor
+from products.models import Product
+
+PRICE_CHANGED = 'price_changed'
+UNAVAILABLE = 'unavailable'
+MISSING = 'missing'
+
+# Écarts qui empêchent de passer la commande
+BLOCKING = (UNAVAILABLE, MISSING)
+
+
+@dataclass(frozen=True)
+class PricedLine:
+    """Ligne re-tarifiée : prix du catalogue et prix mémorisé dans le panier."""
+    product_id: int
+    product_name: str
+    quantity: int
+    unit_price: Decimal
+    cart_price: Decimal
+
+    @property
+    def total_price(self):
+        return self.unit_price * self.quantity
+
+    @property
+    def price_changed(self):
+        return self.unit_price != self.cart_price
+
+
+@dataclass(frozen=True)
+class PriceIssue:
+    product_id: int
+    product_name: str
+    kind: str
+    cart_price: Decimal
+    unit_price: Decimal = None
+
+    @property
+    def blocking(self):
+        return self.kind in BLOCKING
+
+    @property
+    def message(self):
+        if self.kind == PRICE_CHANGED:
+            return (
+                f"Le prix de « {self.product_name} » est passé de {self.cart_price} "
+                f"à {self.unit_price} depuis son ajout au panier."
+            )
+        if self.kind == UNAVAILABLE:
+            return f"« {self.product_name} » n'est plus disponible : retirez-le du panier."
+        return "Un produit de votre panier n'existe plus : retirez-le du panier."
+
+
+@dataclass(frozen=True)
+class PriceQuote:
+    lines: tuple
+    issues: tuple
+
+    @property
+    def total(self):
+        return from_minor(sum(to_minor(line.unit_price) * line.quantity for line in self.lines))
+
+    @property
+    def item_count(self):
+        return sum(line.quantity for line in self.lines)
+
+    @property
+    def is_orderable(self):
+        return bool(self.lines) and not any(issue.blocking for issue in self.issues)
+
+    @property
+    def has_price_changes(self):
+        return any(issue.kind == PRICE_CHANGED for issue in self.issues)
+
+    @property
+    def fingerprint(self):
+        """Empreinte des lignes et des prix présentés au client."""
+        payload = ';'.join(
+            f'{line.product_id}:{line.quantity}:{line.unit_price}' for line in self.lines
+        )
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def price_items(items):
+    """Re-tarifie ``{product_id: (quantité, prix mémorisé)}`` en une requête."""
+    catalog = {
+        pk: (name, price, available)
+        for pk, name, price, available in Product.objects.filter(pk__in=list(items)).values_list(
+            'pk', 'name', 'price', 'available'
+        )
+    }
+    lines, issues = [], []
+    for product_id, (quantity, cart_price) in items.items():
+        if product_id not in catalog:
+            issues.append(PriceIssue(product_id, '', MISSING, cart_price))
+            continue
+        name, price, available = catalog[product_id]
+        if not available:
+            issues.append(PriceIssue(product_id, name, UNAVAILABLE, cart_price))
+            continue
+        line = PricedLine(product_id, name, quantity, price, cart_price)
+        if line.price_changed:
+            issues.append(PriceIssue(product_id, name, PRICE_CHANGED, cart_price, price))
+        lines.append(line)
+    return PriceQuote(tuple(lines), tuple(issues))
+
+
+def price_cart(cart):
+    """Re-tarifie un ``cart.cart.Cart`` sans charger ses produits."""
+    return price_items(cart.items)
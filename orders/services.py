@@ -0,0 +1,80 @@
+"""
+Passage de commande transactionnel.
+
+``place_order`` enregistre en une transaction la commande, toutes ses lignes
+(un seul ``bulk_create``) et la sortie de stock correspondante. Le stock est
+décrémenté par des mises à jour conditionnelles ``F()``
+(``adjust_balance(allow_negative=False)``) : deux commandes concurrentes sur
+le même produit ne peuvent pas vendre plus que le solde, la seconde échoue
+avec ``InsufficientStock`` et rien n'est enregistré pour elle.
+
+L'email de confirmation est mis en boîte d'envoi dans la même transaction
+(``core.outbox``) ; il est envoyé par la commande ``send_outbox``. Avec une
+clé d'idempotence, un doublon de la même soumission (même simultané) ne crée
+rien et lève ``DuplicateRequest`` avec la commande d'origine. La vue de
+lecture du personnel (``orders.summaries``) est mise à jour dans la même
+transaction.
+"""
+from django.db import transaction
+
+from core import idempotency
+from core.outbox import queue_email
+from products.models import StockMovement, StockMovementType
+from products.stock import adjust_balance
+
+from .invoices import tax_breakdown, tax_rate
+from .models import OrderItem
+from .summaries import refresh_summaries
+
+IDEMPOTENCY_SCOPE = 'order_create'
+
+
+class OrderNotPlaceable(Exception):
+    """Le devis contient des produits qui ne peuvent plus être commandés."""
+
+
+@transaction.atomic
+def place_order(order, quote, user=None, idempotency_key=None):
+    """Enregistre ``order`` (non sauvegardée) avec les lignes de ``quote``
+    (``orders.pricing.PriceQuote``) et réserve le stock ; retourne la commande."""
+    # En premier : un doublon attend ici la fin de la requête d'origine
+    key = idempotency.reserve(order.user, IDEMPOTENCY_SCOPE, idempotency_key) if idempotency_key else None
+    if not quote.is_orderable:
+        raise OrderNotPlaceable([issue.message for issue in quote.issues if issue.blocking])
+
+    # Ordre fixe des verrous : deux commandes croisées ne peuvent pas s'interbloquer
+    lines = sorted(quote.lines, key=lambda line: line.product_id)
+    for line in lines:
+        adjust_balance(line.product_id, -line.quantity, allow_negative=False)
+
+    order.total_amount = quote.total
+    order.tax_rate = tax_rate()
+    order.subtotal_ht, order.tax_amount = tax_breakdown(order.total_amount, order.tax_rate)
+    order._summary_deferred = True
+    order.save()
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product_id=line.product_id, price=line.unit_price, quantity=line.quantity)
+        for line in lines
+    ])
+    # Les lignes insérées en masse ne passent pas par les signaux
+    refresh_summaries([order.pk])
+    del order._summary_deferred
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            product_id=line.product_id,
+            movement_type=StockMovementType.OUT,
+            quantity=-line.quantity,
+            reference=f'Commande {order.pk}',
+            created_by=user,
+        )
+        for line in lines
+    ])
+    queue_email(
+        f'Confirmation de votre commande N°{order.pk}',
+        [order.email],
+        'orders/order/email/order_created.html',
+        {'order': order, 'lines': lines, 'total': order.total_amount},
+    )
+    if key is not None:
+        idempotency.complete(key, order.pk)
+    return order
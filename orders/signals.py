@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Order, OrderItem
+from .summaries import refresh_summaries
+
+
+@receiver(post_save, sender=Order)
+def refresh_order_summary(sender, instance, raw=False, **kwargs):
+    """Résumé recalculé dans la transaction de l'enregistrement de la commande
+    (sauf si l'appelant s'en charge après avoir écrit les lignes)."""
+    if not raw and not getattr(instance, '_summary_deferred', False):
+        refresh_summaries([instance.pk])
+
+
+@receiver(post_save, sender=OrderItem)
+def refresh_summary_of_saved_item(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_summaries([instance.order_id])
+
+
+@receiver(post_delete, sender=OrderItem)
+def refresh_summary_of_deleted_item(sender, instance, origin=None, **kwargs):
+    # Ligne supprimée en cascade avec sa commande : le résumé part avec elle
+    origin_model = getattr(origin, 'model', type(origin))
+    if origin_model is not Order:
+        refresh_summaries([instance.order_id])
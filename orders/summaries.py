@@ -0,0 +1,80 @@
+"""
+Vue de lecture des commandes (``OrderSummary``) pour les listes du personnel.
+
+Les listes et filtres du personnel (statut, livraison, paiement) lisent une
+table étroite, une ligne par commande, avec les valeurs d'affichage déjà
+calculées (client, nombre de sacs, tonnage, total) et un index composite par
+filtre suivi du tri : une page coûte O(taille de la page), quel que soit
+l'historique.
+
+La vue est recalculée dans la transaction de l'écriture : à chaque
+``save()`` d'une commande ou d'une ligne (signaux), et explicitement par le
+code qui écrit en masse (``place_order``, ``queryset.update()``) via
+``refresh_summaries``.
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Order, OrderSummary
+
+SUMMARY_FIELDS = [
+    'customer_name', 'email', 'status', 'delivery_type', 'payment_method', 'paid',
+    'item_count', 'tonnage', 'total_amount', 'created_at', 'updated_at',
+]
+
+TONNE = Decimal('0.001')
+
+
+def build_summaries(orders):
+    """Résumés (non enregistrés) des commandes du queryset ``orders``, en une requête."""
+    weight = ExpressionWrapper(
+        F('items__quantity') * F('items__product__weight'),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+    rows = orders.order_by().annotate(
+        bag_count=Coalesce(Sum('items__quantity'), 0),
+        weight_kg=Sum(weight),
+    ).values(
+        'pk', 'first_name', 'last_name', 'email', 'status', 'delivery_type', 'payment_method',
+        'paid', 'total_amount', 'created_at', 'updated_at', 'bag_count', 'weight_kg',
+    )
+    return [
+        OrderSummary(
+            order_id=row['pk'],
+            customer_name=f"{row['first_name']} {row['last_name']}",
+            email=row['email'],
+            status=row['status'],
+            delivery_type=row['delivery_type'],
+            payment_method=row['payment_method'],
+            paid=row['paid'],
+            item_count=row['bag_count'],
+            tonnage=(Decimal(row['weight_kg'] or 0) / 1000).quantize(TONNE),
+            total_amount=row['total_amount'],
+            created_at=row['created_at'],
+            updated_at=row['updated_at'],
+        )
+        for row in rows
+    ]
+
+
+def refresh_summaries(order_ids):
+    """Recalcule les résumés des commandes ``order_ids`` (une lecture, une écriture)."""
+    order_ids = set(order_ids)
+    if not order_ids:
+        return
+    OrderSummary.objects.bulk_create(
+        build_summaries(Order.objects.filter(pk__in=order_ids)),
+        update_conflicts=True,
+        unique_fields=['order'],
+        update_fields=SUMMARY_FIELDS,
+    )
+
+
+def rebuild_summaries(batch_size=1000):
+    """Recalcule la vue pour toutes les commandes ; retourne leur nombre."""
+    ids = list(Order.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ids), batch_size):
+        refresh_summaries(ids[start:start + batch_size])
+    return len(ids)
@@ -1,3 +1,777 @@
-from django.test import TestCase
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from datetime import datetime
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.core import mail
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from cart.cart import Cart
+from core.counters import reconcile as reconcile_counters
+from core.idempotency import DuplicateRequest
+from core.models import IdempotencyKey, OutboundEmail
+from core.outbox import drain
+from products.models import Category, Product, StockBalance, StockMovement, StockMovementType
+from products.stock import InsufficientStock, record_movement
+
+from .invoices import invoice_version, tax_breakdown
+from .models import Order, OrderItem, OrderStatusLog, OrderSummary
+from .pricing import MISSING, PRICE_CHANGED, UNAVAILABLE, price_cart, price_items
+from .services import OrderNotPlaceable, place_order
+from .transitions import InvalidTransition, can_transition, sources_for, transition
+
+ORDER_DATA = {
+    'first_name': 'Jean',
+    'last_name': 'Ndayishimiye',
+    'email': 'jean@example.com',
+    'phone': '0999999999',
+    'delivery_type': 'retrait',
+    'payment_method': 'lumicash',
+}
+
+
+class PricingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Ciment', slug='ciment')
+        cls.products = [
+            Product.objects.create(
+                name=f'Ciment n°{i:02d}', category=category, cement_type='CPJ42.5',
+                price=Decimal('0.10') + i, weight=Decimal('50.00'),
+            )
+            for i in range(25)
+        ]
+
+    def test_whole_cart_is_priced_in_one_query(self):
+        items = {product.id: (3, product.price) for product in self.products}
+        with self.assertNumQueries(1):
+            quote = price_items(items)
+        self.assertEqual(quote.issues, ())
+        self.assertTrue(quote.is_orderable)
+        # 3 × (0,10 × 25 + 300) : exact, sans erreur d'arrondi
+        self.assertEqual(quote.total, Decimal('907.50'))
+        self.assertEqual(quote.item_count, 75)
+
+    def test_drift_and_unavailable_products_are_flagged(self):
+        drifted, withdrawn, deleted = self.products[:3]
+        Product.objects.filter(pk=drifted.pk).update(price=Decimal('9.99'))
+        Product.objects.filter(pk=withdrawn.pk).update(available=False)
+        deleted_id = deleted.pk
+        deleted.delete()
+
+        quote = price_items({
+            drifted.id: (2, drifted.price),
+            withdrawn.id: (1, withdrawn.price),
+            deleted_id: (1, deleted.price),
+            self.products[3].id: (1, self.products[3].price),
+        })
+        self.assertEqual(
+            [(issue.product_id, issue.kind) for issue in quote.issues],
+            [(drifted.id, PRICE_CHANGED), (withdrawn.id, UNAVAILABLE), (deleted_id, MISSING)],
+        )
+        self.assertFalse(quote.is_orderable)
+        self.assertTrue(quote.has_price_changes)
+        self.assertEqual(quote.total, Decimal('23.08'))
+        self.assertIn('9.99', quote.issues[0].message)
+
+    def test_quote_is_immutable_and_fingerprinted(self):
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        cart = Cart(request)
+        cart.add(self.products[0], quantity=2)
+        quote = price_cart(cart)
+        with self.assertRaises(AttributeError):
+            quote.lines[0].unit_price = Decimal('0.01')
+        self.assertEqual(quote.fingerprint, price_cart(cart).fingerprint)
+        Product.objects.filter(pk=self.products[0].pk).update(price=Decimal('1.00'))
+        self.assertNotEqual(quote.fingerprint, price_cart(cart).fingerprint)
+
+
+class OrderCreateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Ciment', slug='ciment')
+        cls.products = [
+            Product.objects.create(
+                name=f'Ciment n°{i}', category=category, cement_type='CPJ42.5',
+                price=Decimal('25000.00'), weight=Decimal('50.00'),
+            )
+            for i in range(2)
+        ]
+        for product in cls.products:
+            record_movement(product, StockMovementType.IN, 10)
+        cls.user = User.objects.create_user('client', password='secret')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        for product in self.products:
+            self.client.post(reverse('cart:cart_add', args=[product.id]), {'quantity': 2})
+
+    def test_order_is_created_from_the_quote(self):
+        response = self.client.post(reverse('orders:order_create'), ORDER_DATA)
+        order = Order.objects.get()
+        self.assertRedirects(response, reverse('orders:invoice', args=[order.id]), fetch_redirect_response=False)
+        self.assertEqual(order.total_amount, Decimal('100000.00'))
+        self.assertEqual(sorted(order.items.values_list('quantity', 'price')), [(2, Decimal('25000.00'))] * 2)
+        self.assertEqual(list(StockBalance.objects.values_list('quantity', flat=True)), [8, 8])
+        self.assertEqual(StockMovement.objects.filter(reference=f'Commande {order.id}').count(), 2)
+
+        # La confirmation attend dans la boîte d'envoi, hors de la requête
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(drain(workers=1), (1, 0))
+        self.assertEqual(mail.outbox[0].to, ['jean@example.com'])
+        self.assertIn(f'N°{order.id}', mail.outbox[0].subject)
+        self.assertIn('Ciment n°1', mail.outbox[0].body)
+
+    def test_insufficient_stock_rolls_back_everything(self):
+        self.client.post(reverse('cart:cart_add', args=[self.products[1].id]), {'quantity': 20})
+        response = self.client.post(reverse('orders:order_create'), ORDER_DATA)
+        self.assertContains(response, 'Stock insuffisant pour « Ciment n°1 »')
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertFalse(OutboundEmail.objects.exists())
+        self.assertEqual(list(StockBalance.objects.values_list('quantity', flat=True)), [10, 10])
+
+    def test_product_without_stock_balance_has_no_stock(self):
+        StockBalance.objects.filter(product=self.products[0]).delete()
+        response = self.client.post(reverse('orders:order_create'), ORDER_DATA)
+        self.assertContains(response, 'Stock insuffisant pour « Ciment n°0 » (disponible : 0)')
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(StockBalance.objects.filter(product=self.products[0]).exists())
+
+        # Commandable dès que le stock est saisi
+        record_movement(self.products[0], StockMovementType.IN, 5)
+        self.client.post(reverse('orders:order_create'), ORDER_DATA)
+        self.assertTrue(Order.objects.exists())
+        self.assertEqual(StockBalance.objects.get(product=self.products[0]).quantity, 3)
+
+    def test_price_drift_requires_confirmation(self):
+        Product.objects.filter(pk=self.products[0].pk).update(price=Decimal('26000.00'))
+
+        response = self.client.post(reverse('orders:order_create'), ORDER_DATA)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Order.objects.exists())
+        quote = response.context['quote']
+        self.assertContains(response, '26000.00')
+
+        self.client.post(reverse('orders:order_create'), {**ORDER_DATA, 'price_fingerprint': quote.fingerprint})
+        order = Order.objects.get()
+        self.assertEqual(order.total_amount, Decimal('102000.00'))
+
+    def test_unavailable_product_blocks_the_order(self):
+        Product.objects.filter(pk=self.products[1].pk).update(available=False)
+        response = self.client.get(reverse('orders:order_create'))
+        quote = response.context['quote']
+        response = self.client.post(reverse('orders:order_create'), {**ORDER_DATA, 'price_fingerprint': quote.fingerprint})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "plus disponible")
+        self.assertFalse(Order.objects.exists())
+
+
+class PlaceOrderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Ciment', slug='ciment')
+        cls.products = [
+            Product.objects.create(
+                name=f'Ciment n°{i:02d}', category=category, cement_type='CPJ42.5',
+                price=Decimal('1000.00'), weight=Decimal('50.00'),
+            )
+            for i in range(30)
+        ]
+        for product in cls.products:
+            record_movement(product, StockMovementType.IN, 100)
+        cls.user = User.objects.create_user('client', password='secret')
+
+    def make_order(self):
+        return Order(user=self.user, phone='0999999999', payment_method='lumicash', **{
+            key: ORDER_DATA[key] for key in ('first_name', 'last_name', 'email', 'delivery_type')
+        })
+
+    def test_items_are_inserted_in_bulk(self):
+        small = price_items({product.id: (1, product.price) for product in self.products[:2]})
+        large = price_items({product.id: (1, product.price) for product in self.products})
+        # Première commande : crée les compteurs du tableau de bord
+        place_order(self.make_order(), small, user=self.user)
+        with self.assertNumQueries(len(small.lines) + 9):
+            place_order(self.make_order(), small, user=self.user)
+        # Une mise à jour de stock par ligne ; compteurs, lignes, résumé, mouvements et email en bloc
+        with self.assertNumQueries(len(large.lines) + 9):
+            order = place_order(self.make_order(), large, user=self.user)
+        self.assertEqual(order.items.count(), 30)
+        self.assertEqual(order.total_amount, Decimal('30000.00'))
+
+    def balances(self, products):
+        return list(StockBalance.objects.filter(product__in=products).order_by('product_id').values_list('quantity', flat=True))
+
+    def test_cancelling_returns_the_reserved_stock(self):
+        products = self.products[:2]
+        quote = price_items({product.id: (7, product.price) for product in products})
+        order = place_order(self.make_order(), quote, user=self.user)
+        self.assertEqual(self.balances(products), [93, 93])
+
+        transition([order.pk], 'annulee', user=self.user)
+        self.assertEqual(self.balances(products), [100, 100])
+        returns = StockMovement.objects.filter(movement_type=StockMovementType.IN, reference=f'Retour commande {order.pk}')
+        self.assertEqual(sorted(returns.values_list('product_id', 'quantity')), [(p.id, 7) for p in products])
+
+    def test_refund_returns_stock_only_before_shipment(self):
+        product = self.products[0]
+        quote = price_items({product.id: (5, product.price)})
+        paid, shipped = (place_order(self.make_order(), quote) for _ in range(2))
+        transition([paid.pk, shipped.pk], 'payee')
+        transition([shipped.pk], 'en_preparation')
+        transition([shipped.pk], 'expediee')
+        transition([shipped.pk], 'livree')
+
+        result = transition([paid.pk, shipped.pk], 'remboursee')
+        self.assertEqual(sorted(result.applied), sorted([paid.pk, shipped.pk]))
+        # Seule la commande non expédiée est rendue au stock
+        self.assertEqual(self.balances([product]), [95])
+
+    def test_staff_cancellation_returns_the_reserved_stock(self):
+        product = self.products[0]
+        order = place_order(self.make_order(), price_items({product.id: (4, product.price)}))
+        self.client.force_login(User.objects.create_superuser('gerant', password='secret'))
+        data = {'status': 'annulee', 'delivery_type': 'retrait', 'payment_method': 'lumicash'}
+        self.client.post(reverse('orders:admin_order_update', args=[order.pk]), data)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'annulee')
+        self.assertEqual(self.balances([product]), [100])
+
+    def test_unorderable_quote_is_refused(self):
+        Product.objects.filter(pk=self.products[0].pk).update(available=False)
+        quote = price_items({self.products[0].id: (1, Decimal('1000.00'))})
+        with self.assertRaises(OrderNotPlaceable):
+            place_order(self.make_order(), quote)
+        self.assertFalse(Order.objects.exists())
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Commandes simultanées sur le même produit, chacune dans son thread et sa connexion."""
+
+    def test_parallel_checkouts_never_oversell(self):
+        category = Category.objects.create(name='Ciment', slug='ciment')
+        product = Product.objects.create(
+            name='Ciment CPJ42.5', category=category, cement_type='CPJ42.5',
+            price=Decimal('1000.00'), weight=Decimal('50.00'),
+        )
+        record_movement(product, StockMovementType.IN, 10)
+        user = User.objects.create_user('client', password='secret')
+
+        workers = 8
+        barrier = threading.Barrier(workers)
+        outcomes = []
+
+        def checkout():
+            try:
+                quote = price_items({product.id: (3, product.price)})
+                order = Order(
+                    user=user, first_name='Jean', last_name='N', email='jean@example.com',
+                    phone='0999999999', payment_method='lumicash',
+                )
+                barrier.wait()
+                for _attempt in range(200):
+                    try:
+                        place_order(order, quote)
+                    except OperationalError:
+                        # SQLite en mémoire partagée : table verrouillée par un
+                        # autre thread, la transaction entière est rejouée
+                        order.pk = None
+                        time.sleep(0.005)
+                        continue
+                    outcomes.append('ok')
+                    break
+            except InsufficientStock:
+                outcomes.append('refused')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # 10 sacs en stock, 3 par commande : exactement 3 commandes passent
+        self.assertEqual(outcomes.count('ok'), 3)
+        self.assertEqual(outcomes.count('refused'), workers - 3)
+        self.assertEqual(StockBalance.objects.get(product=product).quantity, 1)
+        self.assertEqual(Order.objects.count(), 3)
+
+
+class IdempotentCheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Ciment', slug='ciment')
+        cls.product = Product.objects.create(
+            name='Ciment CPJ42.5', category=category, cement_type='CPJ42.5',
+            price=Decimal('25000.00'), weight=Decimal('50.00'),
+        )
+        record_movement(cls.product, StockMovementType.IN, 10)
+        cls.user = User.objects.create_user('client', password='secret')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('cart:cart_add', args=[self.product.id]), {'quantity': 2})
+
+    def test_replayed_post_returns_the_original_order(self):
+        key = self.client.get(reverse('orders:order_create')).context['idempotency_key']
+        data = {**ORDER_DATA, 'idempotency_key': key}
+        first = self.client.post(reverse('orders:order_create'), data)
+        order = Order.objects.get()
+        with self.assertNumQueries(2):
+            # Utilisateur et clé : ni panier, ni tarification, ni commande
+            second = self.client.post(reverse('orders:order_create'), data)
+        self.assertEqual(first['Location'], second['Location'])
+        self.assertEqual(second['Location'], reverse('orders:invoice', args=[order.id]))
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+        self.assertEqual(StockBalance.objects.get(product=self.product).quantity, 8)
+
+        # Le même en-tête côté client mobile
+        response = self.client.post(reverse('orders:order_create'), ORDER_DATA, HTTP_IDEMPOTENCY_KEY=key)
+        self.assertEqual(response['Location'], reverse('orders:invoice', args=[order.id]))
+
+    def test_new_key_places_a_new_order(self):
+        self.client.post(reverse('orders:order_create'), {**ORDER_DATA, 'idempotency_key': 'a' * 32})
+        self.client.post(reverse('cart:cart_add', args=[self.product.id]), {'quantity': 1})
+        self.client.post(reverse('orders:order_create'), {**ORDER_DATA, 'idempotency_key': 'b' * 32})
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_invalid_key_is_rejected(self):
+        response = self.client.post(reverse('orders:order_create'), {**ORDER_DATA, 'idempotency_key': 'x y'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_expired_keys_are_purged_and_reusable(self):
+        self.client.post(reverse('orders:order_create'), {**ORDER_DATA, 'idempotency_key': 'c' * 32})
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        self.client.post(reverse('cart:cart_add', args=[self.product.id]), {'quantity': 1})
+        self.client.post(reverse('orders:order_create'), {**ORDER_DATA, 'idempotency_key': 'c' * 32})
+        self.assertEqual(Order.objects.count(), 2)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        call_command('purge_idempotency_keys', stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class ConcurrentDuplicateSubmissionTests(TransactionTestCase):
+    """Doublons simultanés d'une même soumission, chacun dans son thread."""
+
+    def test_only_one_order_is_created(self):
+        category = Category.objects.create(name='Ciment', slug='ciment')
+        product = Product.objects.create(
+            name='Ciment CPJ42.5', category=category, cement_type='CPJ42.5',
+            price=Decimal('1000.00'), weight=Decimal('50.00'),
+        )
+        record_movement(product, StockMovementType.IN, 100)
+        user = User.objects.create_user('client', password='secret')
+
+        workers = 6
+        barrier = threading.Barrier(workers)
+        outcomes = []
+
+        def submit():
+            try:
+                quote = price_items({product.id: (2, product.price)})
+                order = Order(
+                    user=user, first_name='Jean', last_name='N', email='jean@example.com',
+                    phone='0999999999', payment_method='lumicash',
+                )
+                barrier.wait()
+                for _attempt in range(200):
+                    try:
+                        outcomes.append(('created', place_order(order, quote, idempotency_key='k' * 32).pk))
+                    except OperationalError:
+                        # SQLite en mémoire partagée : la transaction est rejouée
+                        order.pk = None
+                        time.sleep(0.005)
+                        continue
+                    except DuplicateRequest as duplicate:
+                        outcomes.append(('duplicate', duplicate.result_id))
+                    break
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        order = Order.objects.get()
+        self.assertEqual(sorted(outcomes), [('created', order.pk)] + [('duplicate', order.pk)] * (workers - 1))
+        self.assertEqual(StockBalance.objects.get(product=product).quantity, 98)
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
+
+class InvoiceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Ciment', slug='ciment')
+        cls.product = Product.objects.create(
+            name='Ciment Portland CPJ42.5', category=category, cement_type='CPJ42.5',
+            price=Decimal('25000.10'), weight=Decimal('50.00'),
+        )
+        record_movement(cls.product, StockMovementType.IN, 100)
+        cls.user = User.objects.create_user('client', password='secret')
+        cls.other = User.objects.create_user('autre', password='secret')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.media_root = Path(media_root)
+        self.invoice_root = self.media_root / 'private'
+        storages = {
+            **settings.STORAGES,
+            'invoices': {
+                'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                'OPTIONS': {'location': self.invoice_root},
+            },
+        }
+        settings_override = override_settings(MEDIA_ROOT=self.media_root / 'public', STORAGES=storages)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def place(self, quantity=3, created_at=None):
+        order = Order(user=self.user, phone='0999999999', payment_method='lumicash', **{
+            key: ORDER_DATA[key] for key in ('first_name', 'last_name', 'email', 'delivery_type')
+        })
+        order = place_order(order, price_items({self.product.id: (quantity, self.product.price)}))
+        if created_at:
+            Order.objects.filter(pk=order.pk).update(created_at=created_at)
+            order.refresh_from_db()
+        return order
+
+    def test_tax_breakdown_is_stored_at_creation(self):
+        self.assertEqual(tax_breakdown(Decimal('100.00')), (Decimal('83.33'), Decimal('16.67')))
+        order = self.place()
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal('75000.30'))
+        self.assertEqual(order.tax_rate, Decimal('0.2000'))
+        self.assertEqual(order.subtotal_ht + order.tax_amount, order.total_amount)
+        self.assertEqual(order.subtotal_ht, Decimal('62500.25'))
+
+    def test_invoice_is_rendered_once_per_version(self):
+        order = self.place()
+        self.client.force_login(self.user)
+        url = reverse('orders:invoice', args=[order.id])
+        response = self.client.get(url)
+        self.assertContains(response, 'Ciment Portland CPJ42.5')
+        self.assertContains(response, '62,500.25 BIF')
+        self.assertEqual(len(list((self.invoice_root / str(order.id)).iterdir())), 1)
+        # Rien sous MEDIA_ROOT, qui est servi publiquement
+        self.assertFalse((self.media_root / 'public').exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([query for query in queries if 'orders_orderitem' in query['sql']])
+
+        # Nouvelle version après un changement de statut ; l'ancienne est supprimée
+        order.paid = True
+        order.save()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertTrue([query for query in queries if 'orders_orderitem' in query['sql']])
+        self.assertContains(response, 'Payée')
+        self.assertEqual(
+            [path.name for path in (self.invoice_root / str(order.id)).iterdir()],
+            [f'{invoice_version(order)}.html'],
+        )
+
+    def test_pdf_download(self):
+        order = self.place()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('orders:invoice_pdf', args=[order.id]))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn(f'facture-{order.id}.pdf', response['Content-Disposition'])
+        content = response.content
+        self.assertTrue(content.startswith(b'%PDF-'))
+        self.assertTrue(content.rstrip().endswith(b'%%EOF'))
+        stream = content.split(b'stream\n', 1)[1].split(b'\nendstream', 1)[0]
+        page = zlib.decompress(stream).decode('latin-1')
+        self.assertIn('(Ciment Portland CPJ42.5) Tj', page)
+        self.assertIn('Référence client', page)
+
+    def test_other_customers_cannot_see_the_invoice(self):
+        order = self.place()
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(reverse('orders:invoice', args=[order.id])).status_code, 403)
+        self.assertEqual(self.client.get(reverse('orders:invoice_pdf', args=[order.id])).status_code, 403)
+
+    def test_monthly_export(self):
+        september = timezone.make_aware(datetime(2026, 9, 15))
+        orders = [self.place(quantity=1, created_at=september) for _ in range(3)]
+        self.place(quantity=1)
+        output = self.media_root / 'export.zip'
+
+        out = StringIO()
+        call_command('export_invoices', '2026-09', output=str(output), workers=2, stdout=out)
+        self.assertIn('3 factures', out.getvalue())
+        self.assertIn('3 rendues', out.getvalue())
+        with zipfile.ZipFile(output) as archive:
+            self.assertEqual(sorted(archive.namelist()), sorted(f'facture-{order.id}.pdf' for order in orders))
+            self.assertTrue(archive.read(f'facture-{orders[0].id}.pdf').startswith(b'%PDF'))
+
+        # Les PDF rendus sont réutilisés
+        out = StringIO()
+        call_command('export_invoices', '2026-09', output=str(output), workers=2, stdout=out)
+        self.assertIn('0 rendues', out.getvalue())
+
+
+class OrderHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Ciment', slug='ciment')
+        cls.product = Product.objects.create(
+            name='Ciment Portland CPJ42.5', category=category, cement_type='CPJ42.5',
+            price=Decimal('25000.00'), weight=Decimal('50.00'),
+        )
+        cls.user = User.objects.create_user('client', password='secret')
+        other = User.objects.create_user('autre', password='secret')
+        fields = {key: ORDER_DATA[key] for key in ('first_name', 'last_name', 'email', 'phone', 'payment_method')}
+        Order.objects.bulk_create(
+            [Order(user=cls.user, total_amount=Decimal('50000.00'), **fields) for _ in range(35)]
+            + [Order(user=other, total_amount=Decimal('50000.00'), **fields)]
+        )
+        # Des dates identiques par paquets de trois : l'id départage
+        base = timezone.make_aware(datetime(2026, 9, 1))
+        for i, pk in enumerate(Order.objects.filter(user=cls.user).order_by('pk').values_list('pk', flat=True)):
+            Order.objects.filter(pk=pk).update(created_at=base.replace(day=1 + i // 3))
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=cls.product, price=Decimal('25000.00'), quantity=2)
+            for order in Order.objects.all()
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def walk(self, sort='-created_at'):
+        """Parcourt toutes les pages ; retourne les ids et le nombre de requêtes par page."""
+        ids, queries, cursor = [], [], None
+        while True:
+            params = {'sort': sort}
+            if cursor:
+                params['cursor'] = cursor
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(reverse('orders:order_list'), params)
+            queries.append(len(captured))
+            page = response.context['orders']
+            ids += [order.pk for order in page]
+            if not page.has_next:
+                return ids, queries
+            cursor = page.next_cursor
+
+    def test_pages_cover_the_history_in_order(self):
+        expected = list(
+            Order.objects.filter(user=self.user).order_by('-created_at', '-id').values_list('pk', flat=True)
+        )
+        ids, queries = self.walk()
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(queries), 4)
+
+        ids, _queries = self.walk('created_at')
+        self.assertEqual(ids, expected[::-1])
+
+    def test_query_count_does_not_depend_on_depth(self):
+        _ids, queries = self.walk()
+        self.assertEqual(len(set(queries)), 1, queries)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('orders:order_list'))
+        sql = [query['sql'] for query in captured]
+        self.assertFalse([query for query in sql if 'COUNT(' in query or 'OFFSET' in query])
+        self.assertEqual(len([query for query in sql if 'orders_orderitem' in query]), 1)
+        self.assertContains(response, '2 × Ciment Portland CPJ42.5')
+        self.assertContains(response, '50,000.00 BIF')
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('orders:order_list'), {'cursor': 'xx'})
+        self.assertEqual(response.status_code, 404)
+
+
+class OrderSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Ciment', slug='ciment')
+        cls.product = Product.objects.create(
+            name='Ciment Portland CPJ42.5', category=category, cement_type='CPJ42.5',
+            price=Decimal('25000.00'), weight=Decimal('50.00'),
+        )
+        record_movement(cls.product, StockMovementType.IN, 1000)
+        cls.user = User.objects.create_user('client', password='secret')
+        cls.staff = User.objects.create_superuser('gerant', password='secret')
+
+    def place(self, quantity=4, **fields):
+        data = {key: ORDER_DATA[key] for key in ('first_name', 'last_name', 'email', 'phone', 'delivery_type')}
+        data.update({'payment_method': 'lumicash'}, **fields)
+        order = Order(user=self.user, **data)
+        return place_order(order, price_items({self.product.id: (quantity, self.product.price)}))
+
+    def test_summary_is_written_with_the_order(self):
+        order = self.place(quantity=4)
+        summary = OrderSummary.objects.get(order=order)
+        self.assertEqual(summary.customer_name, 'Jean Ndayishimiye')
+        self.assertEqual(summary.item_count, 4)
+        self.assertEqual(summary.tonnage, Decimal('0.200'))
+        self.assertEqual(summary.total_amount, Decimal('100000.00'))
+        self.assertEqual(summary.status, 'en_attente')
+
+    def test_summary_follows_order_and_item_writes(self):
+        order = self.place(quantity=4)
+        order.status = 'payee'
+        order.paid = True
+        order.save()
+        self.assertEqual(OrderSummary.objects.get(order=order).status, 'payee')
+
+        item = OrderItem.objects.create(order=order, product=self.product, price=self.product.price, quantity=16)
+        self.assertEqual(OrderSummary.objects.get(order=order).tonnage, Decimal('1.000'))
+        item.delete()
+        self.assertEqual(OrderSummary.objects.get(order=order).item_count, 4)
+
+        order.delete()
+        self.assertFalse(OrderSummary.objects.exists())
+
+    def test_staff_list_reads_only_the_summary_table(self):
+        for i in range(25):
+            self.place(quantity=1, delivery_type='livraison' if i % 5 == 0 else 'retrait')
+        self.client.force_login(self.staff)
+        url = reverse('orders:admin_order_list')
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, {'delivery_type': 'livraison'})
+        self.assertEqual(len(response.context['orders']), 5)
+        self.assertFalse(response.context['is_paginated'])
+        sql = [query['sql'] for query in captured]
+        self.assertFalse([query for query in sql if '"orders_order"' in query or 'COUNT(' in query])
+
+        first = self.client.get(url)
+        self.assertEqual(len(first.context['orders']), 20)
+        with CaptureQueriesContext(connection) as deeper:
+            second = self.client.get(url, {'cursor': first.context['page_obj'].next_cursor})
+        self.assertEqual(len(second.context['orders']), 5)
+        self.assertEqual(len(deeper), len(captured))
+        self.assertEqual(self.client.get(url, {'cursor': 'xx'}).status_code, 404)
+
+    def test_rebuild_command_and_admin(self):
+        order = self.place()
+        Order.objects.filter(pk=order.pk).update(status='expediee')
+        out = StringIO()
+        call_command('rebuild_order_summaries', stdout=out)
+        self.assertIn('1 résumés', out.getvalue())
+        self.assertEqual(OrderSummary.objects.get(order=order).status, 'expediee')
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('admin:orders_ordersummary_changelist'), {'status__exact': 'expediee'})
+        self.assertContains(response, f'Commande #{order.pk}')
+
+
+class OrderTransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('client', password='secret')
+        cls.staff = User.objects.create_superuser('gerant', password='secret')
+
+    def make_orders(self, count, status):
+        fields = {key: ORDER_DATA[key] for key in ('first_name', 'last_name', 'email', 'phone', 'payment_method')}
+        orders = Order.objects.bulk_create([
+            Order(user=self.user, status=status, paid=status != 'en_attente', total_amount=Decimal('1000.00'), **fields)
+            for _ in range(count)
+        ])
+        call_command('rebuild_order_summaries', stdout=StringIO())
+        reconcile_counters()
+        return [order.pk for order in orders]
+
+    def test_state_machine(self):
+        self.assertTrue(can_transition('en_preparation', 'expediee'))
+        self.assertFalse(can_transition('livree', 'en_attente'))
+        self.assertEqual(sources_for('remboursee'), ['payee', 'en_preparation', 'livree'])
+        with self.assertRaises(InvalidTransition):
+            transition([1], 'inconnu')
+
+    def test_bulk_transition_takes_a_constant_number_of_queries(self):
+        truckload = self.make_orders(200, 'en_preparation')
+        pending = self.make_orders(2, 'en_attente')
+        # Verrou et lecture, UPDATE, journal, vue de lecture, compteurs : les
+        # insertions en bloc ne sont découpées que par la limite de paramètres de SQLite
+        with CaptureQueriesContext(connection) as queries:
+            result = transition(truckload + pending, 'expediee', user=self.staff, note='Camion 12')
+        self.assertLessEqual(len(queries), 12)
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE "orders_order"')]), 1)
+        self.assertEqual(sorted(result.applied), sorted(truckload))
+        self.assertEqual(result.skipped, sorted(pending))
+
+        self.assertEqual(Order.objects.filter(status='expediee').count(), 200)
+        self.assertEqual(OrderSummary.objects.filter(status='expediee').count(), 200)
+        log = OrderStatusLog.objects.filter(order_id=truckload[0]).get()
+        self.assertEqual((log.from_status, log.to_status, log.changed_by, log.note),
+                         ('en_preparation', 'expediee', self.staff, 'Camion 12'))
+        self.assertEqual(OrderStatusLog.objects.count(), 200)
+        # Compteurs tenus à jour sans passer par les signaux
+        self.assertEqual(reconcile_counters(), [])
+
+        # Paiement : statut et indicateur mis à jour ensemble
+        transition(pending, 'payee')
+        self.assertEqual(Order.objects.filter(pk__in=pending, paid=True, status='payee').count(), 2)
+        self.assertEqual(reconcile_counters(), [])
+
+    def test_staff_views_validate_and_log_transitions(self):
+        pending, delivered = self.make_orders(1, 'en_attente') + self.make_orders(1, 'livree')
+        self.client.force_login(self.staff)
+
+        self.client.get(reverse('orders:admin_mark_as_paid', args=[pending]))
+        order = Order.objects.get(pk=pending)
+        self.assertEqual((order.status, order.paid), ('payee', True))
+        self.assertEqual(OrderStatusLog.objects.get(order=order).changed_by, self.staff)
+        self.client.get(reverse('orders:admin_mark_as_paid', args=[pending]))
+        self.assertEqual(OrderStatusLog.objects.filter(order=order).count(), 1)
+
+        url = reverse('orders:admin_order_update', args=[delivered])
+        data = {'status': 'en_preparation', 'delivery_type': 'retrait', 'payment_method': 'lumicash', 'paid': 'on'}
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('non autorisé', str(response.context['form'].errors))
+        self.assertEqual(Order.objects.get(pk=delivered).status, 'livree')
+
+        self.client.post(url, dict(data, status='remboursee'))
+        self.assertEqual(Order.objects.get(pk=delivered).status, 'remboursee')
+        self.assertEqual(OrderStatusLog.objects.get(order_id=delivered).from_status, 'livree')
+
+    def test_update_view_checks_the_transition_inside_its_transaction(self):
+        order = self.make_orders(1, 'livree')[0]
+        self.client.force_login(self.staff)
+        data = {'status': 'remboursee', 'delivery_type': 'retrait', 'payment_method': 'lumicash', 'paid': 'on'}
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('orders:admin_order_update', args=[order]), data)
+        statements = [query['sql'] for query in queries]
+        savepoint = next(i for i, sql in enumerate(statements) if sql.startswith('SAVEPOINT'))
+        status_read = next(i for i, sql in enumerate(statements) if sql.startswith('SELECT "orders_order"."status"'))
+        update = next(i for i, sql in enumerate(statements) if sql.startswith('UPDATE "orders_order"'))
+        self.assertLess(savepoint, status_read)
+        self.assertLess(status_read, update)
+        self.assertEqual(Order.objects.get(pk=order).status, 'remboursee')
+
+    def test_admin_action(self):
+        orders = self.make_orders(3, 'en_preparation') + self.make_orders(1, 'annulee')
+        self.client.force_login(self.staff)
+        response = self.client.post(
+            reverse('admin:orders_order_changelist'),
+            {'action': 'mark_expediee', '_selected_action': orders},
+            follow=True,
+        )
+        self.assertContains(response, '3 commande(s) passée(s) à « Expédiée »')
+        self.assertContains(response, '1 commande(s) ignorée(s)')
+        self.assertEqual(Order.objects.filter(status='expediee').count(), 3)
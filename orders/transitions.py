@@ -0,0 +1,151 @@
+"""
+Cycle de vie d'une commande.
+
+``TRANSITIONS`` définit les changements de statut autorisés. ``transition``
+les applique en masse : les commandes éligibles (statut source autorisé pour
+la cible) sont verrouillées et lues en une requête, passées au nouveau statut
+par un seul ``UPDATE … WHERE status IN (…)``, et chaque changement est ajouté
+au journal (``OrderStatusLog``) en un ``bulk_create``. La vue de lecture du
+personnel et les compteurs du tableau de bord sont mis à jour dans la même
+transaction, eux aussi en masse : expédier 200 commandes coûte quelques
+requêtes, pas 400.
+
+Les commandes dont le statut ne permet pas la transition sont ignorées et
+retournées dans ``TransitionResult.skipped``.
+
+Une commande annulée ou remboursée avant son expédition rend au stock ce que
+``place_order`` a réservé (``release_stock``) : un mouvement d'entrée par
+ligne, crédité sur le solde dans la même transaction.
+"""
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from core.counters import combine, increment, order_deltas
+from products.models import StockMovement, StockMovementType
+from products.stock import adjust_balance
+
+from .models import Order, OrderItem, OrderStatusLog
+from .summaries import refresh_summaries
+
+TRANSITIONS = {
+    'en_attente': ('payee', 'annulee'),
+    'payee': ('en_preparation', 'remboursee'),
+    'en_preparation': ('expediee', 'remboursee'),
+    'expediee': ('livree',),
+    'livree': ('remboursee',),
+    'annulee': (),
+    'remboursee': (),
+}
+
+STATUS_LABELS = dict(Order.STATUS_CHOICES)
+
+# Statuts où la marchandise a quitté l'entrepôt : une annulation ne la remet pas en stock
+SHIPPED_STATUSES = ('expediee', 'livree')
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+@dataclass
+class TransitionResult:
+    target: str
+    applied: list = field(default_factory=list)
+    skipped: list = field(default_factory=list)
+
+
+def can_transition(source, target):
+    return target in TRANSITIONS.get(source, ())
+
+
+def sources_for(target):
+    """Statuts depuis lesquels on peut passer à ``target``."""
+    return [source for source, targets in TRANSITIONS.items() if target in targets]
+
+
+def check_transition(source, target):
+    if source != target and not can_transition(source, target):
+        raise InvalidTransition(
+            f"Passage de « {STATUS_LABELS.get(source, source)} » à « {STATUS_LABELS.get(target, target)} » non autorisé."
+        )
+
+
+def releases_stock(source, target):
+    """Le passage de ``source`` à ``target`` rend-il au stock les quantités réservées ?"""
+    return target in Order.REVERSED_STATUSES and source not in SHIPPED_STATUSES
+
+
+def release_stock(order_ids, user=None):
+    """Remet en stock les lignes des commandes ``order_ids`` (entrées journalisées)."""
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values('order_id', 'product_id')
+        .annotate(quantity=Sum('quantity'))
+        .order_by('product_id', 'order_id')
+    )
+    returned = {}
+    movements = []
+    for row in rows:
+        returned[row['product_id']] = returned.get(row['product_id'], 0) + row['quantity']
+        movements.append(StockMovement(
+            product_id=row['product_id'],
+            movement_type=StockMovementType.IN,
+            quantity=row['quantity'],
+            reference=f"Retour commande {row['order_id']}",
+            created_by=user,
+        ))
+    # Même ordre de verrous que place_order
+    for product_id, quantity in sorted(returned.items()):
+        adjust_balance(product_id, quantity)
+    StockMovement.objects.bulk_create(movements)
+
+
+def record_transition(order, source, user=None, note=''):
+    """Journalise le changement de statut d'une commande enregistrée par ``save()``."""
+    if source != order.status:
+        OrderStatusLog.objects.create(
+            order=order, from_status=source, to_status=order.status, changed_by=user, note=note
+        )
+
+
+@transaction.atomic
+def transition(order_ids, target, user=None, note=''):
+    """Passe les commandes ``order_ids`` au statut ``target`` quand leur statut le permet."""
+    if target not in TRANSITIONS:
+        raise InvalidTransition(f"Statut inconnu : {target}")
+    order_ids = set(order_ids)
+    sources = sources_for(target)
+    eligible = Order.objects.filter(pk__in=order_ids, status__in=sources)
+    previous = [
+        Order(**row) for row in eligible.select_for_update().values(
+            'pk', 'status', 'paid', 'total_amount', 'created_at'
+        ).order_by('pk')
+    ]
+    result = TransitionResult(target, applied=[order.pk for order in previous])
+    result.skipped = sorted(order_ids - set(result.applied))
+    if not previous:
+        return result
+
+    changes = {'status': target, 'updated_at': timezone.now()}
+    if target == 'payee':
+        changes['paid'] = True
+    eligible.filter(pk__in=result.applied).update(**changes)
+
+    OrderStatusLog.objects.bulk_create([
+        OrderStatusLog(order_id=order.pk, from_status=order.status, to_status=target, changed_by=user, note=note)
+        for order in previous
+    ])
+    release_stock([order.pk for order in previous if releases_stock(order.status, target)], user=user)
+    # Mises à jour en masse : ni save() ni signaux
+    refresh_summaries(result.applied)
+    deltas = []
+    for order in previous:
+        deltas.append(order_deltas(order, -1))
+        order.status = target
+        order.paid = changes.get('paid', order.paid)
+        deltas.append(order_deltas(order))
+    increment(combine(*deltas))
+    return result
@@ -9,6 +9,7 @@ urlpatterns = [
     path('mes-commandes/', views.order_list, name='order_list'),
     path('commande/creer/', views.order_create, name='order_create'),
     path('facture/<int:order_id>/', views.order_invoice, name='invoice'),
+    path('facture/<int:order_id>/pdf/', views.order_invoice_pdf, name='invoice_pdf'),
     
     # URLs d'administration personnalisées
     path('admin/commandes/', views_admin.OrderListView.as_view(), name='admin_order_list'),
@@ -1,36 +1,57 @@
+import uuid
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.decorators.http import require_POST, require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.conf import settings
-from django.template.loader import render_to_string
-from django.core.mail import send_mail
-from django.http import HttpResponseForbidden, HttpResponse
+from django.http import Http404, HttpResponseBadRequest, HttpResponseForbidden, HttpResponse
 from django.utils import timezone
-from django.db.models import Q
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from cart.cart import Cart
-from .models import Order, OrderItem
+from core import idempotency
+from core.pagination import InvalidCursor, KeysetPaginator
+from products.stock import InsufficientStock
+from .models import Order
 from .forms import OrderCreateForm
+from .invoices import get_invoice
+from .pricing import price_cart
+from .services import IDEMPOTENCY_SCOPE, place_order
 
 @login_required
 @require_http_methods(["GET", "POST"])
 def order_create(request):
     cart = Cart(request)
     
+    # Soumission rejouée (double clic, nouvel essai) : on renvoie vers la
+    # commande déjà créée, avant même de regarder le panier qu'elle a vidé
+    try:
+        idempotency_key = idempotency.get_key(request) if request.method == 'POST' else None
+    except idempotency.InvalidKey:
+        return HttpResponseBadRequest("Clé d'idempotence invalide.")
+    if idempotency_key:
+        order_id = idempotency.lookup(request.user, IDEMPOTENCY_SCOPE, idempotency_key)
+        if order_id:
+            return redirect('orders:invoice', order_id=order_id)
+    
     # Vérifier si le panier est vide
     if not cart:
         messages.error(request, "Votre panier est vide.")
         return redirect('cart:cart_detail')
     
+    # Prix et disponibilité vérifiés auprès du catalogue (une requête)
+    quote = price_cart(cart)
+    
     if request.method == 'POST':
         form = OrderCreateForm(request.POST)
-        if form.is_valid():
+        if not quote.is_orderable:
+            messages.error(request, "Certains produits de votre panier ne sont plus disponibles.")
+        elif quote.has_price_changes and request.POST.get('price_fingerprint') != quote.fingerprint:
+            # Le client doit voir les nouveaux prix avant de confirmer
+            messages.warning(request, "Des prix ont changé : vérifiez le récapitulatif puis confirmez la commande.")
+        elif form.is_valid():
             try:
                 # Créer la commande sans la sauvegarder
                 order = form.save(commit=False)
                 order.user = request.user
-                order.total_amount = cart.get_total_price()
                 
                 # Si c'est un retrait en magasin, on efface les champs d'adresse
                 if order.delivery_type == 'retrait':
@@ -38,37 +59,9 @@ def order_create(request):
                     order.postal_code = None
                     order.city = None
                 
-                # Sauvegarder la commande
-                order.save()
-                
-                # Ajouter les articles de la commande
-                for item in cart:
-                    OrderItem.objects.create(
-                        order=order,
-                        product=item['product'],
-                        price=item['price'],
-                        quantity=item['quantity']
-                    )
-                
-                # Envoyer un email de confirmation
-                try:
-                    subject = f'Confirmation de votre commande N°{order.id}'
-                    message = render_to_string('orders/order/email/order_created.html', {
-                        'order': order,
-                        'items': order.items.all(),
-                        'total': order.total_amount
-                    })
-                    send_mail(
-                        subject,
-                        message,
-                        settings.DEFAULT_FROM_EMAIL,
-                        [order.email],
-                        html_message=message,
-                        fail_silently=True
-                    )
-                except Exception as e:
-                    # En cas d'erreur d'envoi d'email, on continue quand même
-                    print(f"Erreur d'envoi d'email: {e}")
+                # Commande, lignes, sortie de stock et email de confirmation
+                # (boîte d'envoi) en une transaction
+                place_order(order, quote, user=request.user, idempotency_key=idempotency_key)
                 
                 # Vider le panier
                 cart.clear()
@@ -79,6 +72,18 @@ def order_create(request):
                 # Rediriger vers la page de facture
                 return redirect('orders:invoice', order_id=order.id)
                 
+            except idempotency.DuplicateRequest as duplicate:
+                if duplicate.result_id:
+                    return redirect('orders:invoice', order_id=duplicate.result_id)
+                messages.info(request, "Votre commande est en cours de traitement.")
+                return redirect('orders:order_list')
+            except InsufficientStock as e:
+                names = {line.product_id: line.product_name for line in quote.lines}
+                messages.error(
+                    request,
+                    f"Stock insuffisant pour « {names.get(e.product_id, e.product_id)} » "
+                    f"(disponible : {e.available}). Réduisez la quantité commandée.",
+                )
             except Exception as e:
                 # En cas d'erreur, on affiche un message d'erreur
                 messages.error(request, f"Une erreur est survenue lors de la création de votre commande: {str(e)}")
@@ -100,11 +105,16 @@ def order_create(request):
     
     return render(request, 'orders/order/create.html', {
         'cart': cart,
+        'quote': quote,
+        # Nouvelle clé à chaque affichage : les doublons d'une même soumission la partagent
+        'idempotency_key': uuid.uuid4().hex,
         'form': form,
         'title': 'Passer la commande'
     })
 
-@login_required
+ORDERS_PER_PAGE = 10
+
+
 @login_required
 def order_list(request):
     """Affiche la liste des commandes de l'utilisateur avec tri par date"""
@@ -115,53 +125,54 @@ def order_list(request):
     if sort_by not in ['created_at', '-created_at', 'updated_at', '-updated_at']:
         sort_by = '-created_at'
     
-    # Récupérer les commandes de l'utilisateur connecté
-    orders = Order.objects.filter(user=request.user).order_by(sort_by)
-    
-    # Pagination
-    page = request.GET.get('page', 1)
-    paginator = Paginator(orders, 10)  # 10 commandes par page
+    # Commandes de l'utilisateur connecté, lignes préchargées avec leur coût
+    orders = Order.objects.filter(user=request.user).with_items()
     
+    # Pagination par curseur sur (date, id) : ni OFFSET ni COUNT(*), deux
+    # requêtes par page quelle que soit la profondeur
+    tie_breaker = '-id' if sort_by.startswith('-') else 'id'
+    paginator = KeysetPaginator(orders, (sort_by, tie_breaker), per_page=ORDERS_PER_PAGE)
     try:
-        orders = paginator.page(page)
-    except PageNotAnInteger:
-        orders = paginator.page(1)
-    except EmptyPage:
-        orders = paginator.page(paginator.num_pages)
+        orders = paginator.get_page(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404("Curseur de pagination invalide")
     
     context = {
         'orders': orders,
         'sort_by': sort_by,
+        'is_first_page': not request.GET.get('cursor'),
     }
     
     return render(request, 'orders/order/list.html', context)
 
-def order_invoice(request, order_id):
-    """Vue pour afficher la facture d'une commande"""
+def _invoice_order(request, order_id):
     order = get_object_or_404(Order, id=order_id)
     
     # Vérifier que l'utilisateur est bien le propriétaire de la commande
-    if order.user != request.user and not request.user.is_staff:
+    if order.user_id != request.user.id and not request.user.is_staff:
+        return None
+    return order
+
+def order_invoice(request, order_id):
+    """Vue pour afficher la facture d'une commande"""
+    order = _invoice_order(request, order_id)
+    if order is None:
         return HttpResponseForbidden("Vous n'êtes pas autorisé à voir cette facture.")
     
-    from decimal import Decimal
-    
-    # Calculer le total TTC
-    total_ttc = order.total_amount
-    
-    # Calculer la TVA (20% par défaut)
-    tva_rate = Decimal('0.20')
-    total_ht = total_ttc / (Decimal('1') + tva_rate)
-    montant_tva = total_ttc - total_ht
-    
+    # Document rendu une seule fois par version de la commande
     context = {
         'order': order,
-        'items': order.items.all(),
-        'total_ht': total_ht,
-        'tva_rate': tva_rate * 100,  # Pourcentage
-        'montant_tva': montant_tva,
-        'total_ttc': total_ttc,
-        'today': timezone.now().date(),
+        'invoice_html': get_invoice(order, 'html').decode(),
     }
     
     return render(request, 'orders/order/invoice.html', context)
+
+def order_invoice_pdf(request, order_id):
+    """Télécharge la facture au format PDF"""
+    order = _invoice_order(request, order_id)
+    if order is None:
+        return HttpResponseForbidden("Vous n'êtes pas autorisé à voir cette facture.")
+    
+    response = HttpResponse(get_invoice(order, 'pdf'), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="facture-{order.id}.pdf"'
+    return response
@@ -3,20 +3,62 @@ from django.views.generic import ListView, DetailView, UpdateView
 from django.urls import reverse_lazy
 from django.contrib import messages
 from django.shortcuts import redirect
-from django.utils import timezone
-from .models import Order, OrderItem
+from django.http import Http404
+from django.db import transaction
+from django.utils.http import urlencode
+from core.pagination import InvalidCursor, KeysetPaginator
+from .models import Order, OrderItem, OrderSummary
+from .transitions import (
+    InvalidTransition, check_transition, record_transition, release_stock, releases_stock, transition,
+)
 
 class OrderListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
-    model = Order
+    """Liste du personnel, lue dans la vue dénormalisée ``OrderSummary`` :
+    chaque filtre a son index composite et la pagination se fait par curseur,
+    le coût d'une page ne dépend donc pas de la taille de l'historique."""
+    model = OrderSummary
     template_name = 'orders/admin/order_list.html'
     context_object_name = 'orders'
     paginate_by = 20
+    filter_choices = {
+        'status': Order.STATUS_CHOICES,
+        'delivery_type': Order.DELIVERY_CHOICES,
+        'payment_method': Order.PAYMENT_METHODS,
+        'paid': [('1', 'Payé'), ('0', 'En attente')],
+    }
 
     def test_func(self):
         return self.request.user.is_staff
 
     def get_queryset(self):
-        return Order.objects.select_related('user').order_by('-created_at')
+        # Seules les valeurs connues sont retenues
+        self.filters = {
+            name: self.request.GET[name]
+            for name, choices in self.filter_choices.items()
+            if self.request.GET.get(name) in dict(choices)
+        }
+        lookups = dict(self.filters)
+        if 'paid' in lookups:
+            lookups['paid'] = lookups['paid'] == '1'
+        return OrderSummary.objects.filter(**lookups)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, ('-created_at', '-order_id'), per_page=page_size)
+        try:
+            page = paginator.get_page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404("Curseur de pagination invalide")
+        return paginator, page, page.object_list, page.has_next
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update({
+            'filters': self.filters,
+            'filter_choices': self.filter_choices,
+            'filter_query': urlencode(self.filters),
+            'is_first_page': not self.request.GET.get('cursor'),
+        })
+        return context
 
 class OrderDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
     model = Order
@@ -27,7 +69,7 @@ class OrderDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
         return self.request.user.is_staff
 
     def get_queryset(self):
-        return Order.objects.select_related('user').prefetch_related('items__product')
+        return Order.objects.select_related('user').prefetch_related('items__product', 'status_logs__changed_by')
 
 class OrderUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     model = Order
@@ -45,19 +87,34 @@ class OrderUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         # Si le paiement n'est pas effectué, s'assurer que le statut n'est pas 'payee'
         elif not form.cleaned_data.get('paid') and form.cleaned_data.get('status') == 'payee':
             form.instance.status = 'en_attente'
-            
-        response = super().form_valid(form)
+        
+        # Seules les transitions du cycle de vie sont acceptées ; le statut
+        # précédent est lu sous verrou pour qu'une modification concurrente
+        # ne puisse pas s'intercaler entre la vérification et l'enregistrement
+        try:
+            with transaction.atomic():
+                previous_status = (
+                    Order.objects.select_for_update().filter(pk=form.instance.pk).values_list('status', flat=True).get()
+                )
+                check_transition(previous_status, form.instance.status)
+                response = super().form_valid(form)
+                record_transition(self.object, previous_status, user=self.request.user)
+                if releases_stock(previous_status, self.object.status):
+                    release_stock([self.object.pk], user=self.request.user)
+        except InvalidTransition as e:
+            form.add_error('status', str(e))
+            return self.form_invalid(form)
         messages.success(self.request, 'La commande a été mise à jour avec succès.')
         return response
 
 def mark_as_paid(request, pk):
     if not request.user.is_staff:
-        return redirect('home')
+        return redirect('core:home')
     
-    order = Order.objects.get(pk=pk)
-    order.paid = True
-    order.status = 'payee'  # Mettre à jour le statut sur 'payee' (payée)
-    order.updated_at = timezone.now()
-    order.save()
-    messages.success(request, f'La commande #{order.id} a été marquée comme payée.')
+    # Transition validée et journalisée (statut 'payee' et paiement enregistré)
+    result = transition([pk], 'payee', user=request.user)
+    if result.applied:
+        messages.success(request, f'La commande #{pk} a été marquée comme payée.')
+    else:
+        messages.error(request, f"La commande #{pk} ne peut pas être marquée comme payée depuis son statut actuel.")
     return redirect('orders:admin_order_list')
@@ -2,19 +2,31 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import Product, Category
+from .models import Product, Category, StockMovement
+from . import search
 
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'cement_type', 'price', 'available')
+    list_display = ('name', 'category', 'cement_type', 'price', 'available', 'stock_display')
     list_filter = ('available', 'cement_type', 'category')
     search_fields = ('name', 'description', 'cement_type')
     prepopulated_fields = {'slug': ('name',)}
     list_per_page = 20
     
     def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related('stock_entries')
+        return super().get_queryset(request).with_stock()
+    
+    def stock_display(self, obj):
+        return obj.current_stock
+    stock_display.short_description = 'Stock'
+    stock_display.admin_order_field = 'current_stock'
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Recherche via l'index plein texte plutôt que des LIKE '%...%' sur chaque champ
+        if not search_term:
+            return queryset, False
+        return search.filter_queryset(queryset, search_term), False
 
 
 
@@ -23,3 +35,23 @@ class ProductAdmin(admin.ModelAdmin):
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'created_at')
     prepopulated_fields = {'slug': ('name',)}
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    """Journal des mouvements : consultation seule, les corrections passent par un ajustement"""
+    list_display = ('movement_date', 'product', 'movement_type', 'quantity', 'reference', 'created_by')
+    list_filter = ('movement_type',)
+    list_select_related = ('product', 'created_by')
+    search_fields = ('reference', 'product__name')
+    date_hierarchy = 'movement_date'
+    list_per_page = 20
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
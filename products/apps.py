@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class ProductsConfig(AppConfig):
     name = 'products'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from . import signals  # noqa: F401
+
+        post_migrate.connect(signals.restore_search_triggers, sender=self)
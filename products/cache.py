@@ -0,0 +1,98 @@
+"""
+Cache du catalogue (catégories) invalidé par un compteur de version.
+
+Les versions sont stockées dans un cache partagé par tous les processus
+(``CATALOG_VERSION_CACHE_ALIAS``, ``'shared'`` par défaut) : une modification
+faite dans un processus invalide les données dérivées du catalogue (menus,
+facettes, réponses de l'API, ETag) dans tous les autres. Ces données restent
+dans la mémoire de chaque processus, sous une clé qui contient la version :
+une seule requête SQL est donc faite par version et par processus.
+"""
+import secrets
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import Http404
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+# Version distincte pour les soldes de stock : un mouvement de stock ne doit
+# pas invalider les catégories ni les facettes.
+STOCK_VERSION_KEY = 'catalog:stock-version'
+
+_lock = threading.Lock()
+_categories = {'version': None, 'items': (), 'by_slug': {}}
+
+
+def _versions():
+    return caches[getattr(settings, 'CATALOG_VERSION_CACHE_ALIAS', 'shared')]
+
+
+def _new_version():
+    """Version jamais utilisée : horloge (pas de retour à une ancienne version
+    après une éviction) et aléa (deux processus qui invalident au même
+    instant n'écrivent pas la même valeur)."""
+    return time.time_ns() * 1000 + secrets.randbelow(1000)
+
+
+def _get_version(key):
+    versions = _versions()
+    version = versions.get(key)
+    if version is None:
+        versions.add(key, _new_version(), timeout=None)
+        version = versions.get(key)
+    return version
+
+
+def _bump_version(key):
+    # Une nouvelle valeur plutôt qu'un incrément : le cache partagé n'a pas
+    # d'incrément atomique, et deux invalidations simultanées doivent toutes
+    # deux changer la version
+    version = _new_version()
+    _versions().set(key, version, timeout=None)
+    return version
+
+
+def get_catalog_version():
+    """Retourne la version courante du catalogue."""
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Invalide toutes les données dérivées du catalogue."""
+    return _bump_version(CATALOG_VERSION_KEY)
+
+
+def get_stock_version():
+    """Retourne la version courante des soldes de stock."""
+    return _get_version(STOCK_VERSION_KEY)
+
+
+def bump_stock_version():
+    """Signale une variation de stock (disponibilité affichée dans les listes)."""
+    return _bump_version(STOCK_VERSION_KEY)
+
+
+def get_categories():
+    """Retourne les catégories (tuple) pour la version courante du catalogue."""
+    version = get_catalog_version()
+    if _categories['version'] != version:
+        from .models import Category
+
+        items = tuple(Category.objects.all())
+        with _lock:
+            _categories['items'] = items
+            _categories['by_slug'] = {category.slug: category for category in items}
+            _categories['version'] = version
+    return _categories['items']
+
+
+def get_category_or_404(slug):
+    """Retourne la catégorie correspondant au slug depuis le cache."""
+    get_categories()
+    category = _categories['by_slug'].get(slug)
+    if category is None:
+        raise Http404("Aucune catégorie ne correspond à la requête.")
+    return category
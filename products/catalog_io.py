@@ -0,0 +1,261 @@
+"""
+Import et export du catalogue (CSV ou JSON Lines).
+
+Les fichiers sont lus et écrits ligne à ligne. À l'import, les lignes sont
+traitées par lots : les produits existants du lot et les slugs pouvant entrer
+en collision avec ses créations sont chargés, puis les produits sont créés ou
+modifiés avec ``bulk_create`` / ``bulk_update`` dans une transaction par lot.
+Rien n'est conservé d'un lot à l'autre, la mémoire dépend donc de la taille
+des lots et non de celle du fichier : un slug répété dans un même lot est
+rejeté, répété dans un lot suivant il modifie le produit déjà enregistré (en
+simulation, rien n'étant enregistré, il est comparé à la base).
+
+Les opérations en masse ne déclenchent pas les signaux : le compteur de
+produits du tableau de bord est incrémenté dans la transaction de chaque lot,
+les compteurs de facettes et la version du catalogue sont recalculés une fois
+à la fin (l'index de recherche suit via ses triggers).
+"""
+import csv
+import json
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.counters import PRODUCTS, increment
+
+from .cache import bump_catalog_version
+from .facets import rebuild_facet_counts
+from .models import Category, Product
+from .slugs import SlugAllocator, base_slug, taken_slugs
+
+# « category » désigne le slug de la catégorie ; le slug du produit sert de clé
+COLUMNS = ('slug', 'name', 'category', 'description', 'cement_type', 'price', 'weight', 'available')
+
+# Colonnes obligatoires pour créer un produit
+REQUIRED_FOR_CREATE = ('name', 'category', 'cement_type', 'price', 'weight')
+
+TRUE_VALUES = {'1', 'true', 'vrai', 'oui', 'yes', 'o', 'y'}
+FALSE_VALUES = {'0', 'false', 'faux', 'non', 'no', 'n'}
+
+
+class RowError(ValueError):
+    """Ligne rejetée à l'import."""
+
+
+@dataclass
+class ImportReport:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    rejected: int = 0
+    errors: list = field(default_factory=list)
+
+    def reject(self, line, message, max_errors=50):
+        self.rejected += 1
+        if len(self.errors) < max_errors:
+            self.errors.append((line, message))
+
+
+def detect_format(path, explicit=None):
+    if explicit:
+        return explicit
+    return 'jsonl' if str(path).lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_rows(stream, fmt):
+    """Itère sur ``(numéro de ligne, dict)`` sans charger le fichier en mémoire."""
+    if fmt == 'jsonl':
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield number, RowError(f"JSON invalide : {exc}")
+                continue
+            if not isinstance(row, dict):
+                yield number, RowError("objet JSON attendu")
+                continue
+            yield number, row
+    else:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def write_rows(stream, fmt, batch_size=2000):
+    """Écrit tout le catalogue dans ``stream`` et retourne le nombre de produits exportés."""
+    rows = (
+        Product.objects.order_by('pk')
+        .values_list('slug', 'name', 'category__slug', 'description', 'cement_type', 'price', 'weight', 'available')
+        .iterator(chunk_size=batch_size)
+    )
+    writer = csv.writer(stream) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(COLUMNS)
+    count = 0
+    for values in rows:
+        values = list(values)
+        values[5], values[6] = str(values[5]), str(values[6])
+        if writer:
+            values[7] = int(values[7])
+            writer.writerow(values)
+        else:
+            stream.write(json.dumps(dict(zip(COLUMNS, values)), ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def _parse_decimal(value, name, minimum=None):
+    try:
+        number = Decimal(str(value).strip().replace(' ', '').replace(',', '.'))
+    except InvalidOperation:
+        raise RowError(f"{name} invalide : {value!r}")
+    if not number.is_finite() or (minimum is not None and number < minimum):
+        raise RowError(f"{name} invalide : {value!r}")
+    return number.quantize(Decimal('0.01'))
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise RowError(f"disponibilité invalide : {value!r}")
+
+
+def clean_row(row, categories):
+    """Valide une ligne et retourne ``{champ: valeur}`` pour les colonnes renseignées."""
+    cement_types = dict(Product.CEMENT_TYPES)
+    cleaned = {}
+    for name in COLUMNS:
+        value = row.get(name)
+        if value is None or (isinstance(value, str) and not value.strip() and name != 'description'):
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        if name == 'category':
+            if value not in categories:
+                raise RowError(f"catégorie inconnue : {value!r}")
+            cleaned['category_id'] = categories[value]
+        elif name == 'cement_type':
+            if value not in cement_types:
+                raise RowError(f"type de ciment inconnu : {value!r}")
+            cleaned[name] = value
+        elif name == 'price':
+            cleaned[name] = _parse_decimal(value, 'prix', minimum=Decimal('0.01'))
+        elif name == 'weight':
+            cleaned[name] = _parse_decimal(value, 'poids', minimum=Decimal('0'))
+        elif name == 'available':
+            cleaned[name] = _parse_bool(value)
+        elif name == 'name':
+            if len(value) > Product._meta.get_field('name').max_length:
+                raise RowError("nom trop long")
+            cleaned[name] = value
+        else:
+            cleaned[name] = value
+    return cleaned
+
+
+class CatalogImporter:
+    """Importe des lignes de catalogue par lots (création ou mise à jour par slug)."""
+
+    def __init__(self, batch_size=1000, dry_run=False, on_change=None):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        # Appelé pour chaque création ou modification : on_change(type, slug, écarts)
+        self.on_change = on_change or (lambda kind, slug, diff: None)
+        self.report = ImportReport()
+        self.categories = dict(Category.objects.values_list('slug', 'id'))
+
+    def run(self, rows):
+        batch = []
+        for number, row in rows:
+            if isinstance(row, RowError):
+                self.report.reject(number, str(row))
+                continue
+            try:
+                cleaned = clean_row(row, self.categories)
+            except RowError as exc:
+                self.report.reject(number, str(exc))
+                continue
+            batch.append((number, cleaned))
+            if len(batch) >= self.batch_size:
+                self._process(batch)
+                batch = []
+        if batch:
+            self._process(batch)
+
+        if not self.dry_run and (self.report.inserted or self.report.updated):
+            rebuild_facet_counts()
+            bump_catalog_version()
+        return self.report
+
+    def _process(self, batch):
+        slugs = [cleaned['slug'] for _number, cleaned in batch if cleaned.get('slug')]
+        existing = Product.objects.in_bulk(slugs, field_name='slug') if slugs else {}
+        allocator = self._allocator(
+            cleaned.get('slug') or cleaned['name'] for _number, cleaned in batch
+            if cleaned.get('slug') not in existing and (cleaned.get('slug') or cleaned.get('name'))
+        )
+        now = timezone.now()
+        to_create, to_update, update_fields = [], [], set()
+        seen = set()
+
+        for number, cleaned in batch:
+            slug = cleaned.get('slug')
+            if slug:
+                if slug in seen:
+                    self.report.reject(number, f"slug en double dans le lot : {slug!r}")
+                    continue
+                seen.add(slug)
+
+            product = existing.get(slug) if slug else None
+            if product is None:
+                missing = [name for name in REQUIRED_FOR_CREATE if name not in cleaned and
+                           not (name == 'category' and 'category_id' in cleaned)]
+                if missing:
+                    self.report.reject(number, "colonnes manquantes pour une création : " + ', '.join(missing))
+                    continue
+                cleaned['slug'] = allocator.allocate(base_slug(slug or cleaned['name'], allocator.max_length))
+                seen.add(cleaned['slug'])
+                to_create.append(Product(**cleaned, created_at=now, updated_at=now))
+                self.on_change('+', cleaned['slug'], {})
+                continue
+
+            diff = {}
+            for name, value in cleaned.items():
+                if name != 'slug' and getattr(product, name) != value:
+                    diff[name] = (getattr(product, name), value)
+                    setattr(product, name, value)
+            if not diff:
+                self.report.unchanged += 1
+                continue
+            product.updated_at = now
+            update_fields.update(diff)
+            to_update.append(product)
+            self.on_change('~', slug, diff)
+
+        if not self.dry_run:
+            with transaction.atomic():
+                if to_create:
+                    Product.objects.bulk_create(to_create, batch_size=self.batch_size)
+                    increment({PRODUCTS: len(to_create)})
+                if to_update:
+                    Product.objects.bulk_update(
+                        to_update, sorted(update_fields) + ['updated_at'], batch_size=self.batch_size
+                    )
+        self.report.inserted += len(to_create)
+        self.report.updated += len(to_update)
+
+    def _allocator(self, texts):
+        """Allocateur de slugs pour les créations d'un lot."""
+        max_length = Product._meta.get_field('slug').max_length
+        bases = [base_slug(text, max_length) for text in texts]
+        return SlugAllocator(taken_slugs(Product.objects.all(), bases, max_length=max_length), max_length)
@@ -0,0 +1,180 @@
+"""
+Navigation à facettes du catalogue (type de ciment, poids du sac, tranche de prix).
+
+Les compteurs par catégorie sont stockés dans ``FacetCount`` et maintenus de
+façon incrémentale par les signaux des produits : une modification de produit
+se traduit par quelques ``UPDATE ... SET count = count ± 1``. La lecture des
+compteurs est mémorisée par processus pour la version courante du catalogue.
+"""
+import threading
+from collections import Counter
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .cache import get_catalog_version
+from .models import FacetCount, Product
+
+# (code, libellé, borne basse incluse, borne haute exclue) en BIF
+PRICE_BANDS = [
+    ('lt20000', 'Moins de 20 000 BIF', None, Decimal('20000')),
+    ('20000-30000', '20 000 à 30 000 BIF', Decimal('20000'), Decimal('30000')),
+    ('30000-40000', '30 000 à 40 000 BIF', Decimal('30000'), Decimal('40000')),
+    ('gte40000', '40 000 BIF et plus', Decimal('40000'), None),
+]
+
+FACETS = ('cement_type', 'weight', 'price_band')
+
+_lock = threading.Lock()
+_counts = {'version': None, 'by_category': {}}
+
+
+def price_band(price):
+    """Retourne le code de la tranche de prix contenant ``price``."""
+    for code, label, low, high in PRICE_BANDS:
+        if (low is None or price >= low) and (high is None or price < high):
+            return code
+    return PRICE_BANDS[-1][0]
+
+
+def weight_value(weight):
+    """Représentation stable du poids d'un sac (``Decimal('50.00')`` -> ``'50'``)."""
+    return format(Decimal(weight).normalize(), 'f')
+
+
+def facet_keys(category_id, cement_type, weight, price, available):
+    """Ensemble des clés ``(category_id, facet, value)`` auxquelles un produit contribue."""
+    if not available:
+        return set()
+    return {
+        (category_id, 'cement_type', cement_type),
+        (category_id, 'weight', weight_value(weight)),
+        (category_id, 'price_band', price_band(price)),
+    }
+
+
+def product_facet_keys(product):
+    return facet_keys(product.category_id, product.cement_type, product.weight, product.price, product.available)
+
+
+def apply_deltas(deltas):
+    """Applique des variations ``{(category_id, facet, value): delta}`` aux compteurs."""
+    for (category_id, facet, value), delta in deltas.items():
+        if not delta:
+            continue
+        rows = FacetCount.objects.filter(category_id=category_id, facet=facet, value=value)
+        if delta < 0:
+            rows.filter(count__gte=-delta).update(count=F('count') + delta)
+            continue
+        if rows.update(count=F('count') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                FacetCount.objects.create(category_id=category_id, facet=facet, value=value, count=delta)
+        except IntegrityError:
+            # Créé entre-temps par une écriture concurrente
+            rows.update(count=F('count') + delta)
+
+
+def diff(old_keys, new_keys):
+    deltas = Counter()
+    for key in old_keys - new_keys:
+        deltas[key] -= 1
+    for key in new_keys - old_keys:
+        deltas[key] += 1
+    return deltas
+
+
+def rebuild_facet_counts():
+    """Recalcule entièrement les compteurs depuis la table des produits."""
+    totals = Counter()
+    rows = Product.objects.filter(available=True).values_list(
+        'category_id', 'cement_type', 'weight', 'price'
+    )
+    for category_id, cement_type, weight, price in rows.iterator(chunk_size=2000):
+        for key in facet_keys(category_id, cement_type, weight, price, True):
+            totals[key] += 1
+
+    with transaction.atomic():
+        FacetCount.objects.all().delete()
+        FacetCount.objects.bulk_create(
+            [
+                FacetCount(category_id=category_id, facet=facet, value=value, count=count)
+                for (category_id, facet, value), count in totals.items()
+            ],
+            batch_size=500,
+        )
+    return len(totals)
+
+
+def get_facet_counts(category=None):
+    """Retourne ``{facette: [(valeur, libellé, nombre), ...]}`` pour une catégorie ou tout le catalogue."""
+    version = get_catalog_version()
+    if _counts['version'] != version:
+        by_category = {}
+        for category_id, facet, value, count in FacetCount.objects.filter(count__gt=0).values_list(
+            'category_id', 'facet', 'value', 'count'
+        ):
+            by_category.setdefault(category_id, Counter())[(facet, value)] += count
+        with _lock:
+            _counts['by_category'] = by_category
+            _counts['version'] = version
+
+    if category is not None:
+        totals = _counts['by_category'].get(category.id, Counter())
+    else:
+        totals = sum(_counts['by_category'].values(), Counter())
+    return _format(totals)
+
+
+def _format(totals):
+    cement_labels = dict(Product.CEMENT_TYPES)
+    band_order = [code for code, *_ in PRICE_BANDS]
+    band_labels = {code: label for code, label, *_ in PRICE_BANDS}
+    facets = {facet: [] for facet in FACETS}
+    for (facet, value), count in totals.items():
+        if facet == 'cement_type':
+            label = cement_labels.get(value, value)
+        elif facet == 'weight':
+            label = f"{value} kg"
+        else:
+            label = band_labels.get(value, value)
+        facets[facet].append((value, label, count))
+
+    facets['cement_type'].sort(key=lambda item: item[1])
+    facets['weight'].sort(key=lambda item: Decimal(item[0]))
+    facets['price_band'].sort(key=lambda item: band_order.index(item[0]) if item[0] in band_order else len(band_order))
+    return facets
+
+
+def filter_products(queryset, params):
+    """Applique les filtres de facettes présents dans ``params`` (par ex. ``request.GET``)."""
+    selected = {}
+    cement_type = params.get('cement_type')
+    if cement_type in dict(Product.CEMENT_TYPES):
+        queryset = queryset.filter(cement_type=cement_type)
+        selected['cement_type'] = cement_type
+
+    weight = params.get('weight')
+    if weight:
+        try:
+            value = Decimal(weight)
+        except ArithmeticError:
+            value = None
+        # NaN et l'infini sont refusés par le DecimalField : filtre ignoré
+        if value is not None and value.is_finite():
+            queryset = queryset.filter(weight=value)
+            selected['weight'] = weight
+
+    band = params.get('price_band')
+    for code, label, low, high in PRICE_BANDS:
+        if code == band:
+            if low is not None:
+                queryset = queryset.filter(price__gte=low)
+            if high is not None:
+                queryset = queryset.filter(price__lt=high)
+            selected['price_band'] = band
+            break
+
+    return queryset, selected
@@ -60,8 +60,8 @@ class StockMovementForm(forms.ModelForm):
     
     def clean_quantity(self):
         quantity = self.cleaned_data.get('quantity')
-        if quantity <= 0:
-            raise ValidationError("La quantité doit être supérieure à zéro")
+        if quantity is not None and quantity < 0:
+            raise ValidationError("La quantité ne peut pas être négative")
         return quantity
     
     def clean(self):
@@ -70,6 +70,10 @@ class StockMovementForm(forms.ModelForm):
         quantity = cleaned_data.get('quantity')
         product = cleaned_data.get('product')
         
+        # Seul un ajustement (quantité comptée) peut valoir zéro
+        if quantity == 0 and movement_type != StockMovementType.ADJUST:
+            self.add_error('quantity', "La quantité doit être supérieure à zéro")
+        
         if movement_type and quantity and product:
             # Pour les sorties, vérifier qu'il y a assez de stock
             if movement_type in [StockMovementType.OUT, StockMovementType.LOSS]:
@@ -79,24 +83,3 @@ class StockMovementForm(forms.ModelForm):
                     })
         
         return cleaned_data
-
-
-class ProductStockForm(forms.ModelForm):
-    class Meta:
-        model = Product
-        fields = ['stock_quantity']
-        labels = {
-            'stock_quantity': 'Nouvelle quantité en stock'
-        }
-    
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.fields['stock_quantity'].widget.attrs.update({
-            'class': 'form-control',
-            'min': 0,
-            'step': 1
-        })
-    
-    def save(self, commit=True):
-        # La logique de sauvegarde est gérée dans la vue
-        return super().save(commit=commit)
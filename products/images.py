@@ -0,0 +1,139 @@
+"""
+Déclinaisons redimensionnées des photos produit (WebP et JPEG).
+
+Les déclinaisons sont rangées à côté de l'original, dans un dossier nommé par
+l'empreinte SHA-256 de son contenu :
+``products/2025/12/13/derivatives/<empreinte>/card.webp``. Une même image
+n'est donc jamais recalculée et un changement d'image produit de nouvelles
+URL (pas de problème de cache navigateur). La génération se fait hors du
+thread de la requête : file d'attente en arrière-plan après l'enregistrement
+d'un produit, pool de processus pour la commande de rattrapage.
+"""
+import hashlib
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Largeur maximale (px) de chaque déclinaison
+DERIVATIVE_SIZES = {
+    'thumbnail': 160,
+    'card': 480,
+    'detail': 1200,
+}
+
+# extension -> (format Pillow, type MIME, options d'enregistrement)
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+DIGEST_LENGTH = 16
+
+_executor = None
+
+
+def derivative_name(original_name, digest, size, ext):
+    """Chemin (relatif au stockage) d'une déclinaison."""
+    directory = posixpath.dirname(original_name)
+    return posixpath.join(directory, 'derivatives', digest, f'{size}.{ext}')
+
+
+def derivative_url(original_name, digest, size, ext):
+    return default_storage.url(derivative_name(original_name, digest, size, ext))
+
+
+def product_image_url(product, size='card', ext='jpg'):
+    """URL de la déclinaison demandée, ou de l'original tant qu'elle n'existe pas."""
+    if not product.image:
+        return None
+    if not product.image_digest:
+        return product.image.url
+    return derivative_url(product.image.name, product.image_digest, size, ext)
+
+
+def generate_derivatives(original_name, storage=None):
+    """Génère toutes les déclinaisons d'une image et retourne son empreinte.
+
+    Fonction autonome (aucun accès à la base) afin de pouvoir être exécutée
+    dans un processus séparé.
+    """
+    from PIL import Image, ImageOps
+
+    storage = storage or default_storage
+    with storage.open(original_name, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()[:DIGEST_LENGTH]
+
+    # Déclinaisons déjà présentes : rien à faire (adressage par contenu)
+    last = derivative_name(original_name, digest, 'detail', 'jpg')
+    if storage.exists(last):
+        return digest
+
+    with Image.open(BytesIO(data)) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ('RGB', 'L'):
+            background = Image.new('RGB', source.size, (255, 255, 255))
+            background.paste(source, mask=source.convert('RGBA').getchannel('A'))
+            source = background
+        else:
+            source = source.convert('RGB')
+
+        for size, width in DERIVATIVE_SIZES.items():
+            image = source.copy()
+            image.thumbnail((width, width * 4), Image.LANCZOS)
+            for ext, (pil_format, _mime, options) in FORMATS.items():
+                buffer = BytesIO()
+                image.save(buffer, pil_format, **options)
+                name = derivative_name(original_name, digest, size, ext)
+                if not storage.exists(name):
+                    storage.save(name, ContentFile(buffer.getvalue()))
+    return digest
+
+
+def process_product_image(product_id, image_name):
+    """Génère les déclinaisons puis enregistre l'empreinte sur le produit."""
+    from .cache import bump_catalog_version
+    from .models import Product
+
+    try:
+        digest = generate_derivatives(image_name)
+    except Exception:
+        logger.exception("Échec de la génération des déclinaisons de %s", image_name)
+        return None
+
+    # Le produit a pu changer d'image entre-temps : on ne met à jour que si
+    # l'image traitée est toujours la sienne.
+    updated = Product.objects.filter(pk=product_id, image=image_name).update(
+        image_digest=digest, updated_at=timezone.now()
+    )
+    if updated:
+        bump_catalog_version()
+    return digest
+
+
+def _run_in_background(product_id, image_name):
+    try:
+        process_product_image(product_id, image_name)
+    finally:
+        # Connexions propres au thread de travail
+        close_old_connections()
+        connection.close()
+
+
+def schedule_derivatives(product_id, image_name):
+    """Met en file la génération des déclinaisons d'une image produit."""
+    global _executor
+    if not getattr(settings, 'PRODUCT_IMAGE_DERIVATIVES_ASYNC', True):
+        return process_product_image(product_id, image_name)
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='product-images')
+    return _executor.submit(_run_in_background, product_id, image_name)
@@ -0,0 +1,60 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from products.cache import bump_catalog_version
+from products.images import generate_derivatives
+from products.models import Product
+
+
+def _generate(product_id, image_name):
+    # Exécuté dans un processus du pool : aucun accès à la base
+    return product_id, generate_derivatives(image_name)
+
+
+class Command(BaseCommand):
+    help = "Génère en parallèle les déclinaisons (WebP/JPEG) des images produit existantes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 2,
+            help="Nombre de processus de génération"
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Retraite aussi les produits dont les déclinaisons sont déjà connues"
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='')
+        if not options['force']:
+            products = products.filter(image_digest='')
+        jobs = list(products.values_list('pk', 'image'))
+        if not jobs:
+            self.stdout.write("Aucune image à traiter.")
+            return
+
+        # Les connexions ne doivent pas être partagées avec les processus fils
+        connections.close_all()
+
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {executor.submit(_generate, pk, name): (pk, name) for pk, name in jobs}
+            for future in as_completed(futures):
+                pk, name = futures[future]
+                try:
+                    _pk, digest = future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"{name} : {exc}")
+                    continue
+                Product.objects.filter(pk=pk, image=name).update(image_digest=digest, updated_at=timezone.now())
+                done += 1
+
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"{done} images traitées, {failed} en échec."
+        ))
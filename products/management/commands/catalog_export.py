@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from products.catalog_io import detect_format, write_rows
+
+
+class Command(BaseCommand):
+    help = "Exporte le catalogue des produits en CSV ou JSON Lines (« - » pour la sortie standard)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier de destination (.csv, .jsonl) ou « - »")
+        parser.add_argument('--format', choices=['csv', 'jsonl'])
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = detect_format(path, options['format'])
+        if path == '-':
+            write_rows(self.stdout, fmt, options['batch_size'])
+            return
+        with open(path, 'w', encoding='utf-8', newline='') as stream:
+            count = write_rows(stream, fmt, options['batch_size'])
+        self.stderr.write(f"{count} produits exportés dans {path}.")
@@ -0,0 +1,59 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.catalog_io import CatalogImporter, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe un catalogue CSV ou JSON Lines : crée ou met à jour les produits "
+        "par slug, par lots (« - » pour l'entrée standard)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier à importer (.csv, .jsonl) ou « - »")
+        parser.add_argument('--format', choices=['csv', 'jsonl'])
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Affiche les créations et modifications sans rien enregistrer"
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = detect_format(path, options['format'])
+        importer = CatalogImporter(
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            on_change=self.print_change if options['dry_run'] else None,
+        )
+        try:
+            if path == '-':
+                report = importer.run(read_rows(sys.stdin, fmt))
+            else:
+                with open(path, encoding='utf-8-sig', newline='') as stream:
+                    report = importer.run(read_rows(stream, fmt))
+        except OSError as exc:
+            raise CommandError(f"Impossible de lire {path} : {exc}")
+
+        for line, message in report.errors:
+            self.stderr.write(f"Ligne {line} rejetée : {message}")
+        if report.rejected > len(report.errors):
+            self.stderr.write(f"... et {report.rejected - len(report.errors)} autres lignes rejetées.")
+
+        summary = (
+            f"{report.inserted} créés, {report.updated} modifiés, "
+            f"{report.unchanged} inchangés, {report.rejected} rejetés"
+        )
+        if options['dry_run']:
+            self.stdout.write(f"Simulation : {summary} (rien n'a été enregistré).")
+        else:
+            self.stdout.write(self.style.SUCCESS(summary + "."))
+
+    def print_change(self, kind, slug, diff):
+        if kind == '+':
+            self.stdout.write(f"+ {slug}")
+            return
+        details = ', '.join(f"{name} : {old} -> {new}" for name, (old, new) in diff.items())
+        self.stdout.write(f"~ {slug} ({details})")
@@ -0,0 +1,67 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.core.validators import validate_slug
+from django.db import transaction
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+
+from products.cache import bump_catalog_version
+from products.models import Product
+from products.slugs import SlugAllocator, base_slug
+
+
+def is_valid_slug(slug):
+    try:
+        validate_slug(slug)
+    except ValidationError:
+        return False
+    return True
+
+
+class Command(BaseCommand):
+    help = "Corrige (ou régénère) les slugs des produits du catalogue par lots"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--regenerate', action='store_true',
+            help="Régénère tous les slugs à partir du nom (sinon : seulement les slugs vides ou invalides)"
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help="Affiche les changements sans les appliquer")
+
+    def handle(self, *args, **options):
+        max_length = Product._meta.get_field('slug').max_length
+        rows = Product.objects.order_by('pk').values_list('pk', 'name', 'slug')
+
+        to_fix, kept = [], []
+        for pk, name, slug in rows.iterator(chunk_size=2000):
+            if options['regenerate'] or not slug or not is_valid_slug(slug):
+                to_fix.append((pk, name, slug))
+            else:
+                kept.append(slug)
+
+        allocator = SlugAllocator(kept, max_length)
+        changes = []
+        for pk, name, slug in to_fix:
+            new_slug = allocator.allocate(base_slug(name, max_length))
+            if new_slug != slug:
+                changes.append((pk, slug, new_slug))
+
+        for pk, old, new in changes:
+            self.stdout.write(f"{pk} : {old or '(vide)'} -> {new}")
+        if options['dry_run'] or not changes:
+            self.stdout.write(f"{len(changes)} slugs à modifier.")
+            return
+
+        now = timezone.now()
+        products = [Product(pk=pk, slug=new, updated_at=now) for pk, old, new in changes]
+        with transaction.atomic():
+            # Slugs provisoires uniques : un échange de slugs entre deux
+            # produits ne doit pas violer la contrainte d'unicité en cours de route.
+            Product.objects.filter(pk__in=[pk for pk, *_ in changes]).update(
+                slug=Concat(Value('~'), Cast('pk', CharField()))
+            )
+            Product.objects.bulk_update(products, ['slug', 'updated_at'], batch_size=options['batch_size'])
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"{len(changes)} slugs modifiés."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from products.cache import bump_catalog_version
+from products.facets import rebuild_facet_counts
+
+
+class Command(BaseCommand):
+    help = "Recalcule entièrement les compteurs de la navigation à facettes"
+
+    def handle(self, *args, **options):
+        count = rebuild_facet_counts()
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"{count} compteurs de facettes recalculés."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from products import search
+
+
+class Command(BaseCommand):
+    help = "Reconstruit entièrement l'index de recherche plein texte des produits"
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError("L'index FTS5 n'est disponible qu'avec SQLite.")
+
+        with transaction.atomic():
+            count = search.rebuild_index()
+
+        self.stdout.write(self.style.SUCCESS(f"{count} produits indexés."))
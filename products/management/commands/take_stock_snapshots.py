@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from products.stock import take_snapshots
+
+
+class Command(BaseCommand):
+    help = "Photographie le stock de tous les produits (à planifier périodiquement, par ex. chaque nuit)"
+
+    def handle(self, *args, **options):
+        count = take_snapshots()
+        self.stdout.write(self.style.SUCCESS(f"{count} inventaires de stock enregistrés."))
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:11
+
+import django.db.models.deletion
+from collections import Counter
+from decimal import Decimal
+from django.db import migrations, models
+
+# Copie figée du calcul des facettes (products.facets) au moment de cette migration
+PRICE_BANDS = [
+    ('lt20000', None, Decimal('20000')),
+    ('20000-30000', Decimal('20000'), Decimal('30000')),
+    ('30000-40000', Decimal('30000'), Decimal('40000')),
+    ('gte40000', Decimal('40000'), None),
+]
+
+
+def price_band(price):
+    for code, low, high in PRICE_BANDS:
+        if (low is None or price >= low) and (high is None or price < high):
+            return code
+    return PRICE_BANDS[-1][0]
+
+
+def populate_facet_counts(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    FacetCount = apps.get_model('products', 'FacetCount')
+    totals = Counter()
+    for category_id, cement_type, weight, price in Product.objects.filter(available=True).values_list(
+        'category_id', 'cement_type', 'weight', 'price'
+    ):
+        for key in (
+            (category_id, 'cement_type', cement_type),
+            (category_id, 'weight', format(Decimal(weight).normalize(), 'f')),
+            (category_id, 'price_band', price_band(price)),
+        ):
+            totals[key] += 1
+    FacetCount.objects.bulk_create([
+        FacetCount(category_id=category_id, facet=facet, value=value, count=count)
+        for (category_id, facet, value), count in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(choices=[('cement_type', 'Type de ciment'), ('weight', 'Poids du sac'), ('price_band', 'Tranche de prix')], max_length=20, verbose_name='Facette')),
+                ('value', models.CharField(max_length=20, verbose_name='Valeur')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Nombre de produits')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facet_counts', to='products.category')),
+            ],
+            options={
+                'verbose_name': 'Compteur de facette',
+                'verbose_name_plural': 'Compteurs de facettes',
+                'unique_together': {('category', 'facet', 'value')},
+            },
+        ),
+        migrations.RunPython(populate_facet_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:14
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_facetcount'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_balance', serialize=False, to='products.product', verbose_name='Produit')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Quantité en stock')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Solde de stock',
+                'verbose_name_plural': 'Soldes de stock',
+            },
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('movement_type', models.CharField(choices=[('in', 'Entrée'), ('out', 'Sortie'), ('loss', 'Perte'), ('adjust', 'Ajustement (inventaire)')], max_length=10, verbose_name='Type de mouvement')),
+                ('quantity', models.IntegerField(verbose_name='Quantité')),
+                ('reference', models.CharField(blank=True, max_length=100, verbose_name='Référence')),
+                ('movement_date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date du mouvement')),
+                ('notes', models.TextField(blank=True, verbose_name='Notes')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to=settings.AUTH_USER_MODEL, verbose_name='Saisi par')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='products.product', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Mouvement de stock',
+                'verbose_name_plural': 'Mouvements de stock',
+                'ordering': ['-movement_date', '-id'],
+                'indexes': [models.Index(fields=['product', 'movement_date'], name='products_st_product_b526cc_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(verbose_name="Date de l'inventaire")),
+                ('quantity', models.IntegerField(verbose_name='Quantité en stock')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='products.product', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Inventaire de stock',
+                'verbose_name_plural': 'Inventaires de stock',
+                'ordering': ['-taken_at'],
+                'unique_together': {('product', 'taken_at')},
+            },
+        ),
+    ]
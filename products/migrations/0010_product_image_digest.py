@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_digest',
+            field=models.CharField(blank=True, editable=False, help_text="Empreinte du contenu de l'image ; vide tant que les déclinaisons ne sont pas générées", max_length=64, verbose_name="Empreinte de l'image"),
+        ),
+    ]
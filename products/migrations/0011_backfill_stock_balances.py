@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:27
+
+from django.db import migrations
+
+
+def backfill_stock_balances(apps, schema_editor):
+    """Solde explicite à zéro pour les produits sans solde : les quantités de
+    l'ancien modèle Stock ont été supprimées (0006), le stock doit être saisi
+    (entrée ou inventaire) avant que ces produits puissent être commandés."""
+    Product = apps.get_model('products', 'Product')
+    StockBalance = apps.get_model('products', 'StockBalance')
+    missing = Product.objects.filter(stock_balance__isnull=True).values_list('pk', flat=True)
+    StockBalance.objects.bulk_create(
+        [StockBalance(product_id=pk, quantity=0) for pk in missing.iterator(chunk_size=1000)],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_product_image_digest'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_stock_balances, migrations.RunPython.noop),
+    ]
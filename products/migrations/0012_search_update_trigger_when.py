@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:29
+
+from django.db import migrations
+
+
+# Le trigger de mise à jour de l'index FTS5 ne se déclenche plus que si une
+# colonne indexée change de valeur : Model.save() réécrit toutes les colonnes,
+# « AFTER UPDATE OF » seul se déclenchait donc à chaque enregistrement.
+UPDATE_TRIGGER = """
+    CREATE TRIGGER products_product_fts_au
+    AFTER UPDATE OF name, description, cement_type ON products_product
+    WHEN old.name IS NOT new.name
+      OR old.description IS NOT new.description
+      OR old.cement_type IS NOT new.cement_type
+    BEGIN
+        DELETE FROM products_product_fts WHERE rowid = old.id;
+        INSERT INTO products_product_fts(rowid, name, description, cement_type)
+        VALUES (new.id, new.name, new.description, new.cement_type);
+    END
+"""
+
+PREVIOUS_UPDATE_TRIGGER = """
+    CREATE TRIGGER products_product_fts_au
+    AFTER UPDATE OF name, description, cement_type ON products_product BEGIN
+        DELETE FROM products_product_fts WHERE rowid = old.id;
+        INSERT INTO products_product_fts(rowid, name, description, cement_type)
+        VALUES (new.id, new.name, new.description, new.cement_type);
+    END
+"""
+
+
+def replace_trigger(sql):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        schema_editor.execute("DROP TRIGGER IF EXISTS products_product_fts_au")
+        schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_backfill_stock_balances'),
+    ]
+
+    operations = [
+        migrations.RunPython(replace_trigger(UPDATE_TRIGGER), replace_trigger(PREVIOUS_UPDATE_TRIGGER)),
+    ]
@@ -1,9 +1,13 @@
 from django.db import models
+from django.conf import settings
 from django.core.validators import MinValueValidator
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from decimal import Decimal
-from django.utils.text import slugify
 from django.urls import reverse
 
+from .slugs import allocate_slug
+
 
 class Category(models.Model):
     """Catégorie de produits (Ciment, Sable, etc.)"""
@@ -22,6 +26,12 @@ class Category(models.Model):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    def with_stock(self):
+        """Annote le stock courant (``current_stock``) via une jointure sur le solde dénormalisé"""
+        return self.annotate(current_stock=Coalesce('stock_balance__quantity', 0))
+
+
 class Product(models.Model):
     """Modèle pour les produits de ciment"""
     CEMENT_TYPES = [
@@ -72,6 +82,13 @@ class Product(models.Model):
         blank=True,
         verbose_name="Image du produit"
     )
+    image_digest = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        verbose_name="Empreinte de l'image",
+        help_text="Empreinte du contenu de l'image ; vide tant que les déclinaisons ne sont pas générées"
+    )
     available = models.BooleanField(
         default=True,
         verbose_name="Disponible",
@@ -79,7 +96,8 @@ class Product(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    
+
+    objects = ProductQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Produit"
@@ -93,19 +111,22 @@ class Product(models.Model):
 
     def __str__(self):
         return f"{self.name} ({self.get_cement_type_display()})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valeurs lues en base : état précédent pour les signaux d'enregistrement
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
         
     def save(self, *args, **kwargs):
         if not self.slug:
-            # Générer un slug à partir du nom
-            self.slug = slugify(self.name)
-            
-            # Vérifier l'unicité du slug
-            i = 1
-            original_slug = self.slug
-            while Product.objects.filter(slug=self.slug).exists():
-                self.slug = f"{original_slug}-{i}"
-                i += 1
-        
+            # Générer un slug unique à partir du nom (une seule requête)
+            self.slug = allocate_slug(
+                Product.objects.exclude(pk=self.pk), self.name,
+                max_length=self._meta.get_field('slug').max_length
+            )
+
         super().save(*args, **kwargs)
 
     def get_absolute_url(self):
@@ -114,10 +135,128 @@ class Product(models.Model):
 
     @property
     def stock_quantity(self):
-        """Retourne la quantité totale en stock pour ce produit"""
-        total = self.stock_entries.aggregate(
-            total=Coalesce(Sum('quantity'), 0)
-        )['total']
-        return total if total > 0 else 0
+        """Retourne la quantité en stock (annotée par ``with_stock()`` ou lue dans le solde)"""
+        if hasattr(self, 'current_stock'):
+            return self.current_stock
+        try:
+            return self.stock_balance.quantity
+        except StockBalance.DoesNotExist:
+            return 0
+
+    @property
+    def in_stock(self):
+        """Le produit est-il disponible et en stock ?"""
+        return self.available and self.stock_quantity > 0
 
 
+class FacetCount(models.Model):
+    """Nombre de produits disponibles par catégorie et valeur de facette (précalculé)"""
+    FACET_CHOICES = [
+        ('cement_type', 'Type de ciment'),
+        ('weight', 'Poids du sac'),
+        ('price_band', 'Tranche de prix'),
+    ]
+
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='facet_counts')
+    facet = models.CharField(max_length=20, choices=FACET_CHOICES, verbose_name="Facette")
+    value = models.CharField(max_length=20, verbose_name="Valeur")
+    count = models.PositiveIntegerField(default=0, verbose_name="Nombre de produits")
+
+    class Meta:
+        unique_together = ('category', 'facet', 'value')
+        verbose_name = "Compteur de facette"
+        verbose_name_plural = "Compteurs de facettes"
+
+    def __str__(self):
+        return f"{self.category} / {self.facet}={self.value} : {self.count}"
+
+
+class StockMovementType(models.TextChoices):
+    IN = 'in', 'Entrée'
+    OUT = 'out', 'Sortie'
+    LOSS = 'loss', 'Perte'
+    ADJUST = 'adjust', 'Ajustement (inventaire)'
+
+
+class StockMovement(models.Model):
+    """Mouvement de stock (journal en ajout seul).
+
+    ``quantity`` est la variation signée du stock : positive pour une entrée,
+    négative pour une sortie ou une perte, et l'écart constaté pour un ajustement.
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_movements',
+        verbose_name="Produit"
+    )
+    movement_type = models.CharField(
+        max_length=10,
+        choices=StockMovementType.choices,
+        verbose_name="Type de mouvement"
+    )
+    quantity = models.IntegerField(verbose_name="Quantité")
+    reference = models.CharField(max_length=100, blank=True, verbose_name="Référence")
+    movement_date = models.DateTimeField(default=timezone.now, verbose_name="Date du mouvement")
+    notes = models.TextField(blank=True, verbose_name="Notes")
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_movements',
+        verbose_name="Saisi par"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Mouvement de stock"
+        verbose_name_plural = "Mouvements de stock"
+        ordering = ['-movement_date', '-id']
+        indexes = [
+            models.Index(fields=['product', 'movement_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_movement_type_display()} {self.quantity:+d} - {self.product_id}"
+
+
+class StockBalance(models.Model):
+    """Solde de stock dénormalisé d'un produit, mis à jour avec des expressions F()"""
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stock_balance',
+        verbose_name="Produit"
+    )
+    quantity = models.IntegerField(default=0, verbose_name="Quantité en stock")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Solde de stock"
+        verbose_name_plural = "Soldes de stock"
+
+    def __str__(self):
+        return f"{self.product_id} : {self.quantity}"
+
+
+class StockSnapshot(models.Model):
+    """Photographie périodique du stock : somme des mouvements datés jusqu'à ``taken_at``"""
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_snapshots',
+        verbose_name="Produit"
+    )
+    taken_at = models.DateTimeField(verbose_name="Date de l'inventaire")
+    quantity = models.IntegerField(verbose_name="Quantité en stock")
+
+    class Meta:
+        verbose_name = "Inventaire de stock"
+        verbose_name_plural = "Inventaires de stock"
+        ordering = ['-taken_at']
+        unique_together = ('product', 'taken_at')
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.taken_at:%Y-%m-%d %H:%M} : {self.quantity}"
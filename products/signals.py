@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import facets, search
+from .cache import bump_catalog_version
+from .images import schedule_derivatives
+from .models import Category, Product
+
+
+def restore_search_triggers(sender, using='default', **kwargs):
+    """Recrée les triggers FTS5 supprimés par une reconstruction de table SQLite."""
+    search.ensure_triggers(using)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Incrémente la version du catalogue à chaque modification."""
+    bump_catalog_version()
+    # Une lecture concurrente peut avoir mis en cache l'état d'avant la
+    # validation de la transaction : on invalide une seconde fois au commit.
+    transaction.on_commit(bump_catalog_version)
+
+
+# Champs dont dépendent les facettes et les déclinaisons d'image
+TRACKED_FIELDS = ('category_id', 'cement_type', 'weight', 'price', 'available', 'image')
+
+
+@receiver(pre_save, sender=Product)
+def remember_facet_keys(sender, instance, raw=False, **kwargs):
+    """Mémorise les facettes et l'image du produit avant modification.
+
+    L'état précédent est celui lu en base au chargement de l'objet (ou laissé
+    par son dernier enregistrement) ; il n'est relu que pour un objet construit
+    sans passer par la base ou chargé sans ces champs. Une modification faite
+    par ailleurs entre-temps peut faire dériver les compteurs : la commande
+    ``rebuild_facets`` les recalcule.
+    """
+    instance._previous_facet_keys = set()
+    instance._previous_image = None
+    if raw or instance.pk is None:
+        return
+    previous = getattr(instance, '_loaded_values', {})
+    if not all(field in previous for field in TRACKED_FIELDS):
+        row = Product.objects.filter(pk=instance.pk).values_list(*TRACKED_FIELDS).first()
+        if row is None:
+            return
+        previous = dict(zip(TRACKED_FIELDS, row))
+    instance._previous_facet_keys = facets.facet_keys(*(previous[field] for field in TRACKED_FIELDS[:5]))
+    instance._previous_image = previous['image'] or None
+
+
+@receiver(post_save, sender=Product)
+def update_facet_counts(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_facet_keys', set())
+    facets.apply_deltas(facets.diff(previous, facets.product_facet_keys(instance)))
+    # L'état enregistré devient l'état précédent du prochain enregistrement
+    instance._loaded_values = {
+        **getattr(instance, '_loaded_values', {}),
+        **{field: getattr(instance, field) for field in TRACKED_FIELDS[:5]},
+        'image': instance.image.name,
+    }
+
+
+@receiver(post_delete, sender=Product)
+def remove_facet_counts(sender, instance, **kwargs):
+    facets.apply_deltas(facets.diff(facets.product_facet_keys(instance), set()))
+
+
+@receiver(post_save, sender=Product)
+def queue_image_derivatives(sender, instance, raw=False, **kwargs):
+    """Planifie la génération des déclinaisons d'une image nouvelle ou modifiée."""
+    if raw or not instance.image:
+        return
+    name = instance.image.name
+    if name == getattr(instance, '_previous_image', None) and instance.image_digest:
+        return
+    if name != getattr(instance, '_previous_image', None) and instance.image_digest:
+        # Nouvelle image : les anciennes déclinaisons ne s'appliquent plus
+        Product.objects.filter(pk=instance.pk).update(image_digest='')
+        instance.image_digest = ''
+    pk = instance.pk
+    transaction.on_commit(lambda: schedule_derivatives(pk, name))
@@ -0,0 +1,87 @@
+"""
+Attribution de slugs uniques.
+
+Au lieu de tester un à un ``slug``, ``slug-1``, ``slug-2``… (une requête par
+essai), on charge en une seule requête ``startswith`` tous les slugs pouvant
+entrer en collision, puis on choisit le premier suffixe libre en mémoire.
+``SlugAllocator`` sert aussi aux traitements en masse : ``taken_slugs`` charge
+les slugs en collision possible avec tout un lot, puis l'allocateur les complète
+au fur et à mesure des attributions.
+"""
+from collections import Counter
+
+from django.db.models import Q
+from django.utils.text import slugify
+
+DEFAULT_SLUG = 'produit'
+
+# Place réservée au suffixe numérique lors de la troncature
+SUFFIX_RESERVE = 8
+
+# Slugs (IN) et préfixes (OR de startswith) par requête : SQLite limite le
+# nombre de paramètres et la profondeur des expressions
+SLUGS_PER_QUERY = 500
+PREFIXES_PER_QUERY = 100
+
+
+def base_slug(text, max_length):
+    """Slug de base d'un texte, tronqué à ``max_length``."""
+    slug = slugify(text)[:max_length].strip('-')
+    return slug or DEFAULT_SLUG
+
+
+class SlugAllocator:
+    """Attribue des slugs uniques par rapport à un ensemble de slugs déjà pris."""
+
+    def __init__(self, taken=(), max_length=200):
+        self.taken = set(taken)
+        self.max_length = max_length
+
+    def allocate(self, base):
+        """Retourne ``base`` ou ``base-N`` (plus petit N libre) et le marque comme pris."""
+        base = base[:self.max_length]
+        if base not in self.taken:
+            self.taken.add(base)
+            return base
+
+        i = 1
+        while True:
+            suffix = f'-{i}'
+            slug = base[:self.max_length - len(suffix)] + suffix
+            if slug not in self.taken:
+                self.taken.add(slug)
+                return slug
+            i += 1
+
+
+def taken_slugs(queryset, bases, field='slug', max_length=200):
+    """Slugs de ``queryset`` pouvant entrer en collision avec l'un des ``bases``.
+
+    Les slugs de base sont d'abord cherchés tels quels (par l'index) ; les
+    variantes ``base-N`` ne sont chargées que pour les bases déjà prises ou
+    répétées dans ``bases``.
+    """
+    counts = Counter(bases)
+    distinct = sorted(counts)
+    taken = set()
+    for start in range(0, len(distinct), SLUGS_PER_QUERY):
+        chunk = distinct[start:start + SLUGS_PER_QUERY]
+        taken.update(queryset.filter(**{f'{field}__in': chunk}).values_list(field, flat=True))
+
+    prefixes = sorted({
+        base[:max_length - SUFFIX_RESERVE] for base in distinct if base in taken or counts[base] > 1
+    })
+    for start in range(0, len(prefixes), PREFIXES_PER_QUERY):
+        condition = Q()
+        for prefix in prefixes[start:start + PREFIXES_PER_QUERY]:
+            condition |= Q(**{f'{field}__startswith': prefix})
+        taken.update(queryset.filter(condition).values_list(field, flat=True))
+    return taken
+
+
+def allocate_slug(queryset, text, field='slug', max_length=200):
+    """Slug unique pour ``text`` dans ``queryset`` (une seule requête)."""
+    base = base_slug(text, max_length)
+    prefix = base[:max_length - SUFFIX_RESERVE]
+    taken = queryset.filter(**{f'{field}__startswith': prefix}).values_list(field, flat=True)
+    return SlugAllocator(taken, max_length).allocate(base)
@@ -0,0 +1,148 @@
+"""
+Grand livre du stock.
+
+Chaque mouvement est ajouté au journal ``StockMovement`` et répercuté dans la
+même transaction sur le solde dénormalisé ``StockBalance`` par une expression
+``F()``, sans relire ni agréger l'historique. Des ``StockSnapshot`` périodiques
+permettent de reconstituer le stock à n'importe quelle date en ne sommant que
+les mouvements postérieurs au dernier inventaire.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .cache import bump_stock_version
+from .models import StockBalance, StockMovement, StockMovementType, StockSnapshot
+
+
+class InsufficientStock(Exception):
+    """Le stock disponible ne permet pas la sortie demandée."""
+
+    def __init__(self, product_id, requested, available=None):
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+        super().__init__(f"Stock insuffisant pour le produit {product_id} (demandé : {requested})")
+
+
+def signed_quantity(movement_type, quantity):
+    """Variation du stock correspondant à un mouvement saisi avec une quantité positive."""
+    if movement_type in (StockMovementType.OUT, StockMovementType.LOSS):
+        return -quantity
+    return quantity
+
+
+def adjust_balance(product_id, delta, allow_negative=True):
+    """Applique ``delta`` au solde d'un produit en une requête.
+
+    Si ``allow_negative`` est faux, la mise à jour est conditionnelle
+    (``quantity >= -delta``) et lève ``InsufficientStock`` si elle ne s'applique
+    pas : deux sorties concurrentes ne peuvent donc pas rendre le stock négatif.
+    Un produit sans solde enregistré a un stock nul : tant qu'aucune entrée ni
+    aucun inventaire n'a été saisi, il ne peut pas être vendu.
+    """
+    # Comme pour le catalogue : une fois tout de suite, une fois à la validation
+    bump_stock_version()
+    transaction.on_commit(bump_stock_version)
+
+    balances = StockBalance.objects.filter(product_id=product_id)
+    if delta < 0 and not allow_negative:
+        balances = balances.filter(quantity__gte=-delta)
+    if balances.update(quantity=F('quantity') + delta, updated_at=timezone.now()):
+        return
+
+    if delta < 0 and not allow_negative:
+        available = StockBalance.objects.filter(product_id=product_id).values_list('quantity', flat=True).first()
+        raise InsufficientStock(product_id, -delta, available=available or 0)
+    try:
+        with transaction.atomic():
+            StockBalance.objects.create(product_id=product_id, quantity=delta)
+    except IntegrityError:
+        # Solde créé entre-temps par une écriture concurrente
+        StockBalance.objects.filter(product_id=product_id).update(
+            quantity=F('quantity') + delta, updated_at=timezone.now()
+        )
+
+
+@transaction.atomic
+def record_movement(product, movement_type, quantity, movement_date=None, reference='', notes='',
+                    user=None, allow_negative=False):
+    """Enregistre un mouvement de stock et met à jour le solde.
+
+    Pour un ajustement, ``quantity`` est la quantité comptée : la variation
+    enregistrée est l'écart avec le solde courant.
+    """
+    movement_date = movement_date or timezone.now()
+    if movement_type == StockMovementType.ADJUST:
+        current = (
+            StockBalance.objects.select_for_update()
+            .filter(product_id=product.pk)
+            .values_list('quantity', flat=True)
+            .first()
+        ) or 0
+        delta = quantity - current
+    else:
+        delta = signed_quantity(movement_type, quantity)
+
+    adjust_balance(product.pk, delta, allow_negative=allow_negative or delta >= 0)
+    movement = StockMovement.objects.create(
+        product=product,
+        movement_type=movement_type,
+        quantity=delta,
+        movement_date=movement_date,
+        reference=reference,
+        notes=notes,
+        created_by=user,
+    )
+    # Un mouvement antidaté modifie les inventaires déjà pris après sa date
+    StockSnapshot.objects.filter(product=product, taken_at__gte=movement_date).update(
+        quantity=F('quantity') + delta
+    )
+    return movement
+
+
+def balance_at(product, when):
+    """Reconstitue le stock d'un produit à la date ``when``.
+
+    Part du dernier inventaire antérieur et ne somme que les mouvements
+    survenus depuis (deux requêtes indexées, quelle que soit la taille de l'historique).
+    """
+    snapshot = (
+        StockSnapshot.objects.filter(product=product, taken_at__lte=when)
+        .order_by('-taken_at')
+        .values_list('taken_at', 'quantity')
+        .first()
+    )
+    movements = StockMovement.objects.filter(product=product, movement_date__lte=when)
+    base = 0
+    if snapshot:
+        taken_at, base = snapshot
+        movements = movements.filter(movement_date__gt=taken_at)
+    return base + (movements.aggregate(total=Sum('quantity'))['total'] or 0)
+
+
+@transaction.atomic
+def take_snapshots(taken_at=None):
+    """Photographie le stock de tous les produits et retourne le nombre d'inventaires créés.
+
+    L'inventaire est la somme des mouvements datés au plus tard de ``taken_at``
+    et non le solde courant, qui inclut les mouvements postdatés : ceux-ci
+    seraient sinon comptés une seconde fois par ``balance_at``.
+    """
+    taken_at = taken_at or timezone.now()
+    totals = dict(
+        StockMovement.objects.filter(movement_date__lte=taken_at)
+        .values('product_id')
+        .annotate(total=Sum('quantity'))
+        .values_list('product_id', 'total')
+    )
+    product_ids = StockBalance.objects.values_list('product_id', flat=True)
+    snapshots = StockSnapshot.objects.bulk_create(
+        [
+            StockSnapshot(product_id=product_id, taken_at=taken_at, quantity=totals.get(product_id, 0))
+            for product_id in product_ids.iterator(chunk_size=2000)
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    return len(snapshots)
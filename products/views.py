@@ -1,11 +1,123 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.views.generic import CreateView, ListView, TemplateView, UpdateView, DeleteView, DetailView
-from django.urls import reverse_lazy, reverse
+from django.views.generic import ListView, FormView
+from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.contrib.auth.decorators import login_required, permission_required
-from django.db.models import Q
-from django.http import JsonResponse
+from django.utils.dateparse import parse_date
+from django.utils.functional import cached_property
 
-from .models import Product, Category
-from .forms import ProductForm
+from .cache import get_categories
+from .forms import StockMovementForm
+from .models import Product, StockMovement
+from .stock import InsufficientStock, record_movement
+
+
+class StockManagementView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+    """Liste des produits avec leur stock courant (lu dans le solde dénormalisé)"""
+    template_name = 'products/stock_management.html'
+    context_object_name = 'products'
+    
+    def test_func(self):
+        return self.request.user.is_staff or self.request.user.is_superuser
+    
+    def get_queryset(self):
+        queryset = Product.objects.with_stock().select_related('category')
+        
+        category = self.request.GET.get('category')
+        if category and category.isdigit():
+            queryset = queryset.filter(category_id=category)
+        
+        availability = self.request.GET.get('available')
+        if availability == 'in_stock':
+            queryset = queryset.filter(current_stock__gt=0)
+        elif availability == 'out_of_stock':
+            queryset = queryset.filter(current_stock__lte=0)
+        return queryset
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['categories'] = get_categories()
+        context['selected_category'] = self.request.GET.get('category', '')
+        context['selected_availability'] = self.request.GET.get('available', '')
+        return context
+
+
+class StockEntryCreateView(LoginRequiredMixin, UserPassesTestMixin, FormView):
+    """Saisie d'un mouvement de stock pour un produit"""
+    form_class = StockMovementForm
+    template_name = 'products/stock_entry_form.html'
+    
+    def test_func(self):
+        return self.request.user.is_staff or self.request.user.is_superuser
+    
+    @cached_property
+    def product(self):
+        # Chargé à la première utilisation, donc après le contrôle d'accès
+        return get_object_or_404(Product.objects.with_stock(), pk=self.kwargs['product_id'])
+    
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['product'] = self.product
+        return kwargs
+    
+    def form_valid(self, form):
+        data = form.cleaned_data
+        try:
+            record_movement(
+                self.product,
+                data['movement_type'],
+                data['quantity'],
+                movement_date=data['movement_date'],
+                reference=data['reference'],
+                notes=data['notes'],
+                user=self.request.user,
+            )
+        except InsufficientStock:
+            form.add_error('quantity', "Stock insuffisant pour cette sortie.")
+            return self.form_invalid(form)
+        
+        messages.success(self.request, 'Le mouvement de stock a été enregistré avec succès.')
+        return redirect('products:stock_history', product_id=self.product.id)
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['product'] = self.product
+        return context
+
+
+class StockHistoryView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+    """Historique des mouvements de stock, pour un produit ou pour tout le catalogue"""
+    template_name = 'products/stock_history.html'
+    context_object_name = 'movements'
+    paginate_by = 20
+    
+    def test_func(self):
+        return self.request.user.is_staff or self.request.user.is_superuser
+    
+    def get_queryset(self):
+        queryset = StockMovement.objects.select_related('product', 'created_by')
+        
+        self.product = None
+        if 'product_id' in self.kwargs:
+            self.product = get_object_or_404(Product.objects.with_stock(), pk=self.kwargs['product_id'])
+            queryset = queryset.filter(product=self.product)
+        
+        start_date = self.parse_date_param('start_date')
+        if start_date:
+            queryset = queryset.filter(movement_date__date__gte=start_date)
+        end_date = self.parse_date_param('end_date')
+        if end_date:
+            queryset = queryset.filter(movement_date__date__lte=end_date)
+        return queryset
+    
+    def parse_date_param(self, name):
+        """Date (AAAA-MM-JJ) passée en paramètre ; ignorée si elle est invalide."""
+        try:
+            return parse_date(self.request.GET.get(name, ''))
+        except ValueError:
+            return None
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['product'] = self.product
+        return context
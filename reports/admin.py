@@ -0,0 +1,37 @@
+from django.contrib import admin
+from .models import DailyCategorySales, DailyPaymentSales, DailyProductSales, RollupWatermark
+
+
+class RollupAdmin(admin.ModelAdmin):
+    """Agrégats en lecture seule : ils sont écrits par la commande rollup_sales"""
+    date_hierarchy = 'day'
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(RollupAdmin):
+    list_display = ['day', 'product_name', 'order_count', 'quantity', 'revenue']
+    search_fields = ['product_name']
+
+
+@admin.register(DailyCategorySales)
+class DailyCategorySalesAdmin(RollupAdmin):
+    list_display = ['day', 'category_name', 'order_count', 'quantity', 'tonnage', 'revenue']
+
+
+@admin.register(DailyPaymentSales)
+class DailyPaymentSalesAdmin(RollupAdmin):
+    list_display = ['day', 'payment_method', 'order_count', 'revenue', 'tax_amount', 'reversed_count', 'reversed_amount']
+    list_filter = ['payment_method']
+
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ['name', 'value', 'updated_at']
+    readonly_fields = ['updated_at']
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from reports.rollups import run_rollup
+
+
+class Command(BaseCommand):
+    help = "Met à jour les agrégats journaliers des ventes à partir des commandes modifiées depuis le dernier passage"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Reconstruit tous les agrégats depuis les commandes")
+
+    def handle(self, *args, **options):
+        orders, days = run_rollup(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f"{orders} commandes relues, {days} journées recalculées."))
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:54
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('products', '0010_product_image_digest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Agrégat')),
+                ('value', models.DateTimeField(blank=True, null=True, verbose_name="Traité jusqu'au")),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': "Position d'agrégat",
+                'verbose_name_plural': "Positions d'agrégats",
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyPaymentSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Jour')),
+                ('payment_method', models.CharField(choices=[('lumicash', 'Lumicash'), ('ecocash', 'EcoCash'), ('ihela', 'Ihela')], max_length=20, verbose_name='Méthode de paiement')),
+                ('order_count', models.PositiveIntegerField(default=0, verbose_name='Commandes')),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14, verbose_name="Chiffre d'affaires TTC")),
+                ('tax_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14, verbose_name='TVA')),
+                ('reversed_count', models.PositiveIntegerField(default=0, verbose_name='Commandes annulées ou remboursées')),
+                ('reversed_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14, verbose_name='Montant annulé ou remboursé')),
+            ],
+            options={
+                'verbose_name': 'Ventes journalières par paiement',
+                'verbose_name_plural': 'Ventes journalières par paiement',
+                'ordering': ['-day', 'payment_method'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'payment_method'), name='rollup_payment_day_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCategorySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Jour')),
+                ('category_name', models.CharField(max_length=100, verbose_name='Nom de la catégorie')),
+                ('order_count', models.PositiveIntegerField(default=0, verbose_name='Commandes')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Sacs')),
+                ('tonnage', models.DecimalField(decimal_places=3, default=Decimal('0'), max_digits=14, verbose_name='Tonnage (t)')),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14, verbose_name="Chiffre d'affaires TTC")),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.category', verbose_name='Catégorie')),
+            ],
+            options={
+                'verbose_name': 'Ventes journalières par catégorie',
+                'verbose_name_plural': 'Ventes journalières par catégorie',
+                'ordering': ['-day', '-revenue'],
+                'indexes': [models.Index(fields=['day', 'category'], name='rollup_category_day_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Jour')),
+                ('product_name', models.CharField(max_length=200, verbose_name='Nom du produit')),
+                ('order_count', models.PositiveIntegerField(default=0, verbose_name='Commandes')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Sacs')),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14, verbose_name="Chiffre d'affaires TTC")),
+                ('product', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.product', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Ventes journalières par produit',
+                'verbose_name_plural': 'Ventes journalières par produit',
+                'ordering': ['-day', '-revenue'],
+                'indexes': [models.Index(fields=['day', 'product'], name='rollup_product_day_idx')],
+            },
+        ),
+    ]
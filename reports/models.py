@@ -0,0 +1,99 @@
+from decimal import Decimal
+
+from django.db import models
+
+from orders.models import Order
+from products.models import Category, Product
+
+
+class RollupWatermark(models.Model):
+    """Position d'un agrégat incrémental : les commandes modifiées
+    (``Order.updated_at``) après ``value`` n'ont pas encore été prises en compte."""
+    name = models.CharField(max_length=50, unique=True, verbose_name="Agrégat")
+    value = models.DateTimeField(null=True, blank=True, verbose_name="Traité jusqu'au")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Position d'agrégat"
+        verbose_name_plural = "Positions d'agrégats"
+
+    def __str__(self):
+        return f'{self.name} : {self.value}'
+
+
+class DailyProductSales(models.Model):
+    """Ventes d'un produit sur une journée (commandes ni annulées ni remboursées)."""
+    day = models.DateField(verbose_name="Jour")
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name="Produit"
+    )
+    product_name = models.CharField(max_length=200, verbose_name="Nom du produit")
+    order_count = models.PositiveIntegerField(default=0, verbose_name="Commandes")
+    quantity = models.PositiveIntegerField(default=0, verbose_name="Sacs")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'), verbose_name="Chiffre d'affaires TTC")
+
+    class Meta:
+        verbose_name = "Ventes journalières par produit"
+        verbose_name_plural = "Ventes journalières par produit"
+        ordering = ['-day', '-revenue']
+        indexes = [
+            models.Index(fields=['day', 'product'], name='rollup_product_day_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.day} — {self.product_name}'
+
+
+class DailyCategorySales(models.Model):
+    """Ventes d'une catégorie sur une journée."""
+    day = models.DateField(verbose_name="Jour")
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name="Catégorie"
+    )
+    category_name = models.CharField(max_length=100, verbose_name="Nom de la catégorie")
+    order_count = models.PositiveIntegerField(default=0, verbose_name="Commandes")
+    quantity = models.PositiveIntegerField(default=0, verbose_name="Sacs")
+    tonnage = models.DecimalField(max_digits=14, decimal_places=3, default=Decimal('0'), verbose_name="Tonnage (t)")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'), verbose_name="Chiffre d'affaires TTC")
+
+    class Meta:
+        verbose_name = "Ventes journalières par catégorie"
+        verbose_name_plural = "Ventes journalières par catégorie"
+        ordering = ['-day', '-revenue']
+        indexes = [
+            models.Index(fields=['day', 'category'], name='rollup_category_day_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.day} — {self.category_name}'
+
+
+class DailyPaymentSales(models.Model):
+    """Commandes d'une journée par méthode de paiement ; les commandes annulées
+    ou remboursées sont comptées à part et exclues du chiffre d'affaires."""
+    day = models.DateField(verbose_name="Jour")
+    payment_method = models.CharField(max_length=20, choices=Order.PAYMENT_METHODS, verbose_name="Méthode de paiement")
+    order_count = models.PositiveIntegerField(default=0, verbose_name="Commandes")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'), verbose_name="Chiffre d'affaires TTC")
+    tax_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'), verbose_name="TVA")
+    reversed_count = models.PositiveIntegerField(default=0, verbose_name="Commandes annulées ou remboursées")
+    reversed_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'), verbose_name="Montant annulé ou remboursé")
+
+    class Meta:
+        verbose_name = "Ventes journalières par paiement"
+        verbose_name_plural = "Ventes journalières par paiement"
+        ordering = ['-day', 'payment_method']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'payment_method'], name='rollup_payment_day_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.day} — {self.payment_method}'
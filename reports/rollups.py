@@ -0,0 +1,168 @@
+"""
+Agrégats journaliers des ventes (par produit, par catégorie, par méthode de
+paiement), seule source des tableaux de bord.
+
+``run_rollup`` est incrémental : il ne relit que les commandes modifiées
+depuis la dernière position (``RollupWatermark``, sur ``Order.updated_at``)
+et recalcule entièrement les journées de ces commandes (jour de création,
+heure locale). Recalculer une journée plutôt qu'appliquer des différences
+rend le traitement idempotent : une commande passée à ``annulee`` ou
+``remboursee`` sort simplement du chiffre d'affaires de son jour, et une
+commande relue deux fois ne compte qu'une fois.
+
+Chaque passage repart de ``position - REPORTS_ROLLUP_OVERLAP`` pour
+rattraper les transactions validées après la lecture précédente mais datées
+d'avant. Les écritures en masse sur les commandes (``queryset.update()``)
+doivent mettre à jour ``updated_at`` pour être vues ; une suppression de
+commande n'est reprise que par un recalcul complet (``full=True``).
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+
+from .models import DailyCategorySales, DailyPaymentSales, DailyProductSales, RollupWatermark
+
+WATERMARK = 'daily_sales'
+
+REVERSED_STATUSES = Order.REVERSED_STATUSES
+
+ZERO = Decimal('0')
+TONNE = Decimal('0.001')
+
+# Journées recalculées par requête
+DAYS_PER_BATCH = 31
+
+
+def _overlap():
+    return timedelta(seconds=getattr(settings, 'REPORTS_ROLLUP_OVERLAP', 300))
+
+
+def _day_bounds(days):
+    """Condition sur ``created_at`` couvrant les journées ``days`` (heure
+    locale), sous forme d'intervalles pour pouvoir utiliser l'index."""
+    condition = Q()
+    for day in days:
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        condition |= Q(created_at__gte=start, created_at__lt=start + timedelta(days=1))
+    return condition
+
+
+def _line_revenue():
+    return ExpressionWrapper(F('price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def build_rows(days):
+    """Lignes des trois agrégats pour les journées ``days`` (trois requêtes groupées)."""
+    orders = Order.objects.filter(_day_bounds(days))
+    items = OrderItem.objects.filter(order__in=orders.exclude(status__in=REVERSED_STATUSES).values('pk'))
+    local_day = TruncDate('order__created_at')
+
+    products = [
+        DailyProductSales(
+            day=row['day'],
+            product_id=row['product_id'],
+            product_name=row['product__name'] or 'Produit retiré du catalogue',
+            order_count=row['order_count'],
+            quantity=row['bags'],
+            revenue=row['revenue'],
+        )
+        for row in items.annotate(day=local_day).values('day', 'product_id', 'product__name').annotate(
+            order_count=Count('order', distinct=True),
+            bags=Sum('quantity'),
+            revenue=Sum(_line_revenue()),
+        ).order_by()
+    ]
+
+    weight = ExpressionWrapper(
+        F('quantity') * F('product__weight'), output_field=DecimalField(max_digits=14, decimal_places=2)
+    )
+    categories = [
+        DailyCategorySales(
+            day=row['day'],
+            category_id=row['product__category_id'],
+            category_name=row['product__category__name'] or 'Sans catégorie',
+            order_count=row['order_count'],
+            quantity=row['bags'],
+            tonnage=(Decimal(row['weight_kg'] or 0) / 1000).quantize(TONNE),
+            revenue=row['revenue'],
+        )
+        for row in items.annotate(day=local_day).values(
+            'day', 'product__category_id', 'product__category__name'
+        ).annotate(
+            order_count=Count('order', distinct=True),
+            bags=Sum('quantity'),
+            weight_kg=Sum(weight),
+            revenue=Sum(_line_revenue()),
+        ).order_by()
+    ]
+
+    counted = ~Q(status__in=REVERSED_STATUSES)
+    reversed_ = Q(status__in=REVERSED_STATUSES)
+    payments = [
+        DailyPaymentSales(
+            day=row['day'],
+            payment_method=row['payment_method'],
+            order_count=row['counted_orders'],
+            revenue=row['counted_revenue'],
+            tax_amount=row['counted_tax'],
+            reversed_count=row['reversed_orders'],
+            reversed_amount=row['reversed_revenue'],
+        )
+        for row in orders.annotate(day=TruncDate('created_at')).values('day', 'payment_method').annotate(
+            counted_orders=Count('pk', filter=counted),
+            counted_revenue=Coalesce(Sum('total_amount', filter=counted), ZERO),
+            counted_tax=Coalesce(Sum('tax_amount', filter=counted), ZERO),
+            reversed_orders=Count('pk', filter=reversed_),
+            reversed_revenue=Coalesce(Sum('total_amount', filter=reversed_), ZERO),
+        ).order_by()
+    ]
+    return products, categories, payments
+
+
+def rebuild_days(days):
+    """Remplace les agrégats des journées ``days`` ; à appeler dans une transaction."""
+    days = sorted(set(days))
+    for start in range(0, len(days), DAYS_PER_BATCH):
+        batch = days[start:start + DAYS_PER_BATCH]
+        products, categories, payments = build_rows(batch)
+        for model, rows in (
+            (DailyProductSales, products),
+            (DailyCategorySales, categories),
+            (DailyPaymentSales, payments),
+        ):
+            model.objects.filter(day__in=batch).delete()
+            model.objects.bulk_create(rows, batch_size=500)
+
+
+@transaction.atomic
+def run_rollup(full=False, now=None):
+    """Met à jour les agrégats ; retourne ``(commandes relues, journées recalculées)``.
+
+    Avec ``full=True``, tous les agrégats sont reconstruits depuis les commandes.
+    """
+    now = now or timezone.now()
+    # Verrou : deux passages simultanés ne se chevauchent pas
+    RollupWatermark.objects.get_or_create(name=WATERMARK)
+    watermark = RollupWatermark.objects.select_for_update().get(name=WATERMARK)
+
+    changed = Order.objects.filter(updated_at__lte=now)
+    if full:
+        for model in (DailyProductSales, DailyCategorySales, DailyPaymentSales):
+            model.objects.all().delete()
+    elif watermark.value is not None:
+        changed = changed.filter(updated_at__gt=watermark.value - _overlap())
+    order_count = changed.count()
+    days = changed.annotate(day=TruncDate('created_at')).order_by().values_list('day', flat=True).distinct()
+    days = list(days) if order_count else []
+    rebuild_days(days)
+
+    watermark.value = now
+    watermark.save(update_fields=['value', 'updated_at'])
+    return order_count, len(days)
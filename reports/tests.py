@@ -0,0 +1,120 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from products.models import Category, Product
+
+from .models import DailyCategorySales, DailyPaymentSales, DailyProductSales
+from .rollups import run_rollup
+
+
+@override_settings(REPORTS_ROLLUP_OVERLAP=0)
+class SalesRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Ciment', slug='ciment')
+        cls.cpj = Product.objects.create(
+            name='Ciment CPJ42.5', category=cls.category, cement_type='CPJ42.5',
+            price=Decimal('25000.00'), weight=Decimal('50.00'),
+        )
+        cls.cpa = Product.objects.create(
+            name='Ciment CPA52.5', category=cls.category, cement_type='CPA52.5',
+            price=Decimal('30000.00'), weight=Decimal('25.00'),
+        )
+        cls.user = User.objects.create_user('client', password='secret')
+        cls.staff = User.objects.create_user('gerant', password='secret', is_staff=True)
+        cls.day1 = date(2026, 9, 1)
+        cls.day2 = date(2026, 9, 2)
+
+    def order(self, day, lines, payment_method='lumicash'):
+        total = sum(product.price * quantity for product, quantity in lines)
+        order = Order.objects.create(
+            user=self.user, first_name='Jean', last_name='Ndayishimiye', email='jean@example.com',
+            phone='0999999999', payment_method=payment_method, total_amount=total,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, price=product.price, quantity=quantity)
+            for product, quantity in lines
+        ])
+        created_at = timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=10))
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        order.refresh_from_db()
+        return order
+
+    def test_rollups_per_day_product_category_and_payment(self):
+        self.order(self.day1, [(self.cpj, 2), (self.cpa, 4)])
+        self.order(self.day1, [(self.cpj, 1)], payment_method='ecocash')
+        self.order(self.day2, [(self.cpa, 1)])
+
+        self.assertEqual(run_rollup(), (3, 2))
+        cpj = DailyProductSales.objects.get(day=self.day1, product=self.cpj)
+        self.assertEqual((cpj.order_count, cpj.quantity, cpj.revenue), (2, 3, Decimal('75000.00')))
+        category = DailyCategorySales.objects.get(day=self.day1)
+        self.assertEqual(category.quantity, 7)
+        self.assertEqual(category.tonnage, Decimal('0.250'))
+        self.assertEqual(category.revenue, Decimal('195000.00'))
+        self.assertEqual(
+            sorted(DailyPaymentSales.objects.filter(day=self.day1).values_list('payment_method', 'order_count', 'revenue')),
+            [('ecocash', 1, Decimal('25000.00')), ('lumicash', 1, Decimal('170000.00'))],
+        )
+
+    def test_only_changed_orders_are_reprocessed_and_reversals_are_applied(self):
+        cancelled = self.order(self.day1, [(self.cpj, 2)])
+        self.order(self.day1, [(self.cpj, 1)])
+        self.order(self.day2, [(self.cpa, 1)])
+        run_rollup()
+        self.assertEqual(run_rollup(), (0, 0))
+
+        cancelled.status = 'annulee'
+        cancelled.save()
+        self.assertEqual(run_rollup(), (1, 1))
+        cpj = DailyProductSales.objects.get(day=self.day1, product=self.cpj)
+        self.assertEqual((cpj.order_count, cpj.quantity, cpj.revenue), (1, 1, Decimal('25000.00')))
+        payment = DailyPaymentSales.objects.get(day=self.day1)
+        self.assertEqual((payment.order_count, payment.revenue), (1, Decimal('25000.00')))
+        self.assertEqual((payment.reversed_count, payment.reversed_amount), (1, Decimal('50000.00')))
+        # Le jour non concerné n'a pas bougé
+        self.assertEqual(DailyProductSales.objects.get(day=self.day2).revenue, Decimal('30000.00'))
+
+        # Un passage répété ne compte rien deux fois
+        Order.objects.filter(pk=cancelled.pk).update(updated_at=timezone.now())
+        run_rollup()
+        self.assertEqual(DailyProductSales.objects.filter(day=self.day1).count(), 1)
+
+    def test_command_and_full_rebuild(self):
+        order = self.order(self.day1, [(self.cpj, 2)])
+        out = StringIO()
+        call_command('rollup_sales', stdout=out)
+        self.assertIn('1 commandes relues, 1 journées recalculées', out.getvalue())
+
+        # Une suppression n'est reprise que par le recalcul complet
+        order.delete()
+        call_command('rollup_sales', stdout=StringIO())
+        self.assertTrue(DailyProductSales.objects.exists())
+        call_command('rollup_sales', full=True, stdout=StringIO())
+        self.assertFalse(DailyProductSales.objects.exists())
+
+    def test_dashboard_reads_only_rollups(self):
+        self.order(self.day1, [(self.cpj, 2)])
+        self.order(self.day2, [(self.cpa, 1)], payment_method='ihela')
+        run_rollup()
+        self.client.force_login(self.staff)
+        url = reverse('reports:sales_dashboard')
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, {'debut': '2026-09-01', 'fin': '2026-09-30'})
+        self.assertFalse([query for query in captured if 'orders_' in query['sql']])
+        self.assertContains(response, 'Ciment CPJ42.5')
+        self.assertContains(response, 'Ihela')
+        self.assertEqual(response.context['totals']['revenue'], Decimal('80000.00'))
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 403)
@@ -0,0 +1,78 @@
+from datetime import date, timedelta
+
+from django.contrib.auth.decorators import login_required
+from django.db.models import Max, Sum
+from django.http import HttpResponseForbidden
+from django.shortcuts import render
+from django.utils import timezone
+
+from .models import DailyCategorySales, DailyPaymentSales, DailyProductSales, RollupWatermark
+from .rollups import WATERMARK
+
+DEFAULT_PERIOD = 30  # jours
+
+
+def _period(request):
+    """Période demandée (``debut`` / ``fin`` au format AAAA-MM-JJ), 30 derniers jours par défaut"""
+    end = timezone.localdate()
+    start = end - timedelta(days=DEFAULT_PERIOD - 1)
+    try:
+        end = date.fromisoformat(request.GET.get('fin') or end.isoformat())
+        start = date.fromisoformat(request.GET.get('debut') or start.isoformat())
+    except ValueError:
+        pass
+    if start > end:
+        start, end = end, start
+    return start, end
+
+
+@login_required
+def sales_dashboard(request):
+    """Tableau de bord des ventes, lu uniquement dans les agrégats journaliers"""
+    if not request.user.is_staff and not request.user.is_superuser:
+        return HttpResponseForbidden("Accès refusé")
+    
+    start, end = _period(request)
+    period = {'day__gte': start, 'day__lte': end}
+    
+    # Une ligne par jour et par méthode de paiement : totaux du jour et de la période
+    days = {}
+    totals = {'order_count': 0, 'revenue': 0, 'tax_amount': 0, 'reversed_count': 0, 'reversed_amount': 0}
+    payments = {}
+    for row in DailyPaymentSales.objects.filter(**period).order_by('day'):
+        day = days.setdefault(row.day, {'day': row.day, 'order_count': 0, 'revenue': 0, 'reversed_amount': 0})
+        method = payments.setdefault(row.payment_method, {
+            'label': row.get_payment_method_display(), 'order_count': 0, 'revenue': 0,
+        })
+        for key in ('order_count', 'revenue', 'reversed_amount'):
+            day[key] += getattr(row, key)
+        for key in totals:
+            totals[key] += getattr(row, key)
+        method['order_count'] += row.order_count
+        method['revenue'] += row.revenue
+    
+    products = (
+        DailyProductSales.objects.filter(**period)
+        .values('product_id')
+        .annotate(name=Max('product_name'), quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .order_by('-revenue')[:10]
+    )
+    categories = (
+        DailyCategorySales.objects.filter(**period)
+        .values('category_id')
+        .annotate(name=Max('category_name'), quantity=Sum('quantity'), tonnage=Sum('tonnage'), revenue=Sum('revenue'))
+        .order_by('-revenue')
+    )
+    
+    context = {
+        'page_title': 'Rapport des ventes',
+        'start': start,
+        'end': end,
+        'totals': totals,
+        'days': list(days.values()),
+        'payments': sorted(payments.values(), key=lambda method: -method['revenue']),
+        'top_products': products,
+        'category_sales': categories,
+        'watermark': RollupWatermark.objects.filter(name=WATERMARK).values_list('value', flat=True).first(),
+    }
+    return render(request, 'reports/dashboard.html', context)
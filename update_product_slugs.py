@@ -2,22 +2,16 @@ import os
 import django
 
 # Configuration de l'environnement Django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'store.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cement.settings')
 django.setup()
 
-from products.models import Product
-from django.utils.text import slugify
+from django.core.management import call_command
+
 
 def update_product_slugs():
-    # Récupérer tous les produits sans slug
-    products_without_slug = Product.objects.filter(slug='')
-    
-    # Mettre à jour les slugs manquants
-    for product in products_without_slug:
-        # Sauvegarder le produit pour déclencher la méthode save()
-        product.save()
-        print(f"Mis à jour le slug pour {product.name} : {product.slug}")
-    
+    # Attribue un slug aux produits qui n'en ont pas (ou dont le slug est
+    # invalide), par lots ; voir la commande ``fix_product_slugs``.
+    call_command('fix_product_slugs')
     print("Mise à jour des slugs terminée.")
 
 if __name__ == "__main__":